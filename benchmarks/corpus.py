@@ -0,0 +1,115 @@
+# benchmarks/corpus.py
+"""Deterministic generator for a benchmark corpus of .py/.sql/.tf/.ipynb files."""
+
+import json
+import os
+import random
+
+
+def python_source(units: int, rng: random.Random) -> str:
+    """Module with ``units`` undocumented functions/classes."""
+    parts = ["import math\nimport os\n\nLIMIT = 100\n"]
+    for i in range(units):
+        if i % 4 == 3:
+            parts.append(
+                f"\nclass Worker{i}:\n"
+                f"    def __init__(self, size={rng.randint(1, 50)}):\n"
+                f"        self.size = size\n\n"
+                f"    def run(self, items):\n"
+                f"        return [x * self.size for x in items if x % 2]\n"
+            )
+        else:
+            parts.append(
+                f"\ndef compute_{i}(values, factor={rng.randint(2, 9)}):\n"
+                f"    total = 0\n"
+                f"    for v in values:\n"
+                f"        if v > LIMIT:\n"
+                f"            total += math.sqrt(v) * factor\n"
+                f"        else:\n"
+                f"            total -= v\n"
+                f"    return total\n"
+            )
+    return "".join(parts)
+
+
+def sql_source(units: int, rng: random.Random) -> str:
+    """Script with ``units`` statements mixing trivial DDL and joins/CTEs."""
+    parts = []
+    for i in range(units):
+        if i % 3 == 0:
+            parts.append(f"CREATE TABLE t_{i} (id INT PRIMARY KEY, amount NUMERIC({rng.randint(8, 14)}, 2));\n")
+        elif i % 3 == 1:
+            parts.append(
+                f"WITH recent AS (\n    SELECT customer_id, SUM(amount) AS spend\n    FROM orders_{i}\n"
+                f"    WHERE created_at > NOW() - INTERVAL '{rng.randint(1, 90)} days'\n    GROUP BY customer_id\n)\n"
+                f"SELECT c.name, r.spend\nFROM customers c\nJOIN recent r ON r.customer_id = c.id\nORDER BY r.spend DESC;\n"
+            )
+        else:
+            parts.append(
+                f"SELECT id, amount,\n       RANK() OVER (PARTITION BY region ORDER BY amount DESC) AS rnk\nFROM sales_{i};\n"
+            )
+    return "\n".join(parts)
+
+
+def tf_source(units: int, rng: random.Random) -> str:
+    """Terraform file with ``units`` resources."""
+    parts = ['provider "aws" {\n  region = "us-east-1"\n}\n']
+    for i in range(units):
+        parts.append(
+            f'\nresource "aws_s3_bucket" "bucket_{i}" {{\n  bucket = "bench-{i}-{rng.randint(1000, 9999)}"\n'
+            f'  tags = {{\n    Env = "bench"\n  }}\n}}\n'
+        )
+    return "".join(parts)
+
+
+def notebook_source(units: int, rng: random.Random, output_kb: int = 0) -> str:
+    """Notebook with ``units`` code cells, optionally carrying ``output_kb`` of fake output each."""
+    cells = []
+    for i in range(units):
+        outputs = []
+        if output_kb:
+            outputs.append({"output_type": "stream", "name": "stdout", "text": ["x" * 1023 + "\n"] * output_kb})
+        cells.append({
+            "cell_type": "code",
+            "execution_count": i + 1,
+            "id": f"cell-{i}",
+            "metadata": {},
+            "outputs": outputs,
+            "source": [f"df_{i} = load({rng.randint(1, 99)})\n", f"df_{i} = df_{i}[df_{i}.value > {i}]\n",
+                       f"summary_{i} = df_{i}.groupby('k').agg('sum')"],
+        })
+    notebook = {"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}
+    return json.dumps(notebook, indent=1) + "\n"
+
+
+GENERATORS = {
+    ".py": python_source,
+    ".sql": sql_source,
+    ".tf": tf_source,
+    ".ipynb": notebook_source,
+}
+
+
+def generate_corpus(root: str, files_per_type: int = 10, units: int = 8, seed: int = 0) -> list[str]:
+    """Write a reproducible corpus under ``root``.
+
+    Args:
+        root: Output directory (created if missing)
+        files_per_type: Number of files generated per extension
+        units: Functions/statements/resources/cells per file (controls file size)
+        seed: Random seed, so runs with the same arguments produce identical files
+
+    Returns:
+        list[str]: Paths of the generated files
+    """
+    rng = random.Random(seed)
+    paths = []
+    for ext, generator in GENERATORS.items():
+        folder = os.path.join(root, ext.lstrip("."))
+        os.makedirs(folder, exist_ok=True)
+        for i in range(files_per_type):
+            path = os.path.join(folder, f"bench_{i}{ext}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(generator(units, rng))
+            paths.append(path)
+    return paths
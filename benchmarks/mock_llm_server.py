@@ -0,0 +1,190 @@
+# benchmarks/mock_llm_server.py
+"""Local OpenAI-compatible chat completions server with simulated latency, throughput and errors.
+
+Usage:
+    python -m benchmarks.mock_llm_server --port 8765 --latency 0.5 --tokens-per-sec 80 --error-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# The code block of every bot prompt follows a "Here is/are the ...:" line
+_CODE_RE = re.compile(r"Here (?:is|are) the [^\n]*:\n\n(.*?)(?:\n\n[ \t]*(?:🔁|Now return)|\Z)", re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def fake_completion(prompt: str) -> str:
+    """Build a plausible answer: the code embedded in the prompt, echoed back unchanged.
+
+    Docstring-JSON prompts get an empty JSON map so the splicing path is exercised too.
+    """
+    if "Return ONLY a JSON object" in prompt:
+        return '{"docstrings": {}, "comments": {}}'
+    matches = _CODE_RE.findall(prompt)
+    if not matches:
+        return ""
+    code = matches[-1].rstrip()
+    lines = code.split("\n")
+    lines[0] = lines[0].lstrip(" ")  # Legacy prompts indent the first line of the code
+    return "\n".join(lines)
+
+
+class Stats:
+    """Thread-safe counters exposed on ``GET /stats``."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+            }
+
+
+def make_handler(latency: float, tokens_per_sec: float, error_rate: float, retry_after: float, stats: Stats):
+    """Create a request handler class bound to the simulation settings."""
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send_json(200, stats.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            with stats.lock:
+                stats.requests += 1
+            if random.random() < error_rate:
+                with stats.lock:
+                    stats.errors += 1
+                self._send_json(429, {"error": {"message": "Rate limit reached (simulated)", "type": "rate_limit"}},
+                                {"Retry-After": str(retry_after)})
+                return
+
+            prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+            completion = fake_completion(prompt)
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+            with stats.lock:
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+
+            time.sleep(latency)
+            if body.get("stream"):
+                self._stream(body.get("model", "mock"), completion)
+                return
+            if tokens_per_sec:
+                time.sleep(completion_tokens / tokens_per_sec)
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _stream(self, model: str, completion: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            piece = 16  # ~4 tokens per event
+            try:
+                for start in range(0, len(completion), piece):
+                    chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": model, "choices": [{"index": 0, "delta": {"content": completion[start:start + piece]},
+                                                          "finish_reason": None}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    if tokens_per_sec:
+                        time.sleep(4 / tokens_per_sec)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client cancelled the stream
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return MockHandler
+
+
+def start_server(port: int = 0, latency: float = 0.5, tokens_per_sec: float = 0, error_rate: float = 0.0,
+                 retry_after: float = 1.0):
+    """Start the mock server on a background thread.
+
+    Args:
+        port: Port to bind on 127.0.0.1 (0 picks a free one)
+        latency: Fixed seconds before the first token
+        tokens_per_sec: Simulated generation speed (0 = instant)
+        error_rate: Probability of answering with a 429
+        retry_after: Retry-After seconds sent with simulated 429s
+
+    Returns:
+        ThreadingHTTPServer: Running server; ``server.stats`` holds its counters
+    """
+    stats = Stats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, tokens_per_sec, error_rate, retry_after, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="Simulated output speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a simulated 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with simulated 429s")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.tokens_per_sec, args.error_rate, args.retry_after)
+    print(f"🧪 Mock LLM server listening on http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/run_benchmark.py
+"""Run the real CLI against a generated corpus and a local mock LLM server.
+
+Reports files/sec and p50/p95 per-file latency (over every finished file, whether it
+was written, needed no changes or failed), peak RSS of the CLI process and the
+tokens the mock server saw. File outcomes and latencies come from the CLI's
+``--report`` JSONL run report. With ``--baseline`` the run fails if throughput dropped
+by more than ``--max-regression`` compared to a previous report.
+
+Usage:
+    python -m benchmarks.run_benchmark --files-per-type 10 --units 8 --workers 8 --latency 0.3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.mock_llm_server import start_server
+
+# File statuses that mean the pipeline is done with a file (deferred/pending files are not)
+FINISHED_STATUSES = ("written", "skipped", "failed")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def read_report(path: str) -> list[dict]:
+    """Per-file records of a ``--report`` JSONL run report (empty if the CLI wrote none)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+    return [record for record in records if record.get("type") == "file"]
+
+
+def run_cli(base_url: str, corpus: str, workers: int, extra_args: list[str]) -> dict:
+    """Run ``python -m bot.cli`` on the corpus and read per-file outcomes from its run report.
+
+    Returns:
+        dict: wall time, per-file latencies, files written, peak RSS and exit status of the CLI
+    """
+    report_path = os.path.join(corpus, ".bench-report.jsonl")
+    cmd = [
+        sys.executable, "-m", "bot.cli",
+        "--provider", "deepseek", "--model_name", "mock", "--api_key", "bench", "--api_base", base_url,
+        "--src", corpus, "--workers", str(workers), "--no-cache", "--report", report_path, *extra_args,
+    ]
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    finished = [record for record in read_report(report_path) if record["status"] in FINISHED_STATUSES]
+    return {
+        "wall_seconds": wall,
+        "latencies": [record["latency"] for record in finished],
+        "written": sum(1 for record in finished if record["status"] == "written"),
+        "failures": sum(1 for record in finished if record["status"] == "failed"),
+        "peak_rss_mb": peak_rss_mb,
+        "exit_code": os.waitstatus_to_exitcode(status),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark for the commenting pipeline")
+    parser.add_argument("--files-per-type", type=int, default=10, help="Files generated per extension")
+    parser.add_argument("--units", type=int, default=8, help="Functions/statements/resources/cells per file")
+    parser.add_argument("--workers", type=int, default=8, help="Value passed to the CLI's --workers")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock time-to-first-token in seconds")
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="Mock output speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a simulated 429")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Previous JSON report to compare files/sec against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed files/sec drop vs. baseline (0.2 = 20%%)")
+    parser.add_argument("cli_args", nargs=argparse.REMAINDER, help="Extra arguments for bot.cli (after --)")
+    args = parser.parse_args()
+
+    server = start_server(0, args.latency, args.tokens_per_sec, args.error_rate, retry_after=0.2)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    extra = [a for a in args.cli_args if a != "--"]
+
+    with tempfile.TemporaryDirectory(prefix="acc-bench-") as corpus:
+        files = generate_corpus(corpus, args.files_per_type, args.units)
+        result = run_cli(base_url, corpus, args.workers, extra)
+    server.shutdown()
+
+    latencies = result["latencies"]
+    report = {
+        "files": len(files),
+        "files_finished": len(latencies),
+        "files_written": result["written"],
+        "failures": result["failures"],
+        "workers": args.workers,
+        "wall_seconds": round(result["wall_seconds"], 3),
+        "files_per_sec": round(len(latencies) / result["wall_seconds"], 3) if result["wall_seconds"] else 0.0,
+        "p50_file_latency": round(percentile(latencies, 50), 3),
+        "p95_file_latency": round(percentile(latencies, 95), 3),
+        "peak_rss_mb": round(result["peak_rss_mb"], 1),
+        "llm": server.stats.snapshot(),
+        "exit_code": result["exit_code"],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if result["exit_code"] != 0:
+        sys.exit(f"❌ CLI exited with status {result['exit_code']}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        floor = baseline["files_per_sec"] * (1 - args.max_regression)
+        if report["files_per_sec"] < floor:
+            sys.exit(f"❌ Throughput regression: {report['files_per_sec']} files/sec < {floor:.3f} "
+                     f"(baseline {baseline['files_per_sec']})")
+        print(f"✅ Throughput within {args.max_regression:.0%} of baseline ({baseline['files_per_sec']} files/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,311 @@
 # bot/agents/comment_agent.py
+import ast
+import re
+import textwrap
+from contextlib import nullcontext
+
+from bot.utils.concurrency import ordered_map, SingleFlight
+from bot.utils.dedup import unit_key, transfer_annotations
+from bot.utils.python_chunks import split_python_module, module_header, split_layout, restore_layout
+from bot.core.streaming import iter_generate
+from bot.core.batch import BatchPending
+from bot.core.deadline import TimeBudgetExceeded
+from bot.core.cache import discard_responses, fresh_responses, track_responses
+from bot.utils.stream_guard import StreamGuard, GenerationAborted, PYTHON_COMMENTS, SQL_COMMENTS, TF_COMMENTS
+from bot.utils.docstring_splicer import collect_symbols, number_lines, parse_annotations, splice_annotations
+from bot.utils.ast_guard import is_equivalent, match_segments, normalized_ast
+from bot.utils.doc_coverage import docstring_coverage, undocumented_view
+from bot.utils.windowing import Window, code_keys, split_windows, reconcile_window
+from bot.utils.sql_statements import split_sql_statements
+
+# Matches a response wrapped in a single Markdown code fence (```python ... ```)
+_CODE_FENCE_RE = re.compile(r"\A\s*```[\w+-]*[ \t]*\r?\n(.*?)\r?\n?```\s*\Z", re.DOTALL)
+
+# Prompt for a single top-level fragment of a module (see generate_comment_for_python_fragment)
+PYTHON_FRAGMENT_PROMPT = textwrap.dedent("""
+    You are a Python expert code reviewer.
+
+    You will be given ONE fragment of a larger Python module, plus the module header for context.
+    Annotate ONLY the fragment by:
+    - Inserting or updating docstrings for the functions and classes it defines.
+    - Adding helpful inline comments only where necessary (for non-obvious logic).
+    - **Never** modifying or uncommenting any code (especially if it is commented out).
+    - **Never** changing any logic, even if it seems broken.
+    - Preserve all original indentation, spacing, and comments exactly as-is.
+
+    ⚠️ **Critical Output Rules**:
+    - Return only the annotated fragment — never the module header or any other code.
+    - Do **not** use Markdown (` ``` ` or `python`), no prose, no explanations.
+
+    Module header (context only, do NOT return it):
+
+    {context}
+
+    Here is the fragment:
+
+    {fragment}
+
+    🔁 Repeat: Only return the annotated fragment as plain text. No markdown. No explanations. No changes to existing logic or commented code.
+""")
+
+# Prompt asking only for docstrings/comments as JSON (see generate_docstrings_for_python)
+PYTHON_DOCSTRINGS_PROMPT = textwrap.dedent("""
+    You are a Python expert code reviewer.
+
+    Write docstrings for the symbols listed below and, only where the logic is non-obvious,
+    short inline comments for individual lines of the numbered source code.
+
+    ⚠️ **Critical Output Rules**:
+    - Return ONLY a JSON object, no Markdown, no prose:
+      {{"docstrings": {{"<qualified name>": "<docstring text>"}}, "comments": {{"<line number>": "<comment text>"}}}}
+    - Use exactly the qualified names listed below; `<module>` is the module docstring.
+    - Docstring text must not include the surrounding triple quotes or indentation.
+    - Comment text must be a single line without the leading `#`.
+    - Never return source code.
+
+    Symbols: {symbols}
+
+    Here is the numbered source code:
+
+    {code}
+""")
+
+# Prompt for python_mode "undocumented": only the symbols missing a docstring, shown as a sparse excerpt
+PYTHON_UNDOCUMENTED_PROMPT = textwrap.dedent("""
+    You are a Python expert code reviewer.
+
+    Write docstrings for the symbols listed below. The excerpt only shows the parts of the
+    module needed to understand them; `...` marks lines that were left out.
+
+    ⚠️ **Critical Output Rules**:
+    - Return ONLY a JSON object, no Markdown, no prose:
+      {{"docstrings": {{"<qualified name>": "<docstring text>"}}}}
+    - Use exactly the qualified names listed below; `<module>` is the module docstring.
+    - Docstring text must not include the surrounding triple quotes or indentation.
+    - Never return source code.
+
+    Symbols: {symbols}
+
+    Here is the numbered excerpt:
+
+    {code}
+""")
+
+# Delimiter between notebook cells in a batched request (see generate_comment_for_cells)
+CELL_MARKER = "# === CELL {n} ==="
+_CELL_MARKER_RE = re.compile(r"^[ \t]*# === CELL (\d+) ===[ \t]*\r?\n?", re.MULTILINE)
+
+NOTEBOOK_CELLS_PROMPT = textwrap.dedent("""
+    You are a Python expert code reviewer.
+
+    Below are {count} Jupyter notebook code cells, each starting with a `# === CELL <n> ===` marker line.
+    Annotate every cell by adding helpful inline comments only where necessary (for non-obvious logic)
+    and docstrings for any functions or classes it defines.
+    - **Never** modifying or uncommenting any code, magics (`%`, `!`) included.
+    - **Never** changing any logic, even if it seems broken.
+    - Preserve all original indentation, spacing, and comments exactly as-is.
+
+    ⚠️ **Critical Output Rules**:
+    - Return ALL {count} cells, in order, each preceded by its unchanged `# === CELL <n> ===` marker line.
+    - Do **not** use Markdown (` ``` ` or `python`), no prose, no explanations.
+
+    Here are the cells:
+
+    {cells}
+""")
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a Markdown code fence wrapping the whole response, if the model added one."""
+    match = _CODE_FENCE_RE.match(text)
+    return match.group(1) if match else text
+
+
+def cell_code_unchanged(source: str, commented: str) -> bool:
+    """True if a commented notebook cell only differs from ``source`` in comments and docstrings.
+
+    Cells that don't parse as Python (e.g. because of ``%`` or ``!`` magics) are
+    compared line by line instead of by AST.
+    """
+    if normalized_ast(source) is not None:
+        return is_equivalent(source, commented)
+    return code_keys(commented.splitlines(), "python") == code_keys(source.splitlines(), "python")
+
+
 class CodeCommentAgent:
     """Agent for generating comments and docstrings for various code types (Python, SQL, Jupyter notebooks)."""
     
-    def __init__(self, llm):
+    def __init__(self, llm, workers: int = 1, chunk_min_lines: int | None = 400, python_mode: str = "full",
+                 notebook_batch_chars: int = 12000, notebook_batch_cells: int = 20, streaming: bool = False,
+                 verify: bool = True, repair_attempts: int = 1, max_repairs: int = 8, dedupe: bool = True,
+                 token_budget=None, window_overlap_lines: int = 20, tier_policy=None):
         """Initialize the comment agent with an LLM instance.
         
         Args:
             llm: Language model instance used for generating comments
+            workers: Maximum number of concurrent LLM calls made for a single file
+            chunk_min_lines: Python files with at least this many lines are commented
+                one top-level definition at a time (None disables chunking)
+            python_mode: 'full' to have the model return annotated source, 'docstrings'
+                to have it return only docstrings/comments as JSON that are spliced in locally,
+                or 'undocumented' to request docstrings only for symbols that lack one
+            notebook_batch_chars: Maximum characters of cell source packed into one notebook request
+            notebook_batch_cells: Maximum number of cells packed into one notebook request
+            streaming: Stream completions and cancel them as soon as the model starts
+                rewriting code instead of only adding comments
+            verify: Check that annotated Python has the same AST as the original
+                (ignoring docstrings) and regenerate only the definitions that changed
+            repair_attempts: Regeneration attempts per changed definition
+            max_repairs: Skip the file instead of repairing more definitions than this
+            dedupe: Comment identical top-level definitions only once per agent, even
+                across files, and reuse the result for every copy
+            token_budget: ``TokenBudget`` of the model; code that does not fit into one
+                request is split into overlapping windows (None disables the size check)
+            window_overlap_lines: Lines of the previous window repeated as context
+            tier_policy: ``TierPolicy`` sending simple units (files, definitions, cell
+                batches) to a cheaper model tier (None sends everything to ``llm``)
         """
         self.llm = llm
+        self.workers = workers
+        self.chunk_min_lines = chunk_min_lines
+        self.python_mode = python_mode
+        self.notebook_batch_chars = notebook_batch_chars
+        self.notebook_batch_cells = notebook_batch_cells
+        self.streaming = streaming
+        self.verify = verify
+        self.repair_attempts = repair_attempts
+        self.max_repairs = max_repairs
+        self.fragments = SingleFlight() if dedupe else None
+        self.token_budget = token_budget
+        self.window_overlap_lines = window_overlap_lines
+        self.tier_policy = tier_policy
+
+    def tier(self, language: str | None, code: str | None = None):
+        """Context manager routing the calls made inside it to the tier chosen for ``code``.
+        
+        ``language=None`` selects the main model. Without a tier policy this does nothing.
+        """
+        if self.tier_policy is None:
+            return nullcontext()
+        return self.tier_policy.use(language, code)
+
+    def _generate(self, prompt: str, original: str, comment_prefixes) -> str:
+        """Call the model for a prompt whose answer should be ``original`` plus comments.
+        
+        In streaming mode every completed output line is checked by a ``StreamGuard``;
+        on divergence the stream is closed right away, which cancels the request.
+        
+        Args:
+            prompt: Input text to send to the model
+            original: Code the answer is expected to reproduce
+            comment_prefixes: Comment prefixes of the code's language
+            
+        Returns:
+            str: The model's response
+            
+        Raises:
+            GenerationAborted: If the streamed output diverged from ``original``
+        """
+        if not self.streaming:
+            return self.llm.generate(prompt)
+
+        guard = StreamGuard(original, comment_prefixes)
+        pieces = []
+        stream = iter_generate(self.llm, prompt)
+        try:
+            for piece in stream:
+                guard.feed(piece)
+                pieces.append(piece)
+            guard.finish()
+        finally:
+            stream.close()
+        return "".join(pieces)
+
+    def _fits(self, code: str, make_prompt) -> bool:
+        """True if the full-rewrite request for ``code`` fits the model's context and output limits."""
+        return self.token_budget is None or self.token_budget.fits(make_prompt(code), code)
+
+    def _generate_windowed(self, code: str, make_prompt, language: str, comment_prefixes) -> str:
+        """Comment code that is too large for one request as concurrent overlapping windows.
+        
+        Each window is sent with the same prompt as a whole file, prefixed by a few lines of
+        the previous window as context. Only each window's own lines are kept from its
+        answer; a window whose answer is truncated or changes code is kept unchanged.
+        
+        Args:
+            code: Source code to be commented
+            make_prompt: Builds the request for a piece of code
+            language: 'python', 'sql' or 'tf' (selects the split points)
+            comment_prefixes: Comment prefixes of the code's language
+            
+        Returns:
+            str: The commented code
+        """
+        budget = self.token_budget
+        windows = split_windows(code, language, budget.code_capacity(make_prompt("")), budget.count,
+                                self.window_overlap_lines)
+        print(f"[⧉] {len(code.splitlines())} lines exceed one request; commenting {len(windows)} windows")
+
+        def comment(window):
+            with track_responses() as served:
+                response = strip_code_fences(self._generate(make_prompt(window.text), window.text, comment_prefixes))
+            return response, served
+
+        parts = []
+        for window, answer, error in ordered_map(comment, windows, self.workers):
+            core = None
+            if error is None:
+                response, served = answer
+                core = reconcile_window(window, response, language)
+                if core is None:
+                    discard_responses(served)
+            if core is None:
+                if not isinstance(error, (BatchPending, TimeBudgetExceeded)):
+                    end_line = window.start_line + len(window.core.splitlines()) - 1
+                    print(f"⚠️  Keeping lines {window.start_line}-{end_line} uncommented: "
+                          f"{error or 'answer was truncated or changed code'}")
+                core = window.core
+            parts.append(core)
+        return "".join(parts)
 
     def generate_comment_for_python(self, code: str) -> str:
         """Generate Python docstrings and comments for the given code.
         
+        Large modules are split at top-level ``def``/``class`` boundaries and each
+        piece is commented concurrently (see ``generate_comment_for_python_chunked``).
+        
         Args:
             code: Python source code to be commented
             
         Returns:
             str: The original code with added docstrings and comments
         """
-        
+        with track_responses() as served:
+            if self.python_mode == "docstrings":
+                spliced = self.generate_docstrings_for_python(code)
+                if spliced is not None:
+                    return self.verify_python(code, spliced, served)
+            elif self.python_mode == "undocumented":
+                spliced = self.generate_docstrings_for_undocumented(code)
+                if spliced is not None:
+                    return self.verify_python(code, spliced, served)
+
+            oversized = not self._fits(code, self._python_prompt)
+            if oversized or (self.chunk_min_lines and code.count("\n") + 1 >= self.chunk_min_lines):
+                chunked = self.generate_comment_for_python_chunked(code)
+                if chunked is not None:
+                    return self.verify_python(code, chunked, served)
+            if oversized:
+                windowed = self._generate_windowed(code, self._python_prompt, "python", PYTHON_COMMENTS)
+                return self.verify_python(code, windowed, served)
 
-        prompt = f"""
+            response = self._generate(self._python_prompt(code), code, PYTHON_COMMENTS)
+            return self.verify_python(code, response, served)
+
+    @staticmethod
+    def _python_prompt(code: str) -> str:
+        """Full-rewrite request for Python source."""
+        return f"""
         You are a Python expert code reviewer.
 
         Your job is to annotate the given Python source code by:
@@ -46,19 +330,246 @@ class CodeCommentAgent:
         🔁 Repeat: Only return the fully annotated Python source code as plain text. No markdown. No explanations. No changes to existing logic or commented code. No blank lines removed. Do not try to fix or uncomment anything. Preserve all existing structure exactly as-is.
         """
 
+    def verify_python(self, code: str, updated: str, served=()) -> str | None:
+        """Make sure annotated code only differs from the original in docstrings and comments.
+        
+        Top-level definitions whose AST changed are regenerated on their own (one small
+        request each) and kept unchanged if they still diverge; everything the model got
+        right is kept from its answer. Answers that changed code are evicted from the
+        response cache, and repair retries bypass it, so no run replays a rejected answer.
+        
+        Args:
+            code: Original Python source
+            updated: Annotated source returned by the model
+            served: Cache entries of the responses ``updated`` was built from (see ``track_responses``)
+            
+        Returns:
+            str: Verified (possibly repaired) source, or None if too much of the file
+                diverged to repair
+        """
+        if not self.verify:
+            return updated
+        updated = strip_code_fences(updated)
+        if is_equivalent(code, updated):
+            return updated
+        pairs = match_segments(code, updated)
+        if pairs is None:
+            return updated  # The original doesn't parse, so there is nothing to compare against
+        discard_responses(served)
+
+        diverged = [segment for segment, text in pairs if text is None]
+        names = ", ".join(segment.name or f"module code at line {segment.start_line}" for segment in diverged)
+        if len(diverged) > self.max_repairs:
+            print(f"❌ Model changed {len(diverged)} definitions beyond comments ({names}); leaving file unchanged")
+            return None
+        print(f"⚠️  Model changed code in {names}; regenerating only those")
+
+        context = module_header([segment for segment, _ in pairs])
+
+        def repair(segment):
+            _, body, _ = split_layout(segment.text)
+            with self.tier(None):  # Repairs always go to the main model
+                for attempt in range(self.repair_attempts):
+                    # Retries must reach the model: a cached answer would be the one just rejected
+                    with fresh_responses() if attempt else nullcontext(), track_responses() as attempt_served:
+                        candidate = restore_layout(segment.text, self.generate_comment_for_python_fragment(body, context))
+                    if is_equivalent(segment.text, candidate):
+                        return candidate
+                    discard_responses(attempt_served)
+            return None
+
+        repaired = {}
+        for segment, result, error in ordered_map(repair, diverged, self.workers):
+            if result is None and not isinstance(error, (BatchPending, TimeBudgetExceeded)):
+                print(f"⚠️  Keeping {segment.name or 'module code'} at line {segment.start_line} uncommented: "
+                      f"{error or 'still changed after retry'}")
+            repaired[id(segment)] = result or segment.text
+
+        parts = []
+        for segment, text in pairs:
+            if text is None:
+                text = repaired[id(segment)]
+            elif segment.has_code:
+                _, body, _ = split_layout(text)
+                text = restore_layout(segment.text, body)
+            parts.append(text)
+        return "".join(parts)
+
+    def generate_docstrings_for_python(self, code: str) -> str | None:
+        """Ask the model for docstrings/comments only and splice them into the source locally.
+        
+        The model answers with a compact JSON map instead of echoing the whole file, so
+        output tokens scale with the documentation written rather than the file size.
+        
+        Args:
+            code: Python source code to be commented
+            
+        Returns:
+            str: The code with docstrings and comments inserted, or None if the code does
+                not parse or the response is not valid JSON
+        """
+        try:
+            symbols = list(collect_symbols(ast.parse(code)))
+        except (SyntaxError, ValueError):
+            return None
+
+        prompt = PYTHON_DOCSTRINGS_PROMPT.format(symbols=", ".join(symbols), code=number_lines(code))
+        if self.token_budget is not None and not self.token_budget.fits_prompt(prompt):
+            return None  # Too large for one request; the windowed full rewrite handles it
         response = self.llm.generate(prompt)
-        return response
+        try:
+            docstrings, comments = parse_annotations(response)
+        except ValueError as e:
+            print(f"⚠️  Could not parse docstring JSON from model ({e}), falling back to full rewrite")
+            return None
+        return splice_annotations(code, docstrings, comments)
+
+    def generate_docstrings_for_undocumented(self, code: str) -> str | None:
+        """Request docstrings only for the symbols that lack one and splice them in.
+        
+        The prompt holds a sparse excerpt with just those symbols, so documented code
+        is neither re-sent nor regenerated.
+        
+        Args:
+            code: Python source code to be documented
+            
+        Returns:
+            str: The code with the missing docstrings inserted (unchanged if nothing is
+                missing), or None if the code does not parse or the response is not valid JSON
+        """
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+        missing = docstring_coverage(code, tree).undocumented
+        if not missing:
+            return code
+
+        prompt = PYTHON_UNDOCUMENTED_PROMPT.format(symbols=", ".join(missing), code=undocumented_view(code, missing, tree))
+        if self.token_budget is not None and not self.token_budget.fits_prompt(prompt):
+            return None  # Too large for one request; the windowed full rewrite handles it
+        response = self.llm.generate(prompt)
+        try:
+            docstrings, _ = parse_annotations(response)
+        except ValueError as e:
+            print(f"⚠️  Could not parse docstring JSON from model ({e}), falling back to full rewrite")
+            return None
+        # Never touch docstrings that already exist
+        return splice_annotations(code, {name: text for name, text in docstrings.items() if name in missing})
+
+    def generate_comment_for_python_fragment(self, fragment: str, context: str = "") -> str:
+        """Generate docstrings and comments for one top-level fragment of a module.
+        
+        Args:
+            fragment: Source of a single top-level definition or block of module-level code
+            context: Module header (imports, constants) shown to the model but not returned
+            
+        Returns:
+            str: The fragment with added docstrings and comments
+        """
+        # Code is substituted after dedenting so its first line keeps its real indentation
+        def make_prompt(text):
+            return PYTHON_FRAGMENT_PROMPT.format(context=context, fragment=text)
+
+        if not self._fits(fragment, make_prompt):
+            return self._generate_windowed(fragment, make_prompt, "python", PYTHON_COMMENTS)
+        return strip_code_fences(self._generate(make_prompt(fragment), fragment, PYTHON_COMMENTS))
+
+    def _comment_fragment_once(self, fragment: str, context: str) -> str:
+        """Comment a fragment, reusing the result for a definition seen before in this run."""
+        if self.fragments is None:
+            return self.generate_comment_for_python_fragment(fragment, context)
+        (original, commented), shared = self.fragments.do(
+            unit_key("py-fragment", fragment),
+            lambda: (fragment, self.generate_comment_for_python_fragment(fragment, context)),
+        )
+        return transfer_annotations(original, commented, fragment) if shared else commented
+
+    def generate_comment_for_python_chunked(self, code: str) -> str | None:
+        """Comment a module one top-level definition at a time.
+        
+        Every segment containing code is sent as its own concurrent request with the
+        module header as shared context. Whitespace between segments is kept verbatim,
+        so the result lines up byte-for-byte with the original layout. A segment whose
+        request fails is kept unchanged.
+        
+        Args:
+            code: Python source code to be commented
+            
+        Returns:
+            str: The commented module, or None if it cannot be split (e.g. syntax error)
+        """
+        segments = split_python_module(code)
+        if not segments or sum(seg.has_code for seg in segments) < 2:
+            return None
+        context = module_header(segments)
+
+        def comment(segment):
+            if not segment.has_code:
+                return segment.text
+            _, body, _ = split_layout(segment.text)
+            with self.tier("python", body):
+                return restore_layout(segment.text, self._comment_fragment_once(body, context))
+
+        parts = []
+        for segment, result, error in ordered_map(comment, segments, self.workers):
+            if error is not None:
+                if not isinstance(error, (BatchPending, TimeBudgetExceeded)):  # Queued or refused answers are reported per file by the pipeline
+                    print(f"⚠️  Could not comment {segment.name or 'module code'} at line {segment.start_line}: {error}")
+                result = segment.text
+            parts.append(result)
+        return "".join(parts)
 
     def generate_comment_for_sql(self, code: str) -> str:
-        """Generate SQL comments for the given query.
+        """Generate SQL comments for the given script, one statement at a time.
+        
+        The script is split into statements (see ``split_sql_statements``). Only
+        non-trivial ones (joins, CTEs, subqueries, aggregations, window functions,
+        procedural bodies) are sent to the model, each as its own concurrent request;
+        trivial DDL and DML never reach it. Whitespace and comments between statements
+        are kept verbatim. A statement whose request fails, or whose answer is truncated
+        or changes code, is kept unchanged.
         
         Args:
-            code: SQL query to be commented
+            code: SQL script to be commented
             
         Returns:
             str: The original SQL with added comments
         """
-        prompt = f"""
+        statements = split_sql_statements(code)
+
+        def comment(statement):
+            if not statement.nontrivial:
+                return statement.text
+            _, body, _ = split_layout(statement.text)
+            with self.tier("sql", body):
+                return restore_layout(statement.text, self._comment_sql_statement(body))
+
+        parts = []
+        for statement, result, error in ordered_map(comment, statements, self.workers):
+            if error is not None:
+                if not isinstance(error, (BatchPending, TimeBudgetExceeded)):
+                    print(f"⚠️  Could not comment the SQL statement at line {statement.start_line}: {error}")
+                result = statement.text
+            parts.append(result)
+        return "".join(parts)
+
+    def _comment_sql_statement(self, statement: str) -> str:
+        """Comment one statement, windowing it if it is too large for one request."""
+        if not self._fits(statement, self._sql_prompt):
+            return self._generate_windowed(statement, self._sql_prompt, "sql", SQL_COMMENTS)
+        with track_responses() as served:
+            response = strip_code_fences(self._generate(self._sql_prompt(statement), statement, SQL_COMMENTS))
+        commented = reconcile_window(Window(statement, 0, statement, 1), response, "sql")
+        if commented is None:
+            discard_responses(served)
+            raise ValueError("answer was truncated or changed code")
+        return commented
+
+    @staticmethod
+    def _sql_prompt(code: str) -> str:
+        """Full-rewrite request for SQL."""
+        return f"""
         You are an expert SQL code annotator.
 
         Your task is to add **concise and meaningful inline comments** to the given SQL query. Only comment on non-trivial logic such as joins, subqueries, aggregations, filters, or expressions. Do **not** comment on simple SELECTs, FROMs, or aliases unless there is useful context to add.
@@ -76,9 +587,6 @@ class CodeCommentAgent:
         Now return ONLY the annotated SQL query as plain text.
         """
     
-        response = self.llm.generate(prompt)
-        return response
-    
     def generate_comment_for_tf(self, code: str) -> str:
         """Generate Terraform comments for the given code.
         
@@ -88,7 +596,15 @@ class CodeCommentAgent:
         Returns:
             str: The original Terraform code with added comments
         """
-        prompt = f"""
+        if not self._fits(code, self._tf_prompt):
+            return self._generate_windowed(code, self._tf_prompt, "tf", TF_COMMENTS)
+        response = self._generate(self._tf_prompt(code), code, TF_COMMENTS)
+        return response
+
+    @staticmethod
+    def _tf_prompt(code: str) -> str:
+        """Full-rewrite request for Terraform."""
+        return f"""
         You are a Terraform (HCL) expert.
 
         Your job is to annotate the given Terraform (.tf) source code by:
@@ -113,14 +629,14 @@ class CodeCommentAgent:
 
         🔁 Repeat: Only return the annotated Terraform source code as plain text. No Markdown. No prose. No formatting changes. No blank lines removed.
         """
-        
-        response = self.llm.generate(prompt)
-        return response
 
 
     def generate_comment_for_ipynb(self, nb_node) -> dict:
         """Generate comments for all code cells in a Jupyter notebook.
         
+        Cells are packed into a few multi-cell requests that run concurrently
+        (see ``generate_comment_for_cells``).
+        
         Args:
             nb_node: Jupyter notebook node object
             
@@ -128,8 +644,88 @@ class CodeCommentAgent:
             dict: Modified notebook with commented code cells
         """
         modified_nb = nb_node.copy()
-        for cell in modified_nb.cells:
-            if cell.cell_type == 'code' and cell.source.strip():  # Only process non-empty code cells
-                commented_code = self.generate_comment_for_python(cell.source)
-                cell.source = commented_code
-        return modified_nb
\ No newline at end of file
+        cells = [
+            (index, cell.source)
+            for index, cell in enumerate(modified_nb.cells)
+            if cell.cell_type == 'code' and cell.source.strip()  # Only process non-empty code cells
+        ]
+        for index, commented_code in self.generate_comment_for_cells(cells).items():
+            modified_nb.cells[index].source = commented_code
+        return modified_nb
+
+    def generate_comment_for_cells(self, cells: list) -> dict:
+        """Comment notebook code cells using a small number of concurrent batched requests.
+        
+        Consecutive cells are packed into delimited batches of at most
+        ``notebook_batch_chars`` characters, so a notebook costs a few calls instead of
+        one per cell. Cells missing from a batch response are retried one at a time.
+        
+        Args:
+            cells: List of ``(key, source)`` tuples for non-empty code cells
+            
+        Returns:
+            dict: Mapping of cell key to commented source (failed cells are omitted)
+        """
+        batches, current, size = [], [], 0
+        for key, source in cells:
+            if current and (size + len(source) > self.notebook_batch_chars or len(current) >= self.notebook_batch_cells):
+                batches.append(current)
+                current, size = [], 0
+            current.append((key, source))
+            size += len(source)
+        if current:
+            batches.append(current)
+
+        results = {}
+        for batch, commented, error in ordered_map(self._comment_cell_batch, batches, self.workers):
+            if error is not None:
+                if not isinstance(error, (BatchPending, TimeBudgetExceeded)):
+                    print(f"⚠️  Notebook batch of {len(batch)} cells failed: {error}")
+                continue
+            results.update(commented)
+        return results
+
+    def _comment_cell_batch(self, batch: list) -> dict:
+        """Comment one batch of cells; cells the model dropped or changed are redone one at a time."""
+        if len(batch) == 1:
+            key, source = batch[0]
+            return self._comment_cell(key, source)
+
+        cells = "\n".join(f"{CELL_MARKER.format(n=n)}\n{source}" for n, (_, source) in enumerate(batch, start=1))
+        try:
+            with self.tier("python", "\n".join(source for _, source in batch)), track_responses() as served:
+                response = strip_code_fences(self._generate(
+                    NOTEBOOK_CELLS_PROMPT.format(count=len(batch), cells=cells), cells, PYTHON_COMMENTS))
+        except GenerationAborted as e:
+            print(f"⚠️  Notebook batch of {len(batch)} cells aborted ({e}); commenting its cells one at a time")
+            response = ""
+
+        parts = _CELL_MARKER_RE.split(response)
+        answers = {}
+        for number, text in zip(parts[1::2], parts[2::2]):
+            n = int(number)
+            if 1 <= n <= len(batch):
+                answers[batch[n - 1][0]] = text.strip("\r\n")
+        commented = {}
+        redo = []
+        for key, source in batch:
+            text = answers.get(key)
+            if text is not None and (not self.verify or cell_code_unchanged(source, text)):
+                commented[key] = text
+            else:
+                if text is not None:
+                    print(f"⚠️  Model changed code in notebook cell {key}; commenting it on its own")
+                redo.append((key, source))
+        if redo:
+            discard_responses(served)  # The batch answer is incomplete or changed code; don't replay it
+        for key, source in redo:
+            commented.update(self._comment_cell(key, source))
+        return commented
+
+    def _comment_cell(self, key, source: str) -> dict:
+        """Comment a single cell on the verified single-file path (empty if the result can't be trusted)."""
+        text = self.generate_comment_for_python(source)
+        if text is None or (self.verify and not cell_code_unchanged(source, text)):
+            print(f"⚠️  Keeping notebook cell {key} uncommented: model changed its code")
+            return {}
+        return {key: text}
@@ -0,0 +1,118 @@
+# bot/batch.py
+"""Submit/collect workflow for offline batch runs (``bot.cli --batch submit|collect``)."""
+
+import os
+import time
+
+from bot.core.batch import BatchStore, LocalBatchBackend, OpenAIBatchBackend, TERMINAL_STATUSES
+from bot.pipeline import run_commenting_pipeline, build_live_model
+
+
+def get_batch_backend(name: str, model_cfg: dict, batch_cfg: dict, directory: str):
+    """Create the batch backend selected in the ``batch`` config section.
+
+    Args:
+        name: 'openai' for the OpenAI-compatible Batch API or 'local' for the file-backed stand-in
+        model_cfg: The ``model`` config section (credentials, provider)
+        batch_cfg: The ``batch`` config section
+        directory: Batch job directory
+
+    Returns:
+        Backend exposing ``submit``, ``status`` and ``results``
+
+    Raises:
+        ValueError: If the backend is not supported
+    """
+    if name == "openai":
+        credentials = model_cfg.get("credentials") or {}
+        return OpenAIBatchBackend(
+            api_key=credentials.get("api_key"),
+            api_base=credentials.get("api_base"),
+            completion_window=batch_cfg.get("completion_window", "24h"),
+        )
+    elif name == "local":
+        return LocalBatchBackend(
+            os.path.join(directory, "local"),
+            build_live_model(model_cfg),
+            workers=batch_cfg.get("workers", 4),
+        )
+    raise ValueError(f"Unsupported batch backend: {name}")
+
+
+def _submit_pending(store: BatchStore, backend) -> bool:
+    """Send the requests queued during the last pipeline pass, if any."""
+    if not store.pending:
+        store.save()
+        return False
+    requests_path = store.write_requests()
+    store.state.update(batch_id=backend.submit(requests_path), backend=backend.name, status="submitted")
+    store.save()
+    print(f"📤 Submitted {len(store.pending)} requests for {len(store.pending_files)} files as batch "
+          f"{store.state['batch_id']} (round {store.state['round']}, {requests_path})")
+    return True
+
+
+def _apply_round(store: BatchStore, backend, config, **pipeline_kwargs):
+    """Write every file whose answers are all collected and submit what is still missing."""
+    run_commenting_pipeline(config=config, batch=store, **pipeline_kwargs)
+    if not _submit_pending(store, backend):
+        print("✅ Batch run complete: every file has been processed")
+
+
+def run_batch(action: str, config=None, batch_dir=None, backend_name=None, wait: bool = False, **pipeline_kwargs):
+    """Run one step of a batch sweep.
+
+    ``submit`` records every prompt of the run into a batch-API JSONL file and submits it.
+    ``collect`` polls the batch, stores its results, writes all files whose answers are
+    complete through the normal write path and submits any follow-up prompts (e.g.
+    targeted repairs) as the next round. Both steps are safe to re-run: state lives in
+    the job directory and files already written from batch results are not processed again.
+
+    Args:
+        action: 'submit' or 'collect'
+        config: Optional configuration dictionary
+        batch_dir: Job directory (overrides ``batch.dir``)
+        backend_name: Batch backend (overrides ``batch.backend``)
+        wait: For ``collect``, poll until the batch finishes instead of returning
+        **pipeline_kwargs: Passed through to ``run_commenting_pipeline``
+    """
+    config = config or {}
+    batch_cfg = config.get("batch") or {}
+    model_cfg = config.get("model") or {"provider": {"type": "deepseek"}, "model_name": pipeline_kwargs.get("model_name")}
+    store = BatchStore(batch_dir or batch_cfg.get("dir"))
+    backend = get_batch_backend(backend_name or store.state.get("backend") or batch_cfg.get("backend", "openai"),
+                                model_cfg, batch_cfg, store.directory)
+
+    if action == "submit":
+        if store.in_flight:
+            print(f"⚠️ Batch {store.state['batch_id']} is still pending; run with --batch collect first")
+            return
+        _apply_round(store, backend, config, **pipeline_kwargs)
+        return
+
+    if not store.in_flight and not store.results:
+        print("⚠️ Nothing to collect; run with --batch submit first")
+        return
+
+    if store.in_flight:
+        batch_id = store.state["batch_id"]
+        poll_interval = batch_cfg.get("poll_interval", 60)
+        status = backend.status(batch_id)
+        while wait and status not in TERMINAL_STATUSES:
+            print(f"⏳ Batch {batch_id} is {status}; checking again in {poll_interval}s")
+            time.sleep(poll_interval)
+            status = backend.status(batch_id)
+        store.state["status"] = status
+        if status not in TERMINAL_STATUSES:
+            store.save()
+            print(f"⏳ Batch {batch_id} is {status}; run --batch collect again later (or pass --wait)")
+            return
+
+        results, errors = backend.results(batch_id)
+        store.add_results(results)
+        store.state["batch_id"] = None
+        store.save()
+        print(f"📥 Batch {batch_id} {status}: {len(results)} results, {len(errors)} failed requests")
+        # Failed requests simply stay unanswered and are queued again below
+
+    _apply_round(store, backend, config, **pipeline_kwargs)
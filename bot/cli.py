@@ -1,10 +1,16 @@
 # bot/cli.py
 import argparse
-from bot.pipeline import run_commenting_pipeline
+import os
+import sys
+from bot.pipeline import run_commenting_pipeline, build_response_cache
+from bot.core.cache import project_state_dir
+from bot.batch import run_batch
+from bot.utils.telemetry import get_telemetry
 from bot.utils.config_loader import load_config
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
+    """Command-line options shared by the CLI and the GitHub Action entrypoint."""
     parser = argparse.ArgumentParser(description="Auto-comment code using LLMs")
 
     # Config fallback
@@ -21,12 +27,51 @@ def main():
 
         # bot/cli.py
     parser.add_argument(
-        "--src", nargs="+", default=["./src"], help="Source code folder(s). Space-separated."
+        "--src", nargs="+", help="Source code folder(s) or files. Space-separated. (default: project.include or ./src)"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Number of files commented concurrently (overrides project.concurrency)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", help="Skip files unchanged since the bot last wrote them (hash manifest)"
+    )
+    parser.add_argument("--since", help="Only process files changed since this git ref")
+    parser.add_argument("--report", help="Write a JSON-lines performance report (calls, files, run summary) here")
+    parser.add_argument("--metrics", help="Write a Prometheus textfile with run metrics here")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk LLM response cache")
+    parser.add_argument(
+        "--prune-cache", action="store_true", help="Evict expired/oversized response cache entries and exit"
     )
+    parser.add_argument(
+        "--batch", choices=["submit", "collect"],
+        help="Offline mode: 'submit' queues every prompt as a batch job, 'collect' applies finished results"
+    )
+    parser.add_argument("--batch-dir", help="Batch job directory (default: batch.dir, or batch/ in the project's cache folder)")
+    parser.add_argument("--batch-backend", choices=["openai", "local"], help="Batch API backend (default: batch.backend)")
+    parser.add_argument("--wait", action="store_true", help="With --batch collect, poll until the batch has finished")
+    parser.add_argument(
+        "--server", nargs="?", const="default",
+        help="Send the job to a running 'bot.cli serve' daemon (unix:/path.sock; default socket if empty)"
+    )
+    parser.add_argument("--listen", help="For 'serve': Unix socket to listen on (unix:/path.sock)")
+    return parser
+
+
+# Options a --server job carries; everything else is fixed when the daemon starts
+SERVER_JOB_OPTIONS = ("src", "incremental", "since", "report", "metrics", "server")
+
 
+def server_ignored_options(parser, args) -> list[str]:
+    """Options given on the command line that a ``--server`` job cannot carry to the daemon."""
+    return [
+        action.option_strings[0] for action in parser._actions
+        if action.option_strings and action.dest not in SERVER_JOB_OPTIONS + ("help",)
+        and getattr(args, action.dest) != action.default
+    ]
 
-    args = parser.parse_args()
 
+def config_from_args(args):
+    """Load ``--config``, or build the model section from ``--provider`` and credential flags."""
     config = load_config(args.config) if args.config else None
 
     # Only override if provider is passed (so config fallback works)
@@ -46,12 +91,90 @@ def main():
                 },
             }
         }
+    return config
 
-    run_commenting_pipeline(
-        config=config,
+
+def main():
+    # ``bot.cli serve ...`` starts the long-lived daemon with the same options
+    serve_mode = sys.argv[1:2] == ["serve"]
+    argv = sys.argv[2:] if serve_mode else sys.argv[1:]
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.server:
+        # Thin client: no config, provider SDKs or clients are loaded here
+        from bot.serve import default_address, submit_job
+
+        ignored = server_ignored_options(parser, args)
+        if ignored:
+            sys.exit(f"❌ {', '.join(ignored)} can't be combined with --server: the daemon uses the config, "
+                     f"model and cache settings it was started with")
+        address = default_address() if args.server == "default" else args.server
+        try:
+            sys.exit(submit_job(address, src=args.src, incremental=args.incremental, since=args.since,
+                                report=args.report, metrics=args.metrics))
+        except (ConnectionError, ValueError) as e:
+            sys.exit(f"❌ {e}")
+
+    config = config_from_args(args)
+
+    if serve_mode:
+        from bot.serve import socket_path, serve
+
+        if args.listen:
+            try:
+                socket_path(args.listen)
+            except ValueError as e:
+                sys.exit(f"❌ {e}")
+        serve(config, address=args.listen, model_name=args.model_name, workers=args.workers, use_cache=not args.no_cache)
+        return
+
+    if args.prune_cache:
+        cache = build_response_cache(config)
+        removed = cache.prune() if cache else 0
+        print(f"🧹 Pruned {removed} response cache entries")
+        return
+
+    pipeline_kwargs = dict(
         model_name=args.model_name,  # fallback for legacy
-        src_folder=args.src
+        src_folder=args.src,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        incremental=args.incremental,
+        since=args.since,
     )
+    try:
+        if args.batch:
+            run_batch(args.batch, config, batch_dir=args.batch_dir, backend_name=args.batch_backend, wait=args.wait,
+                      **pipeline_kwargs)
+        else:
+            run_commenting_pipeline(config=config, **pipeline_kwargs)
+    finally:
+        export_telemetry(args, config)
+
+
+def export_telemetry(args, config):
+    """Write the run report / Prometheus textfile requested on the CLI or in ``telemetry`` config.
+
+    ``telemetry.report: true`` writes the report to the project's cache folder, outside the working tree.
+    """
+    telemetry_cfg = (config or {}).get("telemetry") or {}
+    report_path = args.report or telemetry_cfg.get("report")
+    if report_path is True:
+        report_path = os.path.join(project_state_dir(), "report.jsonl")
+    metrics_path = args.metrics or telemetry_cfg.get("prometheus")
+    telemetry = get_telemetry()
+    summary = telemetry.summary()
+    print(f"📊 {summary['calls']} LLM calls, {summary['cache_hits']} cache hits, {summary['retries']} retries, "
+          f"~{summary['input_tokens']}/{summary['output_tokens']} tokens in/out, {summary['duration']}s")
+    if report_path:
+        telemetry.export_jsonl(report_path)
+        print(f"📝 Run report written to {report_path}")
+    if metrics_path:
+        telemetry.export_prometheus(metrics_path)
+        print(f"📝 Prometheus metrics written to {metrics_path}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
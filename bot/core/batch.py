@@ -0,0 +1,277 @@
+# bot/core/batch.py
+"""Offline batch jobs: record prompts as batch-API JSONL, submit them and replay collected answers."""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from bot.core.cache import ResponseCache, project_state_dir
+from bot.utils.concurrency import ordered_map
+from bot.utils.file_handler import atomic_write
+from bot.utils.manifest import file_hash, manifest_key
+from bot.utils.telemetry import current_file
+
+BATCH_DIR_NAME = "batch"  # inside the project's state directory unless batch.dir is set
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+# Batch statuses after which no more results will arrive
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchPending(RuntimeError):
+    """Raised for a prompt whose answer is not collected yet; the prompt is queued for the next batch."""
+
+
+class BatchStore:
+    """Job directory holding the batch state, collected results and request files.
+
+    Layout::
+
+        state.json            current batch id/backend/round and files already applied
+        results.jsonl         collected answers, one ``{"custom_id", "content"}`` per line
+        requests-<n>.jsonl    prompts submitted in round ``n`` (batch-API input format)
+
+    Args:
+        directory: Job directory (created if missing; default: ``batch`` in the project's state directory)
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(project_state_dir(), BATCH_DIR_NAME)
+        os.makedirs(self.directory, exist_ok=True)
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.results_path = os.path.join(self.directory, "results.jsonl")
+        self.lock = threading.Lock()
+        self.state = {"round": 0, "batch_id": None, "backend": None, "status": None, "applied": {}}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+        self.results = {}
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.results[entry["custom_id"]] = entry["content"]
+        self.pending = {}  # custom_id -> batch request line
+        self.pending_files = set()
+
+    @property
+    def in_flight(self) -> bool:
+        return bool(self.state.get("batch_id"))
+
+    def save(self):
+        atomic_write(self.state_path, json.dumps(self.state, indent=2), encoding="utf-8")
+
+    def lookup(self, custom_id: str):
+        return self.results.get(custom_id)
+
+    def record(self, custom_id: str, body: dict):
+        """Queue a request for the next batch and mark the current file as waiting for it."""
+        with self.lock:
+            self.pending.setdefault(custom_id, {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": CHAT_COMPLETIONS_URL,
+                "body": body,
+            })
+            path = current_file.get()
+            if path is not None:
+                self.pending_files.add(path)
+
+    def mark_pending(self, filepath: str):
+        with self.lock:
+            self.pending_files.add(filepath)
+
+    def is_pending(self, filepath: str) -> bool:
+        return filepath in self.pending_files
+
+    def is_applied(self, filepath: str) -> bool:
+        """True if the file was written from batch results and hasn't changed since."""
+        applied = self.state["applied"].get(manifest_key(filepath))
+        return applied is not None and os.path.exists(filepath) and applied == file_hash(filepath)
+
+    def mark_applied(self, filepath: str):
+        with self.lock:
+            self.state["applied"][manifest_key(filepath)] = file_hash(filepath)
+
+    def add_results(self, results: dict):
+        """Append collected answers (``custom_id -> content``) to ``results.jsonl``."""
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            for custom_id, content in results.items():
+                f.write(json.dumps({"custom_id": custom_id, "content": content}) + "\n")
+        self.results.update(results)
+
+    def write_requests(self) -> str:
+        """Write the queued requests as the input file of the next round and return its path."""
+        self.state["round"] += 1
+        path = os.path.join(self.directory, f"requests-{self.state['round']}.jsonl")
+        lines = [json.dumps(request) for request in self.pending.values()]
+        atomic_write(path, "\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
+
+class BatchModel:
+    """Model stand-in that answers from collected batch results and queues everything else.
+
+    Args:
+        store: Batch job store
+        provider: Provider type (part of the request id)
+        model_name: Model name sent in each request body
+        temperature: Sampling temperature sent in each request body
+        max_tokens: Optional completion limit sent in each request body
+    """
+    def __init__(self, store: BatchStore, provider=None, model_name=None, temperature=0, max_tokens=None):
+        self.store = store
+        self.provider = provider
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def generate(self, prompt: str) -> str:
+        """Return the collected answer for ``prompt``.
+
+        Raises:
+            BatchPending: If the prompt has no answer yet (it is queued for the next batch)
+        """
+        custom_id = ResponseCache.make_key(self.provider, self.model_name, self.temperature, prompt)
+        content = self.store.lookup(custom_id)
+        if content is not None:
+            return content
+        body = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+        }
+        if self.max_tokens:
+            body["max_tokens"] = self.max_tokens
+        self.store.record(custom_id, body)
+        raise BatchPending("response queued for the next batch job")
+
+
+def parse_batch_output(text: str) -> tuple[dict, dict]:
+    """Parse a batch-API output (or error) file.
+
+    Args:
+        text: JSONL content, one ``{"custom_id", "response", "error"}`` object per line
+
+    Returns:
+        tuple: ``(results, errors)`` mapping custom_id to the answer text / error message
+    """
+    results, errors = {}, {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        custom_id = entry.get("custom_id")
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        if entry.get("error") or response.get("status_code", 200) != 200 or not body.get("choices"):
+            errors[custom_id] = str(entry.get("error") or body.get("error") or f"HTTP {response.get('status_code')}")
+            continue
+        results[custom_id] = body["choices"][0]["message"].get("content") or ""
+    return results, errors
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API (also offered by OpenAI-compatible providers such as Groq).
+
+    Args:
+        api_key: API key (default: ``OPENAI_API_KEY``)
+        api_base: Base URL of the API (default: OpenAI)
+        completion_window: Batch completion window
+    """
+    name = "openai"
+
+    def __init__(self, api_key=None, api_base=None, completion_window="24h"):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=api_base)
+        self.completion_window = completion_window
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> tuple[dict, dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results, errors = {}, {}
+        # Expired/cancelled batches still return whatever finished before they stopped
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                found, failed = parse_batch_output(self.client.files.content(file_id).text)
+                results.update(found)
+                errors.update(failed)
+        return results, errors
+
+
+class LocalBatchBackend:
+    """File-backed stand-in for a batch API that answers requests with a regular model.
+
+    ``submit`` only copies the input file; the requests are answered the first time
+    the batch is polled, and results are written in the batch-API output format.
+
+    Args:
+        directory: Directory holding the local batches
+        llm: Model used to answer the requests
+        workers: Concurrent requests while answering a batch
+    """
+    name = "local"
+
+    def __init__(self, directory: str, llm, workers: int = 4):
+        self.directory = directory
+        self.llm = llm
+        self.workers = workers
+
+    def _batch_dir(self, batch_id: str) -> str:
+        return os.path.join(self.directory, batch_id)
+
+    def submit(self, requests_path: str) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        os.makedirs(self._batch_dir(batch_id))
+        shutil.copyfile(requests_path, os.path.join(self._batch_dir(batch_id), "input.jsonl"))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        output_path = os.path.join(self._batch_dir(batch_id), "output.jsonl")
+        if not os.path.exists(output_path):
+            self._process(batch_id, output_path)
+        return "completed"
+
+    def _process(self, batch_id: str, output_path: str):
+        with open(os.path.join(self._batch_dir(batch_id), "input.jsonl"), "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+
+        def answer(request):
+            return self.llm.generate(request["body"]["messages"][-1]["content"])
+
+        lines = []
+        for request, content, error in ordered_map(answer, requests, self.workers):
+            entry = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "error": None}
+            if error is not None:
+                entry["response"] = None
+                entry["error"] = {"message": str(error)}
+            else:
+                entry["response"] = {"status_code": 200, "body": {
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["body"].get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                }}
+            lines.append(json.dumps(entry))
+        atomic_write(output_path, "\n".join(lines) + "\n", encoding="utf-8")
+
+    def results(self, batch_id: str) -> tuple[dict, dict]:
+        with open(os.path.join(self._batch_dir(batch_id), "output.jsonl"), "r", encoding="utf-8") as f:
+            return parse_batch_output(f.read())
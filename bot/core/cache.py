@@ -0,0 +1,259 @@
+# bot/core/cache.py
+"""On-disk, content-addressed cache for LLM responses."""
+
+import contextvars
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from bot.core.streaming import iter_generate
+from bot.utils.file_handler import atomic_write
+from bot.utils.telemetry import get_telemetry
+
+
+def default_cache_dir() -> str:
+    """Return the default cache location (``$XDG_CACHE_HOME/auto-code-commenter``).
+
+    The cache deliberately lives outside the working tree so that the GitHub
+    Action's ``git add -A`` never commits it.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "auto-code-commenter")
+
+
+def project_state_dir(root: str = ".") -> str:
+    """Return the per-project folder (under the cache directory) for run state such as manifests and reports.
+
+    Like the cache, run state stays out of the working tree; projects are told apart
+    by a hash of their real path.
+
+    Args:
+        root: Project directory (default: the current directory)
+    """
+    project = hashlib.sha256(os.path.realpath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(default_cache_dir(), "projects", project)
+
+
+class ResponseCache:
+    """Stores one JSON file per response, sharded by the first two hex digits of its key.
+
+    Args:
+        directory: Folder holding the cache entries
+        max_age_days: Entries older than this are treated as misses and pruned (None = forever)
+        max_size_mb: Total size the cache is pruned down to, oldest entries first (None = unbounded)
+    """
+    def __init__(self, directory=None, max_age_days=30, max_size_mb=512):
+        self.directory = directory or default_cache_dir()
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+
+    @staticmethod
+    def make_key(provider, model_name, temperature, prompt: str) -> str:
+        """Build the content address for a request.
+
+        Args:
+            provider: Provider type (e.g. 'openai')
+            model_name: Model identifier
+            temperature: Sampling temperature
+            prompt: Full prompt text
+
+        Returns:
+            str: Hex SHA-256 digest identifying the request
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        material = json.dumps([provider, model_name, temperature, prompt_hash])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _expired(self, created: float) -> bool:
+        return self.max_age_days is not None and time.time() - created > self.max_age_days * 86400
+
+    def get(self, key: str):
+        """Return the cached response for ``key`` or None on a miss/expired entry."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry.get("created", 0)):
+            return None
+        try:
+            os.utime(path)  # Refresh mtime so size-based pruning evicts least recently used first
+        except OSError:
+            pass
+        return entry.get("response")
+
+    def set(self, key: str, response: str):
+        """Store a response under ``key``."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, json.dumps({"created": time.time(), "response": response}), encoding="utf-8")
+
+    def delete(self, key: str) -> bool:
+        """Remove the entry for ``key``; returns True if there was one."""
+        return bool(_remove(self._path(key)))
+
+    def prune(self) -> int:
+        """Evict expired entries, then the least recently used ones until under ``max_size_mb``.
+
+        Returns:
+            int: Number of entries removed
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        entries = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        removed = 0
+        now = time.time()
+        kept = []
+        for mtime, size, path in entries:
+            # Age is judged by last use here; get() separately rejects entries created too long ago
+            if self.max_age_days is not None and now - mtime > self.max_age_days * 86400:
+                removed += _remove(path)
+            else:
+                kept.append((mtime, size, path))
+
+        if self.max_size_mb is not None:
+            budget = self.max_size_mb * 1024 * 1024
+            total = sum(size for _, size, _ in kept)
+            for mtime, size, path in sorted(kept):
+                if total <= budget:
+                    break
+                removed += _remove(path)
+                total -= size
+        return removed
+
+
+def _remove(path: str) -> int:
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
+
+
+# Lists collecting the entries CachedModel serves inside track_responses() blocks (innermost last)
+_tracked = contextvars.ContextVar("tracked_responses", default=())
+_fresh = contextvars.ContextVar("fresh_responses", default=False)
+
+
+@contextmanager
+def track_responses():
+    """Record the cache entry of every response generated or replayed inside the block.
+
+    Worker threads started through ``ordered_map`` inherit the block. When the answer
+    built from these responses is rejected, ``discard_responses`` evicts them so later
+    runs ask the model again instead of replaying it.
+
+    Yields:
+        list: ``(cache, key)`` pairs, filled as calls are made
+    """
+    entries = []
+    token = _tracked.set(_tracked.get() + (entries,))
+    try:
+        yield entries
+    finally:
+        _tracked.reset(token)
+
+
+def discard_responses(entries) -> int:
+    """Evict the cache entries collected by ``track_responses``.
+
+    Returns:
+        int: Number of entries removed
+    """
+    return sum(cache.delete(key) for cache, key in set(entries))
+
+
+@contextmanager
+def fresh_responses():
+    """Bypass cached answers inside the block (retries must reach the model); new answers are still stored."""
+    token = _fresh.set(True)
+    try:
+        yield
+    finally:
+        _fresh.reset(token)
+
+
+class CachedModel:
+    """Model wrapper that answers repeated prompts from a ``ResponseCache``.
+
+    Args:
+        llm: Wrapped model exposing ``generate(prompt)``
+        cache: Cache used to store responses
+        provider: Provider type, part of the cache key
+        model_name: Model name, part of the cache key
+        temperature: Sampling temperature, part of the cache key
+    """
+    def __init__(self, llm, cache: ResponseCache, provider=None, model_name=None, temperature=None):
+        self.llm = llm
+        self.cache = cache
+        self.provider = provider
+        self.model_name = model_name
+        self.temperature = temperature
+
+    def _lookup(self, key: str):
+        for entries in _tracked.get():
+            entries.append((self.cache, key))
+        return None if _fresh.get() else self.cache.get(key)
+
+    def generate(self, prompt: str) -> str:
+        """Return the cached response for ``prompt`` or call the wrapped model and store it.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Returns:
+            str: Generated (or cached) text
+        """
+        key = self.cache.make_key(self.provider, self.model_name, self.temperature, prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            get_telemetry().record_cache_hit()
+            return cached
+        response = self.llm.generate(prompt)
+        if isinstance(response, str):
+            try:
+                self.cache.set(key, response)
+            except OSError as e:
+                print(f"⚠️  Could not write response cache entry: {e}")
+        return response
+
+    def stream(self, prompt: str):
+        """Stream the response for ``prompt``, replaying cached answers as a single piece.
+
+        A streamed response is only cached once it has been consumed completely, so
+        generations aborted by the caller are never stored.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Yields:
+            str: Successive pieces of generated (or cached) text
+        """
+        key = self.cache.make_key(self.provider, self.model_name, self.temperature, prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            get_telemetry().record_cache_hit()
+            yield cached
+            return
+        pieces = []
+        for piece in iter_generate(self.llm, prompt):
+            pieces.append(piece)
+            yield piece
+        try:
+            self.cache.set(key, "".join(pieces))
+        except OSError as e:
+            print(f"⚠️  Could not write response cache entry: {e}")
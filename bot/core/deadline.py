@@ -0,0 +1,101 @@
+# bot/core/deadline.py
+"""Run-wide time budget enforced at every model call, not only when a file starts."""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from bot.core.streaming import iter_generate
+from bot.utils.telemetry import current_file
+
+# (deadline, files that had a call refused) for the run in progress, or None
+_budget = contextvars.ContextVar("time_budget", default=None)
+
+
+class TimeBudgetExceeded(RuntimeError):
+    """Raised for a file or model call that was not started because the run's time budget was used up."""
+
+
+@contextmanager
+def time_budget(deadline: float | None):
+    """Refuse model calls made inside the block once ``deadline`` has passed.
+
+    Worker threads started through ``ordered_map`` inherit the budget.
+
+    Args:
+        deadline: ``time.monotonic()`` value (None = no budget)
+
+    Yields:
+        set: Files (as set by ``track_file``) that had a call refused; their results are incomplete
+    """
+    over_budget = set()
+    token = _budget.set(None if deadline is None else (deadline, over_budget))
+    try:
+        yield over_budget
+    finally:
+        _budget.reset(token)
+
+
+def check_time_budget():
+    """Raise ``TimeBudgetExceeded`` if the current run's deadline has passed.
+
+    Raises:
+        TimeBudgetExceeded: After the deadline; the current file is recorded as over budget
+    """
+    budget = _budget.get()
+    if budget is not None and time.monotonic() >= budget[0]:
+        budget[1].add(current_file.get())
+        raise TimeBudgetExceeded("time budget used up")
+
+
+def is_over_budget(path: str) -> bool:
+    """Return True if a model call for ``path`` was refused in the current run."""
+    budget = _budget.get()
+    return budget is not None and path in budget[1]
+
+
+def mark_over_budget(path: str):
+    """Treat ``path`` as cut short by the budget (e.g. a copy sharing the result of such a file)."""
+    budget = _budget.get()
+    if budget is not None:
+        budget[1].add(path)
+
+
+class DeadlineModel:
+    """Model wrapper that checks the run's time budget before each call and between streamed pieces.
+
+    A call already waiting on the provider runs to completion (or, when streaming, to
+    its next piece), so a run overshoots its budget by at most one call.
+
+    Args:
+        llm: Wrapped model exposing ``generate(prompt)``
+    """
+    def __init__(self, llm):
+        self.llm = llm
+
+    def generate(self, prompt: str) -> str:
+        """Generate a response unless the time budget is used up.
+
+        Raises:
+            TimeBudgetExceeded: If the deadline has passed
+        """
+        check_time_budget()
+        return self.llm.generate(prompt)
+
+    def stream(self, prompt: str):
+        """Stream a response, stopping (and cancelling the request) once the deadline passes.
+
+        Yields:
+            str: Successive pieces of generated text
+
+        Raises:
+            TimeBudgetExceeded: If the deadline has passed
+        """
+        check_time_budget()
+        stream = iter_generate(self.llm, prompt)
+        try:
+            for piece in stream:
+                yield piece
+                check_time_budget()
+        finally:
+            stream.close()
@@ -1,14 +1,68 @@
-# app/core/models.py
-import os
-from bot.core.models_openai import OpenAIModel
-from bot.core.models_deepseek import DeepSeekModel
-from bot.core.models_bedrock import get_bedrock_model
+# bot/core/models.py
+"""Provider registry: a provider's module (and its SDK) is imported only when that provider is selected."""
+
+import importlib
+from importlib.metadata import entry_points
+
+# Third-party packages can add providers under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."auto_code_commenter.providers"]
+#   my_llm = "my_package.models:get_my_llm_model"
+ENTRY_POINT_GROUP = "auto_code_commenter.providers"
+
+# provider type -> "module:factory"; each factory takes the ``model`` config section
+PROVIDERS = {
+    "openai": "bot.core.models_openai:get_openai_model",
+    "deepseek": "bot.core.models_deepseek:get_deepseek_model",
+    "bedrock": "bot.core.models_bedrock:get_bedrock_model",
+    "custom": "bot.core.models_custom:get_custom_model",
+    "groq": "bot.core.models_compatible:get_groq_model",
+    "google_gemini": "bot.core.models_compatible:get_gemini_model",
+    "huggingface": "bot.core.models_compatible:get_huggingface_model",
+}
+
+
+def register_provider(name: str, factory):
+    """Register (or replace) a provider.
+
+    Args:
+        name: Provider type used in ``model.provider.type``
+        factory: Callable taking the ``model`` config section, or a lazy ``"module:attr"`` reference
+    """
+    PROVIDERS[name] = factory
+
+
+def _entry_point_providers() -> dict:
+    return {ep.name: ep for ep in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def available_providers() -> list[str]:
+    """Names of built-in, registered and entry-point providers (without importing any of them)."""
+    return sorted(set(PROVIDERS) | set(_entry_point_providers()))
+
+
+def load_provider(name: str):
+    """Resolve a provider type to its factory, importing its module on first use.
+
+    Raises:
+        ValueError: If the provider type is not supported
+    """
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        # Only scan installed distributions when the provider isn't built in
+        ep = _entry_point_providers().get(name)
+        if ep is None:
+            raise ValueError(f"Unsupported provider type: {name} (available: {', '.join(available_providers())})")
+        factory = ep.load()
+    elif isinstance(factory, str):
+        module_name, attr = factory.split(":")
+        factory = getattr(importlib.import_module(module_name), attr)
+    PROVIDERS[name] = factory
+    return factory
 
-# Add imports for other provider model wrappers here
 
 def get_model_instance(config: dict):
     """Factory function to create and return an appropriate model instance based on configuration.
-    
+
     Args:
         config (dict): Configuration dictionary containing:
             - provider: Dictionary with 'type' key specifying the model provider
@@ -16,42 +70,12 @@ def get_model_instance(config: dict):
             - temperature: Temperature parameter for model generation
             - credentials: Provider-specific authentication credentials
             - additional_params: Any additional model parameters
-    
+
     Returns:
         An instance of the requested model provider's wrapper class
-    
+
     Raises:
         ValueError: If the provider type is not supported
     """
-    provider_cfg = config.get("provider", {})
-    provider_type = provider_cfg.get("type")
-
-    if provider_type == "openai":
-        return OpenAIModel(
-            model_name=config.get("model_name"),
-            temperature=config.get("temperature", 0),
-            credentials=config.get("credentials", {}),
-            additional_params=config.get("additional_params", {}),
-        )
-    elif provider_type == "deepseek":
-        return DeepSeekModel(
-            model_name=config.get("model_name"),
-            temperature=config.get("temperature", 0),
-            credentials=config.get("credentials", {}),
-        )
-    elif provider_type == "bedrock":
-        return get_bedrock_model(config)
-    elif provider_type == "huggingface":
-        # Return HuggingFaceModel(...)
-        pass
-    elif provider_type == "google_gemini":
-        # Return GoogleGeminiModel(...)
-        pass
-    elif provider_type == "groq":
-        # Return GroqModel(...)
-        pass
-    elif provider_type == "custom":
-        # Return CustomModel(...)
-        pass
-    else:
-        raise ValueError(f"Unsupported provider type: {provider_type}")
\ No newline at end of file
+    provider_type = config.get("provider", {}).get("type")
+    return load_provider(provider_type)(config)
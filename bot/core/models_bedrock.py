@@ -32,9 +32,19 @@ class WrappedBedrockModel:
         Returns:
             The model's generated response
         """
-        print("PROMPT BEING SENT TO BEDROCK:\n", prompt)
         return self.llm.invoke(prompt)
 
+    def stream(self, prompt: str):
+        """Stream the completion for the given prompt piece by piece.
+        
+        Args:
+            prompt: Input text to send to the model
+            
+        Yields:
+            str: Each streamed text chunk
+        """
+        yield from self.llm.stream(prompt)
+
 
 def get_bedrock_model(model_cfg: dict):
     """Factory function to create a configured WrappedBedrockModel instance.
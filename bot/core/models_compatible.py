@@ -0,0 +1,86 @@
+# bot/core/models_compatible.py
+"""Providers that expose an OpenAI-compatible chat completions API (Groq, Google Gemini, Hugging Face)."""
+
+import os
+from langchain_openai import ChatOpenAI
+
+
+class OpenAICompatibleModel:
+    """Wrapper for any OpenAI-compatible chat completions endpoint.
+
+    Args:
+        model_name: Name of the model to use
+        api_key: API key sent as a bearer token
+        api_base: Base URL of the OpenAI-compatible API
+        temperature: Controls randomness (0 = deterministic)
+        max_tokens: Maximum number of tokens to generate (optional)
+        additional_params: Additional parameters passed to ChatOpenAI
+    """
+    def __init__(self, model_name, api_key, api_base, temperature=0, max_tokens=None, additional_params=None):
+        init_params = {
+            'model_name': model_name,
+            'temperature': temperature,
+            'openai_api_key': api_key,
+            'openai_api_base': api_base,
+            **(additional_params or {}),
+        }
+        if max_tokens:
+            init_params['max_tokens'] = max_tokens
+        self.llm = ChatOpenAI(**init_params)
+
+    def generate(self, prompt: str) -> str:
+        """Generate text completion for the given prompt.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Returns:
+            str: Generated text completion
+        """
+        return self.llm.invoke(prompt).content
+
+    def stream(self, prompt: str):
+        """Stream the completion for the given prompt piece by piece.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Yields:
+            str: Text of each streamed chunk
+        """
+        for chunk in self.llm.stream(prompt):
+            yield chunk.content
+
+
+def _compatible_model(model_cfg: dict, name: str, key_env: str, base_env: str, default_base: str):
+    """Build an OpenAICompatibleModel from config, falling back to the provider's environment variables."""
+    credentials = model_cfg.get("credentials") or {}
+    api_key = credentials.get("api_key") or os.getenv(key_env)
+    if not api_key:
+        raise ValueError(f"{name} API key not provided in config or environment ({key_env})")
+    return OpenAICompatibleModel(
+        model_name=model_cfg.get("model_name"),
+        api_key=api_key,
+        api_base=credentials.get("api_base") or os.getenv(base_env, default_base),
+        temperature=model_cfg.get("temperature", 0),
+        max_tokens=model_cfg.get("max_tokens"),
+        additional_params=model_cfg.get("additional_params", {}),
+    )
+
+
+def get_groq_model(model_cfg: dict):
+    """Factory for Groq models (e.g. ``llama-3.3-70b-versatile``); key from ``GROQ_API_KEY``."""
+    return _compatible_model(model_cfg, "Groq", "GROQ_API_KEY", "GROQ_API_BASE",
+                             "https://api.groq.com/openai/v1")
+
+
+def get_gemini_model(model_cfg: dict):
+    """Factory for Google Gemini models (e.g. ``gemini-2.0-flash``); key from ``GEMINI_API_KEY``."""
+    return _compatible_model(model_cfg, "Google Gemini", "GEMINI_API_KEY", "GEMINI_API_BASE",
+                             "https://generativelanguage.googleapis.com/v1beta/openai/")
+
+
+def get_huggingface_model(model_cfg: dict):
+    """Factory for Hugging Face Inference Providers models; token from ``HF_TOKEN``."""
+    return _compatible_model(model_cfg, "Hugging Face", "HF_TOKEN", "HF_API_BASE",
+                             "https://router.huggingface.co/v1")
@@ -1,10 +1,16 @@
 # app/core/models_custom.py
 import requests
-import json
+import time
+from requests.adapters import HTTPAdapter
+
+from bot.core.rate_limiter import backoff_delay, retry_after_seconds, is_rate_limit_error, is_transient_error
 
 class CustomModel:
     """A customizable model class for making API requests to external model endpoints.
-    
+
+    All requests share one pooled ``requests.Session``, so connections (and their TLS
+    sessions) to the endpoint are kept alive and reused across prompts and threads.
+
     Attributes:
         endpoint (str): The API endpoint URL
         method (str): HTTP method (default: POST)
@@ -12,12 +18,19 @@ class CustomModel:
         body_template (dict): Template for constructing request body
         response_path (str): Dot-path to extract response data
         timeout (int): Request timeout in seconds (default: 10)
+        connect_timeout (float): TCP/TLS connect timeout in seconds (default: timeout)
+        read_timeout (float): Timeout waiting for response data in seconds (default: timeout)
         retries (int): Number of retry attempts (default: 3)
+        backoff_base (float): Backoff scale between retries in seconds (default: 1.0)
+        backoff_max (float): Maximum backoff between retries in seconds (default: 30.0)
+        pool_size (int): Maximum pooled keep-alive connections to the endpoint (default: 16)
         request_format (str): Request format - 'json' or 'form' (default: 'json')
+        temperature (float): Default sampling temperature (default: 0)
+        max_tokens (int): Default maximum tokens to generate (default: 512)
     """
     def __init__(self, config):
         """Initialize CustomModel with configuration.
-        
+
         Args:
             config (dict): Configuration dictionary containing:
                 - endpoint: API endpoint URL
@@ -26,8 +39,12 @@ class CustomModel:
                 - body_template: Request body template (optional)
                 - response_path: Path to extract response (optional)
                 - timeout: Request timeout (optional)
+                - connect_timeout / read_timeout: Split timeouts (optional)
                 - retries: Retry attempts (optional)
+                - backoff_base / backoff_max: Retry backoff settings (optional)
+                - pool_size: Connection pool size (optional)
                 - request_format: Request format (optional)
+                - temperature / max_tokens: Generation defaults (optional)
         """
         self.endpoint = config["endpoint"]
         self.method = config.get("method", "POST").upper()
@@ -35,61 +52,106 @@ class CustomModel:
         self.body_template = config.get("body_template", {})
         self.response_path = config.get("response_path")
         self.timeout = config.get("timeout", 10)
+        self.connect_timeout = config.get("connect_timeout", self.timeout)
+        self.read_timeout = config.get("read_timeout", self.timeout)
         self.retries = config.get("retries", 3)
+        self.backoff_base = config.get("backoff_base", 1.0)
+        self.backoff_max = config.get("backoff_max", 30.0)
+        self.pool_size = config.get("pool_size", 16)
         self.request_format = config.get("request_format", "json")
+        self.temperature = config.get("temperature", 0)
+        self.max_tokens = config.get("max_tokens", 512)
 
-    def generate(self, prompt: str, temperature=0, max_tokens=512, stop=None):
+        # Retries are handled below (with backoff), so the adapter itself never retries
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def generate(self, prompt: str, temperature=None, max_tokens=None, stop=None):
         """Generate a response from the custom model.
-        
+
         Args:
             prompt (str): Input prompt for the model
-            temperature (float): Sampling temperature (default: 0)
-            max_tokens (int): Maximum tokens to generate (default: 512)
+            temperature (float): Sampling temperature (default: configured temperature)
+            max_tokens (int): Maximum tokens to generate (default: configured max_tokens)
             stop (str|None): Stop sequence (optional)
-            
+
         Returns:
             The generated response from the model
-            
+
         Raises:
+            requests.HTTPError: If the endpoint throttles the request (HTTP 429), so the
+                shared rate limiter sees the status code and ``Retry-After`` hint
             RuntimeError: If all retry attempts fail
         """
         # Build request body mapping using template keys or defaults
         body = {}
         body[self.body_template.get("prompt_key", "prompt")] = prompt
-        body[self.body_template.get("temperature_key", "temperature")] = temperature
-        body[self.body_template.get("max_tokens_key", "max_tokens")] = max_tokens
+        body[self.body_template.get("temperature_key", "temperature")] = self.temperature if temperature is None else temperature
+        body[self.body_template.get("max_tokens_key", "max_tokens")] = max_tokens or self.max_tokens
         if self.body_template.get("stop_key") and stop:
             body[self.body_template["stop_key"]] = stop
 
         # Format request based on specified format
         if self.request_format == "json":
-            req_data = json.dumps(body)
             headers = {"Content-Type": "application/json", **self.headers}
         elif self.request_format == "form":
-            req_data = body
             headers = {"Content-Type": "application/x-www-form-urlencoded", **self.headers}
         else:
-            req_data = body
             headers = self.headers
 
-        # Attempt request with retries
-        for _ in range(self.retries or 1):
+        # Attempt request with retries, backing off (and honoring Retry-After) between attempts
+        attempts = self.retries or 1
+        last_error = None
+        for attempt in range(attempts):
             try:
-                resp = requests.request(
+                resp = self.session.request(
                     self.method,
                     self.endpoint,
                     headers=headers,
-                    data=req_data if self.request_format != "json" else None,
+                    data=body if self.request_format != "json" else None,
                     json=body if self.request_format == "json" else None,
-                    timeout=self.timeout,
+                    timeout=(self.connect_timeout, self.read_timeout),
                 )
                 resp.raise_for_status()
                 data = resp.json()
                 # Extract nested response data using dot path
                 if self.response_path:
                     for key in self.response_path.split('.'):
-                        data = data[key]
+                        data = data[int(key)] if isinstance(data, list) else data[key]
                 return data
             except Exception as e:
+                last_error = e
                 print(f"Error calling custom model: {e}")
-        raise RuntimeError("Failed to get response from custom model")
\ No newline at end of file
+                if is_rate_limit_error(e):
+                    raise  # Throttling is backed off by RateLimitedModel for every caller, not retried here
+                if not is_transient_error(e):
+                    break  # e.g. 400/401 or a bad response_path: retrying cannot help
+                if attempt < attempts - 1:
+                    time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after_seconds(e)))
+        raise RuntimeError("Failed to get response from custom model") from last_error
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+def get_custom_model(model_cfg: dict):
+    """Factory function to create a CustomModel from the ``model`` config section.
+
+    Endpoint settings live next to the provider type, e.g.
+    ``provider: {type: custom, endpoint: https://..., pool_size: 32}``.
+
+    Args:
+        model_cfg: Model configuration dictionary
+
+    Returns:
+        Configured CustomModel instance
+    """
+    custom_cfg = {key: value for key, value in model_cfg.get("provider", {}).items() if key != "type"}
+    custom_cfg.setdefault("temperature", model_cfg.get("temperature", 0))
+    if model_cfg.get("max_tokens"):
+        custom_cfg.setdefault("max_tokens", model_cfg["max_tokens"])
+    return CustomModel(custom_cfg)
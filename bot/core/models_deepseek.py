@@ -24,6 +24,8 @@ class DeepSeekModel:
             'temperature': temperature,
             'openai_api_key': self.api_key,
             'openai_api_base': self.api_base,
+            # RateLimitedModel retries with the shared limiter; client-side retries would hide 429s from it
+            'max_retries': 0,
         }
 
         # Initialize LangChain's OpenAI client with DeepSeek's API parameters
@@ -38,4 +40,31 @@ class DeepSeekModel:
         Returns:
             str: Generated text completion
         """
-        return self.llm.predict(prompt)
\ No newline at end of file
+        return self.llm.predict(prompt)
+
+    def stream(self, prompt: str):
+        """Stream the completion for the given prompt piece by piece.
+        
+        Args:
+            prompt: Input text to send to the model
+            
+        Yields:
+            str: Text of each streamed chunk
+        """
+        for chunk in self.llm.stream(prompt):
+            yield chunk.content
+
+def get_deepseek_model(model_cfg: dict):
+    """Factory function to create a DeepSeekModel from the ``model`` config section.
+    
+    Args:
+        model_cfg: Model configuration dictionary
+        
+    Returns:
+        Configured DeepSeekModel instance
+    """
+    return DeepSeekModel(
+        model_name=model_cfg.get("model_name"),
+        temperature=model_cfg.get("temperature", 0),
+        credentials=model_cfg.get("credentials", {}),
+    )
@@ -20,7 +20,8 @@ class OpenAIModel:
             temperature=temperature,
             openai_api_key=api_key,
             max_tokens=max_tokens,
-            **(additional_params or {}),
+            # RateLimitedModel retries with the shared limiter; client-side retries would hide 429s from it
+            **{"max_retries": 0, **(additional_params or {})},
         )
 
     def generate(self, prompt: str) -> str:
@@ -32,4 +33,33 @@ class OpenAIModel:
         Returns:
             str: The generated response from the model
         """
-        return self.llm.predict(prompt)
\ No newline at end of file
+        return self.llm.predict(prompt)
+
+    def stream(self, prompt: str):
+        """Stream the completion for the given prompt piece by piece.
+        
+        Args:
+            prompt: Input text to send to the model
+            
+        Yields:
+            str: Text of each streamed chunk
+        """
+        for chunk in self.llm.stream(prompt):
+            yield chunk.content
+
+def get_openai_model(model_cfg: dict):
+    """Factory function to create an OpenAIModel from the ``model`` config section.
+    
+    Args:
+        model_cfg: Model configuration dictionary
+        
+    Returns:
+        Configured OpenAIModel instance
+    """
+    return OpenAIModel(
+        model_name=model_cfg.get("model_name"),
+        temperature=model_cfg.get("temperature", 0),
+        max_tokens=model_cfg.get("max_tokens", 1024),
+        credentials=model_cfg.get("credentials", {}),
+        additional_params=model_cfg.get("additional_params", {}),
+    )
@@ -0,0 +1,332 @@
+# bot/core/rate_limiter.py
+"""Per-provider request/token budgets with adaptive (AIMD) concurrency and retry backoff."""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from bot.core.streaming import iter_generate
+from bot.utils.telemetry import get_telemetry
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate_per_minute``.
+
+    Args:
+        rate_per_minute: Refill rate; also the bucket capacity unless ``capacity`` is given
+        capacity: Maximum burst size
+    """
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """Block until ``amount`` tokens are available and take them.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        amount = min(amount, self.capacity)  # A single oversized request must still be able to go
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def consume(self, amount: float):
+        """Take tokens without waiting; the balance may go negative and delays later callers."""
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class ProviderLimiter:
+    """Shared limiter for all calls to one provider model (see ``get_limiter``).
+
+    Concurrency follows AIMD: the in-flight limit grows by one after a full window of
+    successful calls and is halved when the provider throttles. Calls that were already
+    in flight when the limit was last halved belong to the same window, so a burst of
+    429s halves it only once. A ``Retry-After`` hint pauses every caller, not just the
+    one that was throttled.
+
+    Args:
+        rpm: Requests-per-minute budget (None = unlimited)
+        tpm: Tokens-per-minute budget (None = unlimited)
+        max_concurrency: Upper bound for in-flight calls
+        min_concurrency: Lower bound the limit never drops below
+    """
+    def __init__(self, rpm=None, tpm=None, max_concurrency: int = 16, min_concurrency: int = 1):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.reduced_at = float("-inf")  # When the limit was last halved
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Wait for a concurrency slot and the RPM/TPM budget.
+
+        Args:
+            tokens: Estimated prompt tokens for the call
+
+        Returns:
+            float: Seconds spent waiting (queue time)
+        """
+        start = time.monotonic()
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.in_flight >= self.limit:
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+        return time.monotonic() - start
+
+    def release(self, throttled: bool = False, retry_after: float | None = None, used_tokens: int = 0,
+                started: float | None = None):
+        """Return a slot and adapt the concurrency limit.
+
+        Args:
+            throttled: Whether the provider rejected the call with a rate limit
+            retry_after: Provider-requested pause in seconds, if any
+            used_tokens: Completion tokens to charge against the TPM budget
+            started: ``time.monotonic()`` when the call was sent; a throttled call sent before
+                the last reduction doesn't halve the limit again
+        """
+        if self.tokens and used_tokens:
+            self.tokens.consume(used_tokens)
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                if started is None or started >= self.reduced_at:
+                    self.limit = max(self.min_concurrency, self.limit // 2)
+                    self.reduced_at = time.monotonic()
+                self.successes = 0
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+_LIMIT_KEYS = ("rpm", "tpm", "max_concurrency", "min_concurrency")
+
+
+def get_limiter(provider: str, rate_cfg: dict | None = None, model_name: str | None = None,
+                api_base: str | None = None) -> ProviderLimiter:
+    """Return the process-wide limiter for a provider endpoint and model, creating it on first use.
+
+    Providers budget requests per model and account, so tiers and fallback routes that
+    use other models (or endpoints) of the same provider get limiters of their own.
+
+    Args:
+        provider: Provider type (e.g. 'openai')
+        rate_cfg: ``rate_limit`` config section (rpm, tpm, max_concurrency, min_concurrency)
+        model_name: Model the budget applies to
+        api_base: Endpoint the budget applies to (None = the provider's default)
+
+    Returns:
+        ProviderLimiter: Limiter shared by every model instance with the same key
+    """
+    rate_cfg = rate_cfg or {}
+    limits = {key: rate_cfg.get(key) for key in _LIMIT_KEYS}
+    key = (provider, model_name, api_base)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = (limits, ProviderLimiter(
+                rpm=limits["rpm"],
+                tpm=limits["tpm"],
+                max_concurrency=16 if limits["max_concurrency"] is None else limits["max_concurrency"],
+                min_concurrency=1 if limits["min_concurrency"] is None else limits["min_concurrency"],
+            ))
+        registered, limiter = _limiters[key]
+        if limits != registered:
+            print(f"⚠️  Conflicting rate_limit settings for {provider}/{model_name}; using the first ones: {registered}")
+    return limiter
+
+
+def _status_code(error) -> int | None:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limit_error(error) -> bool:
+    """True for HTTP 429s and provider-specific throttling errors (e.g. Bedrock ThrottlingException)."""
+    if _status_code(error) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "throttl" in text or "too many requests" in text
+
+
+def is_transient_error(error) -> bool:
+    """True for errors worth retrying: throttling, 5xx responses, timeouts and dropped connections."""
+    status = _status_code(error)
+    if is_rate_limit_error(error) or (status is not None and status >= 500):
+        return True
+    name = type(error).__name__.lower()
+    return "timeout" in name or "connection" in name
+
+
+def retry_after_seconds(error) -> float | None:
+    """Extract the ``Retry-After`` (or ``retry-after-ms``) hint from an HTTP error, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0, retry_after: float | None = None) -> float:
+    """Jittered exponential backoff ("full jitter"), never shorter than a server ``Retry-After``.
+
+    Args:
+        attempt: Zero-based retry attempt
+        base: Delay scale in seconds
+        cap: Maximum delay in seconds
+        retry_after: Server-requested delay, if any
+
+    Returns:
+        float: Seconds to sleep before the next attempt
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+
+class RateLimitedModel:
+    """Model wrapper that routes every call through a ``ProviderLimiter`` and retries throttling.
+
+    Args:
+        llm: Wrapped model exposing ``generate(prompt)``
+        limiter: Shared limiter for the provider
+        max_retries: Retries for throttled/transient failures
+        base_delay: Backoff scale in seconds
+        max_delay: Backoff cap in seconds
+    """
+    def __init__(self, llm, limiter: ProviderLimiter, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.llm = llm
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def generate(self, prompt: str) -> str:
+        """Generate a response once the provider budget allows it, retrying with backoff.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Returns:
+            str: Generated text
+
+        Raises:
+            Exception: The last error once retries are exhausted or the error is not transient
+        """
+        tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                get_telemetry().record_retry()
+            get_telemetry().record_queue_wait(self.limiter.acquire(tokens))
+            started = time.monotonic()
+            try:
+                response = self.llm.generate(prompt)
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                retry_after = retry_after_seconds(e)
+                self.limiter.release(throttled=throttled, retry_after=retry_after, started=started)
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+                print(f"⏳ {'Throttled' if throttled else 'Transient error'} ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.limiter.release(used_tokens=estimate_tokens(response) if isinstance(response, str) else 0)
+            return response
+
+    def stream(self, prompt: str):
+        """Stream a response under the provider budget.
+
+        The call holds its concurrency slot until the stream is exhausted or closed.
+        Failures are retried only while nothing has been yielded yet.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Yields:
+            str: Successive pieces of generated text
+        """
+        tokens = estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                get_telemetry().record_retry()
+            get_telemetry().record_queue_wait(self.limiter.acquire(tokens))
+            started = time.monotonic()
+            produced = 0
+            released = False
+            try:
+                for piece in iter_generate(self.llm, prompt):
+                    produced += len(piece)
+                    yield piece
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                retry_after = retry_after_seconds(e)
+                self.limiter.release(throttled=throttled, retry_after=retry_after, started=started)
+                released = True
+                if produced or attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, retry_after)
+                print(f"⏳ {'Throttled' if throttled else 'Transient error'} ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            finally:
+                if not released:  # Normal completion, or the consumer closed the stream early
+                    self.limiter.release(used_tokens=produced // 4)
+            return
@@ -0,0 +1,244 @@
+# bot/core/routing.py
+"""Routing across several providers: ordered failover and hedged duplicate requests."""
+
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bot.core.streaming import iter_generate
+from bot.utils.telemetry import get_telemetry
+
+
+class Route:
+    """One provider/model a ``RoutingModel`` can send prompts to.
+
+    Args:
+        name: Label used in log messages (e.g. 'deepseek/deepseek-chat')
+        llm: Model wrapper (usually instrumented and rate limited)
+        history: Number of recent latencies kept for percentile-based hedging
+    """
+    def __init__(self, name: str, llm, history: int = 200):
+        self.name = name
+        self.llm = llm
+        # Latency until the whole answer (generate) or its first piece (stream) arrived
+        self.latencies = {False: deque(maxlen=history), True: deque(maxlen=history)}
+        self.lock = threading.Lock()
+
+    def record_latency(self, seconds: float, streaming: bool):
+        with self.lock:
+            self.latencies[streaming].append(seconds)
+
+    def percentile(self, pct: float, streaming: bool, min_samples: int) -> float | None:
+        """Latency percentile of recent successful calls, or None until ``min_samples`` were seen."""
+        with self.lock:
+            samples = sorted(self.latencies[streaming])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class _Attempt:
+    """One route's call within a race, run on a worker thread and reported through the race's event queue."""
+    def __init__(self, route: Route, events: queue.Queue):
+        self.route = route
+        self.events = events
+        self.cancelled = threading.Event()
+        self.started = time.monotonic()
+        self.pieces = []
+        self.hedged = False
+
+    def run(self, prompt: str, streaming: bool):
+        if not streaming:
+            # A blocking call: streaming it instead would only add overhead and cancellation points
+            try:
+                text = self.route.llm.generate(prompt)
+            except Exception as e:
+                self.events.put((self, "error", e))
+                return
+            if not self.cancelled.is_set():
+                self.events.put((self, "piece", text))
+                self.events.put((self, "done", None))
+            return
+        stream = iter_generate(self.route.llm, prompt)
+        try:
+            for piece in stream:
+                if self.cancelled.is_set():
+                    return  # Closing the stream below cancels the request
+                self.events.put((self, "piece", piece))
+            self.events.put((self, "done", None))
+        except Exception as e:
+            self.events.put((self, "error", e))
+        finally:
+            stream.close()
+
+
+class RoutingModel:
+    """Model wrapper that sends each prompt to an ordered list of routes.
+
+    The first route is tried first. A route that raises, or that has not answered in
+    time, is abandoned and the next route is tried (failover). With ``hedge_after``, a
+    call still running after that many seconds, or after the given latency percentile
+    of its route (e.g. ``"p95"``), gets a duplicate on the next route. The first good
+    answer wins and the other call is cancelled: a stream is closed at its next piece
+    and a blocking call's answer is discarded.
+
+    When streaming, the race is decided by the first piece of output, so ``timeout``
+    bounds the time to the first token and a long answer that keeps producing output
+    is never abandoned; once a route has produced output there is no failover for that
+    call. Blocking calls only finish with the whole answer, which may legitimately take
+    long for big files, so they use the separate ``generate_timeout``.
+
+    Args:
+        routes: Routes in order of preference
+        timeout: Seconds a stream may take to produce its first piece (None waits forever)
+        generate_timeout: Seconds a blocking call may take to return its answer (None waits forever)
+        hedge_after: Seconds, or a percentile such as ``"p95"``, after which a
+            duplicate is sent to the next route (None disables hedging)
+        hedge_min_samples: Calls a route needs to have answered before a percentile threshold applies
+        max_workers: Threads available for calls in flight
+    """
+    def __init__(self, routes: list[Route], timeout: float | None = None, hedge_after=None,
+                 hedge_min_samples: int = 20, max_workers: int = 64, generate_timeout: float | None = None):
+        if not routes:
+            raise ValueError("RoutingModel needs at least one route")
+        self.routes = routes
+        self.timeout = timeout
+        self.generate_timeout = generate_timeout
+        self.hedge_seconds = None
+        self.hedge_percentile = None
+        if isinstance(hedge_after, str) and hedge_after.lower().startswith("p"):
+            self.hedge_percentile = float(hedge_after[1:])
+        elif hedge_after is not None:
+            self.hedge_seconds = float(hedge_after)
+        self.hedge_min_samples = hedge_min_samples
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="route")
+
+    def _hedge_time(self, attempt: _Attempt, streaming: bool) -> float | None:
+        if self.hedge_seconds is not None:
+            return attempt.started + self.hedge_seconds
+        if self.hedge_percentile is not None:
+            threshold = attempt.route.percentile(self.hedge_percentile, streaming, self.hedge_min_samples)
+            if threshold is not None:
+                return attempt.started + threshold
+        return None
+
+    def _race(self, prompt: str, streaming: bool):
+        """Run the routes for one prompt and yield the winning route's output."""
+        events = queue.Queue()
+        attempts = []
+        active = []
+        last_error = None
+        telemetry = get_telemetry()
+        timeout = self.timeout if streaming else self.generate_timeout
+
+        def launch():
+            attempt = _Attempt(self.routes[len(attempts)], events)
+            attempts.append(attempt)
+            active.append(attempt)
+            # Run in a copy of the caller's context so telemetry is attributed to the current file
+            self.executor.submit(contextvars.copy_context().run, attempt.run, prompt, streaming)
+
+        def abandon(attempt, reason):
+            nonlocal last_error
+            active.remove(attempt)
+            attempt.cancelled.set()
+            last_error = reason if isinstance(reason, Exception) else TimeoutError(reason)
+            print(f"⚠️  {attempt.route.name} failed: {reason}")
+
+        try:
+            launch()
+            winner = None
+            while winner is None:
+                if not active:
+                    if len(attempts) == len(self.routes):
+                        raise last_error
+                    print(f"↪️  Failing over to {self.routes[len(attempts)].name}")
+                    telemetry.record_route_event("failovers")
+                    launch()
+
+                now = time.monotonic()
+                wake = []
+                for attempt in active:
+                    if timeout is not None:
+                        wake.append(attempt.started + timeout)
+                    if not attempt.hedged and len(attempts) < len(self.routes):
+                        hedge_time = self._hedge_time(attempt, streaming)
+                        if hedge_time is not None:
+                            wake.append(hedge_time)
+                try:
+                    attempt, kind, value = events.get(timeout=max(0.0, min(wake) - now) if wake else None)
+                except queue.Empty:
+                    now = time.monotonic()
+                    for attempt in list(active):
+                        if timeout is not None and now >= attempt.started + timeout:
+                            abandon(attempt, f"no {'output' if streaming else 'answer'} after {timeout}s")
+                    for attempt in list(active):
+                        hedge_time = None if attempt.hedged else self._hedge_time(attempt, streaming)
+                        if hedge_time is not None and now >= hedge_time and len(attempts) < len(self.routes):
+                            attempt.hedged = True
+                            print(f"⏱️  {attempt.route.name} is slow; hedging on {self.routes[len(attempts)].name}")
+                            launch()
+                            telemetry.record_route_event("hedges")
+                    continue
+
+                if attempt not in active:
+                    continue  # Late event from an abandoned call
+                if kind == "error":
+                    abandon(attempt, value)
+                elif kind == "piece":
+                    attempt.pieces.append(value)
+                    if streaming:
+                        winner = attempt
+                else:
+                    winner = attempt
+
+            winner.route.record_latency(time.monotonic() - winner.started, streaming)
+            for attempt in active:
+                if attempt is not winner:
+                    attempt.cancelled.set()
+            if not streaming:
+                yield "".join(winner.pieces)
+                return
+            yield from winner.pieces
+            while True:
+                attempt, kind, value = events.get()
+                if attempt is not winner:
+                    continue
+                if kind == "piece":
+                    yield value
+                elif kind == "done":
+                    return
+                else:
+                    raise value
+        finally:
+            # Also reached when the caller closes the stream early
+            for attempt in attempts:
+                attempt.cancelled.set()
+
+    def generate(self, prompt: str) -> str:
+        """Return the first complete answer from the routes.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Returns:
+            str: Generated text
+
+        Raises:
+            Exception: The last route's error if every route failed
+        """
+        return "".join(self._race(prompt, streaming=False))
+
+    def stream(self, prompt: str):
+        """Stream the answer of the first route that starts producing output.
+
+        Args:
+            prompt: Input text to send to the model
+
+        Yields:
+            str: Successive pieces of generated text
+        """
+        yield from self._race(prompt, streaming=True)
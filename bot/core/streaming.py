@@ -0,0 +1,21 @@
+# bot/core/streaming.py
+"""Uniform streaming access to model wrappers."""
+
+
+def iter_generate(llm, prompt: str):
+    """Yield the model's output as it arrives.
+
+    Models without a ``stream`` method (e.g. ``CustomModel``) yield their whole
+    response as a single piece.
+
+    Args:
+        llm: Model wrapper exposing ``generate(prompt)`` and optionally ``stream(prompt)``
+        prompt: Input text to send to the model
+
+    Yields:
+        str: Successive pieces of generated text
+    """
+    if hasattr(llm, "stream"):
+        yield from llm.stream(prompt)
+    else:
+        yield llm.generate(prompt)
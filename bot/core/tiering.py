@@ -0,0 +1,102 @@
+# bot/core/tiering.py
+"""Complexity-based model tiers: simple units go to a fast/cheap model, everything else to the main one."""
+
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from bot.core.streaming import iter_generate
+from bot.utils.complexity import UnitScore, score_unit
+
+# Tier chosen for the unit currently being commented (None = main model); copied into nested worker pools
+current_tier = contextvars.ContextVar("current_tier", default=None)
+
+
+@dataclass
+class Tier:
+    """Limits a unit must stay within to be sent to a tier's model (None = no limit).
+
+    Attributes:
+        name: Tier name
+        max_lines: Non-blank lines
+        max_nodes: Python AST nodes
+        max_complexity: Python cyclomatic complexity of the most complex function
+        max_statements: SQL statements / Terraform blocks
+    """
+    name: str
+    max_lines: int | None = None
+    max_nodes: int | None = None
+    max_complexity: int | None = None
+    max_statements: int | None = None
+
+    def accepts(self, score: UnitScore) -> bool:
+        limits = (
+            (self.max_lines, score.lines),
+            (self.max_nodes, score.nodes),
+            (self.max_complexity, score.complexity),
+            (self.max_statements, score.statements),
+        )
+        # A metric that could not be measured (e.g. nodes of unparsable code) does not block the tier
+        return all(limit is None or value is None or value <= limit for limit, value in limits)
+
+
+class TierPolicy:
+    """Picks the first tier whose limits a unit stays within.
+
+    Args:
+        tiers: Tiers in order of preference (cheapest first)
+    """
+    def __init__(self, tiers: list[Tier]):
+        self.tiers = tiers
+
+    @classmethod
+    def from_config(cls, tiers_cfg: list[dict]) -> "TierPolicy":
+        """Build a policy from the ``tiers`` config section (each entry's ``model`` is ignored here)."""
+        return cls([
+            Tier(
+                name=cfg["name"],
+                max_lines=cfg.get("max_lines"),
+                max_nodes=cfg.get("max_nodes"),
+                max_complexity=cfg.get("max_complexity"),
+                max_statements=cfg.get("max_statements"),
+            )
+            for cfg in tiers_cfg
+        ])
+
+    def choose(self, language: str, code: str) -> str | None:
+        """Name of the tier for a unit, or None for the main model."""
+        score = score_unit(language, code)
+        return next((tier.name for tier in self.tiers if tier.accepts(score)), None)
+
+    @contextmanager
+    def use(self, language: str | None, code: str | None = None):
+        """Send every call made inside the block to the tier chosen for ``code``.
+
+        With ``language=None`` the calls go to the main model (e.g. for repairs).
+        """
+        token = current_tier.set(self.choose(language, code) if language else None)
+        try:
+            yield
+        finally:
+            current_tier.reset(token)
+
+
+class TieredModel:
+    """Model wrapper that forwards each call to the model of the current tier.
+
+    Args:
+        default: Model for units no tier accepts
+        tiers: Mapping of tier name to model
+    """
+    def __init__(self, default, tiers: dict):
+        self.default = default
+        self.tiers = tiers
+
+    def _model(self):
+        return self.tiers.get(current_tier.get(), self.default)
+
+    def generate(self, prompt: str) -> str:
+        return self._model().generate(prompt)
+
+    def stream(self, prompt: str):
+        yield from iter_generate(self._model(), prompt)
@@ -1,9 +1,22 @@
 # bot/pipeline.py
 
 from bot.agents.comment_agent import CodeCommentAgent
-from bot.utils.file_handler import walk_code_files, read_code, write_code
+from bot.utils.file_handler import read_code, write_code, atomic_write
+from bot.utils.discovery import iter_code_files, DEFAULT_MAX_FILE_KB
 from bot.core.models import get_model_instance
-import nbformat
+from bot.core.cache import ResponseCache, CachedModel, project_state_dir
+from bot.core.rate_limiter import RateLimitedModel, get_limiter
+from bot.core.batch import BatchModel
+from bot.core.routing import Route, RoutingModel
+from bot.core.tiering import TierPolicy, TieredModel
+from bot.core.deadline import DeadlineModel, TimeBudgetExceeded, check_time_budget, time_budget, is_over_budget, mark_over_budget
+from bot.utils.telemetry import InstrumentedModel, get_telemetry
+from bot.utils.concurrency import ordered_map, SingleFlight
+from bot.utils.dedup import unit_key, transfer_annotations
+from bot.utils.doc_coverage import docstring_coverage, format_coverage
+from bot.utils.windowing import TokenBudget
+from bot.utils.notebook import NotebookEdit, UnsupportedNotebook, read_cells, splice_sources
+from bot.utils.manifest import MANIFEST_NAME, load_manifest, save_manifest, is_unchanged, manifest_key, file_hash, changed_files_since
 import os
 
 def extract_code_from_ipynb(filepath: str) -> str:
@@ -16,17 +29,16 @@ def extract_code_from_ipynb(filepath: str) -> str:
         str: Concatenated code from all code cells in the notebook
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            nb = nbformat.read(f, as_version=4)
-        code_cells = [cell for cell in nb.cells if cell.cell_type == 'code']
-        code_str = "\n".join(cell.source for cell in code_cells)
-        return code_str
+        return "\n".join(cell.source for cell in read_cells(filepath) if cell.cell_type == 'code')
     except Exception as e:
         print(f"❌ Error reading notebook {filepath}: {e}")
         return ""
 
 def load_notebook(filepath: str):
     """Loads a notebook and returns the nbformat.NotebookNode object.
+
+    Materializes the whole notebook, outputs included; the pipeline only uses it for
+    nbformat 3 notebooks, which the lean reader in ``bot.utils.notebook`` does not handle.
     
     Args:
         filepath: Path to the Jupyter notebook file
@@ -34,6 +46,7 @@ def load_notebook(filepath: str):
     Returns:
         nbformat.NotebookNode: The notebook object or None if loading fails
     """
+    import nbformat  # Slow to import and only needed for old notebooks
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             return nbformat.read(f, as_version=4)
@@ -47,77 +60,443 @@ def write_notebook(filepath: str, notebook_node):
     Args:
         filepath: Path where the notebook should be saved
         notebook_node: The notebook object to write
+
+    Returns:
+        bool: True if the notebook was written
     """
+    import nbformat
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            nbformat.write(notebook_node, f)
+        text = nbformat.writes(notebook_node)
+        if not text.endswith("\n"):
+            text += "\n"  # Match nbformat.write, which always ends the file with a newline
+        atomic_write(filepath, text, encoding='utf-8')
+        return True
     except Exception as e:
         print(f"❌ Failed to write notebook {filepath}: {e}")
+        return False
+
+def generate_for_file(agent: CodeCommentAgent, filepath: str):
+    """Run the LLM step for a single file without touching the file on disk.
+
+    Safe to call from worker threads: it only reads the file and talks to the model.
+
+    Args:
+        agent: Comment agent used to annotate the file
+        filepath: Path of the file to annotate
+
+    Returns:
+        A ``NotebookEdit`` (or, for nbformat 3 notebooks, the updated notebook node),
+        the updated source string, or None if the file should be skipped
+
+    Raises:
+        ValueError: If the model changed too much Python code to repair
+    """
+    print(f"[...] Commenting: {filepath}")
+
+    if filepath.endswith(".ipynb"):
+        try:
+            cells = read_cells(filepath)
+        except UnsupportedNotebook:
+            nb_node = load_notebook(filepath)
+            if not nb_node:
+                print(f"⚠️  Could not load notebook {filepath}, skipping.")
+                return None
+            return agent.generate_comment_for_ipynb(nb_node)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load notebook {filepath} ({e}), skipping.")
+            return None
+        code_cells = [(cell.index, cell.source) for cell in cells if cell.cell_type == 'code' and cell.source.strip()]
+        return NotebookEdit(agent.generate_comment_for_cells(code_cells))
+
+    original = read_code(filepath)
+    if not original.strip():
+        print(f"⚠️  {filepath} is empty or could not be read, skipping.")
+        return None
+
+    if filepath.endswith(".py"):
+        coverage = docstring_coverage(original)
+        if coverage is not None:
+            get_telemetry().record_coverage(filepath, coverage.total, len(coverage.documented))
+            if agent.python_mode == "undocumented" and not coverage.undocumented:
+                print(f"[=] Fully documented: {filepath}")
+                return None
+        with agent.tier("python", original):
+            updated = agent.generate_comment_for_python(original)
+        if updated is None:
+            raise ValueError("model changed code beyond repair")  # A failure, unlike the skips above
+        return updated
+    elif filepath.endswith(".sql"):
+        updated = agent.generate_comment_for_sql(original)  # Tiers are chosen per statement
+        if updated == original:
+            print(f"[=] Nothing to comment: {filepath}")
+            return None
+        return updated
+    elif filepath.endswith(".tf"):
+        with agent.tier("tf", original):
+            return agent.generate_comment_for_tf(original)
+
+    print(f"⚠️  Skipping unsupported file {filepath}")
+    return None
+
+def generate_deduplicated(agent: CodeCommentAgent, filepath: str, units: SingleFlight, batch=None):
+    """Like ``generate_for_file``, but files with the same normalized code are generated only once.
+
+    The first file of each group is sent to the model; every later copy (vendored
+    files, ``.bak`` siblings, copy-pasted scripts) waits for that result and gets the
+    same annotations applied to its own text.
+
+    Args:
+        agent: Comment agent used to annotate the file
+        filepath: Path of the file to annotate
+        units: Results shared by all files of this run, keyed by normalized content
+        batch: Optional ``BatchStore``; a copy waits for the batch results of its original
+
+    Returns:
+        The updated notebook node or source string, or None if the file should be skipped
+    """
+    if filepath.endswith(".ipynb"):
+        # Reading the text would pull in the outputs; byte-identical notebooks still share one result
+        text, key = None, f"ipynb:{file_hash(filepath) or filepath}"
+    else:
+        # Same reader as generate_for_file: undecodable files fail instead of sharing a mangled key
+        text = read_code(filepath)
+        key = unit_key(os.path.splitext(filepath)[1], text)
+    (leader, leader_text, updated), shared = units.do(key, lambda: (filepath, text, generate_for_file(agent, filepath)))
+    if not shared:
+        return updated
+
+    print(f"[≡] Same code as {leader}, reusing its result: {filepath}")
+    if batch is not None and batch.is_pending(leader):
+        batch.mark_pending(filepath)
+    if is_over_budget(leader):
+        mark_over_budget(filepath)
+    if filepath.endswith(".py"):
+        coverage = docstring_coverage(text)
+        if coverage is not None:
+            get_telemetry().record_coverage(filepath, coverage.total, len(coverage.documented))
+    if updated is None or filepath.endswith(".ipynb"):
+        return updated
+    return transfer_annotations(leader_text, updated, text)
+
+def write_result(filepath: str, updated):
+    """Write the result of ``generate_for_file`` back to disk.
+
+    Args:
+        filepath: Path of the file that was annotated
+        updated: Notebook edit, notebook node or source string returned by the agent
+
+    Returns:
+        str: File status for the run report: "written", "skipped" (no cells changed) or "failed"
+    """
+    if isinstance(updated, NotebookEdit):
+        try:
+            if not splice_sources(filepath, updated.sources):
+                print(f"[=] No cells changed: {filepath}")
+                return "skipped"
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to write notebook {filepath}: {e}")
+            return "failed"
+    elif filepath.endswith(".ipynb"):
+        if not write_notebook(filepath, updated):
+            return "failed"
+    else:
+        print("----- begin updated snippet -----")
+        print(updated[:200])  # Show first 200 chars of updated code as preview
+        print("-----  end updated snippet  ------")
+        write_code(filepath, updated)
+    print(f"[✔] Updated: {filepath}")
+    return "written"
+
+def build_response_cache(config=None):
+    """Create the response cache described by the ``cache`` config section.
+
+    Args:
+        config: Optional configuration dictionary
 
-def run_commenting_pipeline(config=None, model_name: str = "deepseek-chat", src_folder: list[str] = ["./src"]):
+    Returns:
+        ResponseCache or None if caching is disabled
+    """
+    cache_cfg = (config or {}).get("cache") or {}
+    if not cache_cfg.get("enabled", True):
+        return None
+    return ResponseCache(
+        directory=cache_cfg.get("dir"),
+        max_age_days=cache_cfg.get("max_age_days", 30),
+        max_size_mb=cache_cfg.get("max_size_mb", 512),
+    )
+
+def build_live_model(model_cfg: dict, wrap_route=None):
+    """Create the provider model for ``model_cfg`` wrapped with telemetry and rate limiting.
+
+    With ``model.fallbacks`` (a list of further ``model``-style sections) the result is a
+    ``RoutingModel`` that fails over and hedges across the configured providers,
+    following ``model.routing``.
+
+    Args:
+        model_cfg: The ``model`` config section
+        wrap_route: Optional ``wrap_route(model, route_cfg)`` applied to each route's model
+
+    Returns:
+        Model exposing ``generate(prompt)`` and ``stream(prompt)``
+    """
+    fallbacks = model_cfg.get("fallbacks")
+    if fallbacks:
+        primary = {key: value for key, value in model_cfg.items() if key not in ("fallbacks", "routing")}
+        routing_cfg = model_cfg.get("routing") or {}
+        wrap_route = wrap_route or (lambda model, cfg: model)
+        routes = [
+            Route(f"{cfg.get('provider', {}).get('type')}/{cfg.get('model_name')}", wrap_route(build_live_model(cfg), cfg))
+            for cfg in [primary, *fallbacks]
+        ]
+        return RoutingModel(
+            routes,
+            timeout=routing_cfg.get("timeout"),
+            generate_timeout=routing_cfg.get("generate_timeout"),
+            hedge_after=routing_cfg.get("hedge_after"),
+            hedge_min_samples=routing_cfg.get("hedge_min_samples", 20),
+        )
+
+    provider_type = model_cfg.get("provider", {}).get("type")
+    model = InstrumentedModel(get_model_instance(model_cfg), provider_type, model_cfg.get("model_name"))
+    rate_cfg = model_cfg.get("rate_limit") or {}
+    return RateLimitedModel(
+        model,
+        get_limiter(provider_type, rate_cfg, model_cfg.get("model_name"),
+                    (model_cfg.get("credentials") or {}).get("api_base") or model_cfg.get("provider", {}).get("endpoint")),
+        max_retries=rate_cfg.get("max_retries", 5),
+    )
+
+class CommentingSession:
+    """Configuration, model wrappers and agent for commenting runs, built once and reused.
+
+    A one-off CLI run uses a single session; a long-lived process (``bot.serve``) keeps
+    one so provider clients, connection pools and the response cache stay warm between jobs.
+
+    Args:
+        config: Optional configuration dictionary
+        model_name: Name of the model to use when no config is given
+        workers: Number of files processed concurrently (overrides ``project.concurrency``)
+        use_cache: Whether to answer repeated prompts from the on-disk response cache
+        batch: Optional ``BatchStore``; prompts are then answered from collected batch
+            results only, unanswered ones are queued and their files left untouched
+    """
+    def __init__(self, config=None, model_name: str = "deepseek-chat", workers: int | None = None,
+                 use_cache: bool = True, batch=None):
+        self.config = config
+        self.project_cfg = {}
+        model_cfg = {"provider": {"type": "deepseek"}, "model_name": model_name}
+        if config:
+            self.project_cfg = config.get("project", {})
+            model_cfg = config.get("model", {})
+        self.model_cfg = model_cfg
+        project_cfg = self.project_cfg
+        self.include = project_cfg.get("include", [])
+        self.exclude = project_cfg.get("exclude", [])
+        self.file_types = project_cfg.get("file_types", [".py", ".sql", ".ipynb", ".tf"])
+        self.workers = max(1, int(workers or project_cfg.get("concurrency", 1)))
+        self.batch = batch
+        self.dedupe = project_cfg.get("dedupe", True)
+
+        provider_type = model_cfg.get("provider", {}).get("type")
+        self.cache = build_response_cache(config) if use_cache else None
+        if batch is not None:
+            model = self._cached(BatchModel(
+                batch,
+                provider=provider_type,
+                model_name=model_cfg.get("model_name"),
+                temperature=model_cfg.get("temperature", 0),
+                max_tokens=model_cfg.get("max_tokens"),
+            ), model_cfg)
+        else:
+            model = self._cached_live(model_cfg)
+
+        # Simple units go to cheaper tiers; a batch job keeps one model, as batch APIs require
+        tiers_cfg = (config or {}).get("tiers") or []
+        tier_policy = None
+        if tiers_cfg and batch is None:
+            tier_policy = TierPolicy.from_config(tiers_cfg)
+            model = TieredModel(model, {
+                tier["name"]: self._cached_live(tier["model"]) for tier in tiers_cfg
+            })
+
+        self.agent = CodeCommentAgent(
+            DeadlineModel(model),
+            workers=self.workers,
+            chunk_min_lines=project_cfg.get("chunk_min_lines", 400),
+            python_mode=project_cfg.get("python_mode", "full"),
+            notebook_batch_chars=project_cfg.get("notebook_batch_chars", 12000),
+            notebook_batch_cells=project_cfg.get("notebook_batch_cells", 20),
+            streaming=project_cfg.get("streaming", False),
+            verify=project_cfg.get("verify", True),
+            repair_attempts=project_cfg.get("repair_attempts", 1),
+            max_repairs=project_cfg.get("max_repairs", 8),
+            dedupe=self.dedupe,
+            token_budget=TokenBudget.for_model(
+                provider_type,
+                model_cfg.get("model_name"),
+                context_tokens=model_cfg.get("context_tokens"),
+                max_output_tokens=model_cfg.get("max_tokens"),
+                chars_per_token=model_cfg.get("chars_per_token"),
+            ),
+            window_overlap_lines=project_cfg.get("window_overlap_lines", 20),
+            tier_policy=tier_policy,
+        )
+
+    def _cached(self, model, model_cfg: dict):
+        """Wrap a model with the response cache, keyed by that model's provider and name."""
+        if not self.cache:
+            return model
+        return CachedModel(
+            model,
+            self.cache,
+            provider=model_cfg.get("provider", {}).get("type"),
+            model_name=model_cfg.get("model_name"),
+            temperature=model_cfg.get("temperature"),
+        )
+
+    def _cached_live(self, model_cfg: dict):
+        """Build the live model for ``model_cfg`` behind the response cache.
+
+        With fallbacks, every route is cached under its own provider and model, so an
+        answer is stored under the route that actually gave it and never replayed as
+        another provider's.
+        """
+        if model_cfg.get("fallbacks"):
+            return build_live_model(model_cfg, wrap_route=self._cached)
+        return self._cached(build_live_model(model_cfg), model_cfg)
+
+    def discover(self, src_folder):
+        """Yield the code files under ``src_folder`` (files or directories) that the config selects."""
+        return iter_code_files(
+            src_folder,
+            file_types=self.file_types,
+            exclude=self.exclude,
+            gitignore=self.project_cfg.get("gitignore", True),
+            max_file_kb=self.project_cfg.get("max_file_kb", DEFAULT_MAX_FILE_KB),
+        )
+
+    def run(self, src_folder=None, incremental: bool = False, since: str | None = None, only=None,
+            deadline: float | None = None) -> list[str]:
+        """Comment every selected file and write the results.
+
+        Args:
+            src_folder: Files or directories to process (default: ``project.include``)
+            incremental: Skip files whose hash matches the manifest written by the previous run
+            since: Only process files changed since this git ref
+            only: Only process these paths (compared by real path)
+            deadline: ``time.monotonic()`` value after which no new file or model call is
+                started; files cut short by it are deferred, not written
+
+        Returns:
+            list[str]: Files deferred because of ``deadline``
+        """
+        project_cfg, batch, agent = self.project_cfg, self.batch, self.agent
+        if src_folder is None:
+            src_folder = self.include or ["./src"]
+        incremental = incremental or project_cfg.get("incremental", False)
+        manifest_path = project_cfg.get("manifest") or os.path.join(project_state_dir(), MANIFEST_NAME)
+        manifest = load_manifest(manifest_path) if incremental else {}
+        changed = changed_files_since(since) if since else None
+        if only is not None:
+            only = {os.path.realpath(path) for path in only}
+            changed = only if changed is None else changed & only
+
+        def wanted(filepath):
+            if batch is not None and batch.is_applied(filepath):
+                return False
+            if changed is not None and os.path.realpath(filepath) not in changed:
+                return False
+            if incremental and is_unchanged(manifest, filepath):
+                print(f"[=] Unchanged since last run: {filepath}")
+                return False
+            return True
+
+        files = (filepath for filepath in self.discover(src_folder) if wanted(filepath))
+
+        telemetry = get_telemetry()
+        # Duplicates are only shared within a run: files may change between runs of a long-lived session
+        units = SingleFlight()
+        if self.dedupe:
+            agent.fragments = SingleFlight()
+
+        deferred = []
+
+        def generate_tracked(filepath):
+            with telemetry.track_file(filepath):
+                check_time_budget()
+                if not self.dedupe:
+                    return generate_for_file(agent, filepath)
+                return generate_deduplicated(agent, filepath, units, batch)
+
+        with time_budget(deadline) as over_budget:
+            try:
+                for filepath, updated, error in ordered_map(generate_tracked, files, self.workers):
+                    if batch is not None and batch.is_pending(filepath):
+                        # Some answers for this file are still in a batch job; never write a partial result
+                        print(f"[⏳] Waiting for batch results: {filepath}")
+                        telemetry.record_file_status(filepath, "pending")
+                        continue
+                    if isinstance(error, TimeBudgetExceeded) or filepath in over_budget:
+                        # Some calls for this file were refused; never write a partial result
+                        deferred.append(filepath)
+                        telemetry.record_file_status(filepath, "deferred")
+                        continue
+                    if error is not None:
+                        print(f"❌ Failed to comment {filepath}: {error}")
+                        continue
+                    if updated is None:
+                        telemetry.record_file_status(filepath, "skipped")
+                        if incremental:
+                            # Nothing to write (fully documented, nothing worth commenting...): don't ask again
+                            manifest[manifest_key(filepath)] = file_hash(filepath)
+                        continue
+                    status = write_result(filepath, updated)
+                    telemetry.record_file_status(filepath, status, os.path.getsize(filepath) if status == "written" else 0)
+                    if status == "failed":
+                        continue
+                    if filepath.endswith(".py"):
+                        coverage = docstring_coverage(updated)
+                        if coverage is not None:
+                            telemetry.record_coverage(filepath, coverage.total, len(coverage.documented), after=True)
+                    if incremental:
+                        manifest[manifest_key(filepath)] = file_hash(filepath)
+                    if batch is not None:
+                        batch.mark_applied(filepath)
+            finally:
+                summary = telemetry.summary()
+                if summary["symbols"]:
+                    print(f"📚 Docstring coverage: {format_coverage(summary['documented_before'], summary['symbols'])} → "
+                          f"{format_coverage(summary['documented_after'], summary['symbols'])}")
+                if incremental:
+                    save_manifest(manifest, manifest_path)
+        if deferred:
+            print(f"[⏭] Time budget used up, deferred {len(deferred)} files")
+        return deferred
+
+def run_commenting_pipeline(config=None, model_name: str = "deepseek-chat", src_folder: list[str] = ["./src"], workers: int | None = None, use_cache: bool = True, incremental: bool = False, since: str | None = None, batch=None, files: list[str] | None = None):
     """Main pipeline for generating and adding code comments.
     
     Processes all code files in the specified directory, adding comments using the specified model.
-    Handles Python files, SQL files, and Jupyter notebooks.
+    Handles Python files, SQL files, and Jupyter notebooks. LLM calls for up to ``workers``
+    files are in flight at once, while results are written one at a time in discovery order.
     
     Args:
         config: Optional configuration dictionary
         model_name: Name of the model to use for comment generation
         src_folder: Root directory containing source files to process
+        workers: Number of files processed concurrently (overrides ``project.concurrency``)
+        use_cache: Whether to answer repeated prompts from the on-disk response cache
+        incremental: Skip files whose hash matches the manifest written by the previous run
+        since: Only process files changed since this git ref
+        batch: Optional ``BatchStore``; prompts are then answered from collected batch
+            results only, unanswered ones are queued and their files left untouched
+        files: Explicit files to process instead of ``src_folder``/``project.include``
     """
-    if config:
-        project_cfg = config.get("project", {})
-        include = project_cfg.get("include", [])
-        exclude = project_cfg.get("exclude", [])
-        file_types = project_cfg.get("file_types", [".py", ".sql", ".ipynb",".tf"])
-        model_cfg = config.get("model", {})
-        model = get_model_instance(model_cfg)
-        if include:
-            src_folder = include
-    else:
-        model = get_model_instance({
-            "provider": {"type": "deepseek"},
-            "model_name": model_name,
-        })
-        file_types = [".py", ".sql", ".ipynb" ,".tf"]
-        exclude = []
-
-    agent = CodeCommentAgent(model)
-    for folder in src_folder:
-        for filepath in walk_code_files(folder):
-            if file_types and not any(filepath.endswith(ext) for ext in file_types):
-                continue
-
-            print(f"[...] Commenting: {filepath}")
-
-            if filepath.endswith(".ipynb"):
-                nb_node = load_notebook(filepath)
-                if not nb_node:
-                    print(f"⚠️  Could not load notebook {filepath}, skipping.")
-                    continue
-                updated_nb = agent.generate_comment_for_ipynb(nb_node)
-                write_notebook(filepath, updated_nb)
-                print(f"[✔] Updated: {filepath}")
-                continue  # Skip rest of loop
-
-            original = read_code(filepath)
-            if not original.strip():
-                print(f"⚠️  {filepath} is empty or could not be read, skipping.")
-                continue
-
-            if filepath.endswith(".py"):
-                updated = agent.generate_comment_for_python(original)
-            elif filepath.endswith(".sql"):
-                updated = agent.generate_comment_for_sql(original)
-            elif filepath.endswith(".tf"):
-                updated = agent.generate_comment_for_tf(original)
-            else:
-                print(f"⚠️  Skipping unsupported file {filepath}")
-                continue
-
-            print("----- begin updated snippet -----")
-            print(updated[:200])  # Show first 200 chars of updated code as preview
-            print("-----  end updated snippet  ------")
-
-            write_code(filepath, updated)
-            print(f"[✔] Updated: {filepath}")
\ No newline at end of file
+    session = CommentingSession(config, model_name=model_name, workers=workers, use_cache=use_cache, batch=batch)
+    if files is None and (config or {}).get("project", {}).get("include"):
+        src_folder = None  # project.include wins over the --src default
+    try:
+        session.run(files if files is not None else src_folder, incremental=incremental, since=since)
+    finally:
+        if session.cache:
+            session.cache.prune()
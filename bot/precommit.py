@@ -0,0 +1,91 @@
+# bot/precommit.py
+"""Pre-commit entry point: comment only the files pre-commit passes in, within a time budget.
+
+The budget is checked before every model call, so a large commit never blocks for minutes.
+Files cut short by it are remembered in the git directory and go first the next time they
+are staged; a deferred file is never rewritten as part of an unrelated commit.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bot.pipeline import CommentingSession
+from bot.utils.config_loader import load_config
+from bot.utils.file_handler import atomic_write
+from bot.utils.telemetry import get_telemetry
+
+DEFAULT_CONFIG = "ai-commenter.yaml"
+DEFAULT_BUDGET = 60  # seconds
+DEFERRED_NAME = "auto-comment-deferred.json"
+
+
+def deferred_path() -> str:
+    """Location of the deferred-files list: inside the git directory, so it is never committed."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--git-path", DEFERRED_NAME],
+            capture_output=True, text=True, check=True,
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "." + DEFERRED_NAME
+
+
+def load_deferred(path: str) -> list[str]:
+    """Files deferred by the previous run that still exist."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [p for p in json.load(f) if os.path.isfile(p)]
+    except (OSError, ValueError):
+        return []
+
+
+def save_deferred(path: str, files: list[str]):
+    if files:
+        atomic_write(path, json.dumps(files, indent=2), encoding="utf-8")
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Auto-comment the files of a commit (pre-commit hook)")
+    parser.add_argument("filenames", nargs="*", help="Files passed in by pre-commit")
+    parser.add_argument("--config", help=f"YAML config file (default: {DEFAULT_CONFIG} if present)")
+    parser.add_argument("--budget", type=float,
+                        help=f"Seconds after which remaining files are deferred; 0 disables (default: precommit.budget or {DEFAULT_BUDGET})")
+    parser.add_argument("--workers", type=int, help="Number of files commented concurrently (overrides project.concurrency)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk LLM response cache")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    state_path = deferred_path()
+    staged = list(dict.fromkeys(os.path.normpath(p) for p in args.filenames))
+    if not staged:
+        return 0
+    # Earlier deferrals go first, but only for files that are part of this commit
+    previous = [os.path.normpath(p) for p in load_deferred(state_path)]
+    files = [p for p in previous if p in staged] + [p for p in staged if p not in previous]
+    waiting = [p for p in previous if p not in staged]
+
+    config_path = args.config or (DEFAULT_CONFIG if os.path.exists(DEFAULT_CONFIG) else None)
+    config = load_config(config_path) if config_path else None
+    budget = args.budget if args.budget is not None else ((config or {}).get("precommit") or {}).get("budget", DEFAULT_BUDGET)
+
+    session = CommentingSession(config, workers=args.workers, use_cache=not args.no_cache)
+    deferred = session.run(files, deadline=started + budget if budget else None)
+    save_deferred(state_path, waiting + [os.path.normpath(p) for p in deferred])
+
+    summary = get_telemetry().summary()
+    print(f"📊 {summary['files']} in {summary['duration']}s, {summary['calls']} LLM calls, "
+          f"{summary['cache_hits']} cache hits")
+    if deferred:
+        print(f"⏭  {len(deferred)} files deferred until they are staged again (listed in {state_path})")
+    return 1 if summary["files"].get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# bot/serve.py
+"""Long-lived daemon that keeps config, provider clients, connection pools and the response cache warm.
+
+Start it with ``python -m bot.cli serve --config ai-commenter.yaml`` and send jobs with
+``python -m bot.cli --server --src path/to/file.py``. Jobs are JSON over HTTP on a Unix
+socket only: a job can rewrite any file the daemon's user can, so the daemon never listens
+on a network port, and the socket is created accessible to its owner only.
+"""
+
+import http.client
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler
+
+from bot.core.cache import default_cache_dir
+from bot.pipeline import CommentingSession
+from bot.utils.telemetry import reset_telemetry
+
+
+def default_address() -> str:
+    """Per-user Unix socket next to the response cache."""
+    return "unix:" + os.path.join(default_cache_dir(), "serve.sock")
+
+
+def socket_path(address: str) -> str:
+    """Socket path of a ``unix:/path/to.sock`` (or plain ``/path/to.sock``) address.
+
+    Raises:
+        ValueError: For ``host:port`` addresses; the daemon has no TCP listener
+    """
+    path = address.removeprefix("unix:")
+    if path == address and ":" in path and "/" not in path:
+        raise ValueError(f"{address} is not a Unix socket; the server only listens on Unix sockets")
+    return os.path.expanduser(path)
+
+
+class CommentService:
+    """Runs jobs against one warm ``CommentingSession``, one job at a time.
+
+    Jobs are serialized because each one already fans out across ``project.concurrency``
+    workers, and because a job's output is captured by redirecting stdout.
+
+    Args:
+        session: Session built once at startup
+    """
+    def __init__(self, session: CommentingSession):
+        self.session = session
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.jobs = 0
+
+    def health(self) -> dict:
+        model_cfg = self.session.model_cfg
+        return {
+            "status": "ok",
+            "provider": model_cfg.get("provider", {}).get("type"),
+            "model": model_cfg.get("model_name"),
+            "uptime": round(time.time() - self.started, 1),
+            "jobs": self.jobs,
+        }
+
+    def run_job(self, job: dict) -> dict:
+        """Run one job.
+
+        Args:
+            job: ``{"cwd", "src", "files", "incremental", "since", "report", "metrics"}``;
+                relative paths are resolved against ``cwd`` (the client's working directory)
+
+        Returns:
+            dict: ``{"output", "summary", "exit_code"}``
+        """
+        with self.lock:
+            self.jobs += 1
+            telemetry = reset_telemetry()
+            output = io.StringIO()
+            exit_code = 0
+            previous_cwd = os.getcwd()
+            try:
+                os.chdir(job.get("cwd") or previous_cwd)
+                with redirect_stdout(output):
+                    try:
+                        paths = job.get("files") if job.get("files") is not None else job.get("src")
+                        self.session.run(paths, incremental=job.get("incremental", False), since=job.get("since"))
+                    except Exception as e:
+                        print(f"❌ Job failed: {e}")
+                        exit_code = 1
+            finally:
+                os.chdir(previous_cwd)
+            summary = telemetry.summary()
+            exports = (("report", telemetry.export_jsonl, "Run report"),
+                       ("metrics", telemetry.export_prometheus, "Prometheus metrics"))
+            for key, export, label in exports:
+                if job.get(key):
+                    path = os.path.join(job.get("cwd") or previous_cwd, job[key])
+                    try:
+                        export(path)
+                        output.write(f"📝 {label} written to {path}\n")
+                    except OSError as e:
+                        output.write(f"❌ Could not write {label.lower()} to {path}: {e}\n")
+                        exit_code = exit_code or 1
+            if summary["files"].get("failed"):
+                exit_code = exit_code or 1
+            print(f"[serve] job {self.jobs}: {summary['files']} in {summary['duration']}s")
+            return {"output": output.getvalue(), "summary": summary, "exit_code": exit_code}
+
+
+def make_handler(service: CommentService):
+    """Create the HTTP request handler bound to a service."""
+
+    class ServeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/health":
+                self._send_json(200, service.health())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+            path = self.path.rstrip("/")
+            if path == "/jobs":
+                try:
+                    job = json.loads(body)
+                except json.JSONDecodeError as e:
+                    self._send_json(400, {"error": f"invalid job: {e}"})
+                    return
+                self._send_json(200, service.run_job(job))
+            elif path == "/shutdown":
+                self._send_json(200, {"status": "stopping"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self._send_json(404, {"error": "not found"})
+
+    return ServeHandler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix domain socket (only reachable by users with access to the path)."""
+    daemon_threads = True
+
+
+def serve(config=None, address: str | None = None, model_name: str = "deepseek-chat", workers: int | None = None,
+          use_cache: bool = True):
+    """Build a warm session and serve jobs until interrupted or ``POST /shutdown``.
+
+    Args:
+        config: Optional configuration dictionary
+        address: ``unix:/path`` of the socket (default: ``serve.socket`` or a per-user socket)
+        model_name: Name of the model to use when no config is given
+        workers: Number of files processed concurrently (overrides ``project.concurrency``)
+        use_cache: Whether to answer repeated prompts from the on-disk response cache
+    """
+    serve_cfg = (config or {}).get("serve") or {}
+    if address is None:
+        address = serve_cfg.get("socket") or default_address()
+    path = socket_path(address)
+
+    service = CommentService(CommentingSession(config, model_name=model_name, workers=workers, use_cache=use_cache))
+    handler = make_handler(service)
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)  # Stale socket from a previous daemon
+    # The socket file gets mode 0600 as bind() creates it, so no other user can connect even briefly
+    previous_umask = os.umask(0o177)
+    try:
+        server = UnixHTTPServer(path, handler)
+    finally:
+        os.umask(previous_umask)
+
+    print(f"🟢 Serving on unix:{path} ({service.health()['provider']} / {service.health()['model']})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+        if service.session.cache:
+            service.session.cache.prune()
+        print("🔴 Server stopped")
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def request(address: str, method: str, path: str, payload: dict | None = None, timeout=None) -> dict:
+    """Send one request to a running daemon and return its JSON answer.
+
+    Raises:
+        ConnectionError: If no daemon is listening at ``address``
+        ValueError: If ``address`` is not a Unix socket
+    """
+    conn = _UnixHTTPConnection(socket_path(address), timeout)
+    body = json.dumps(payload or {}).encode("utf-8")
+    try:
+        conn.request(method, path, body=body if method == "POST" else None,
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return json.loads(response.read() or b"{}")
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"no auto-code-commenter server at {address} ({e})") from e
+    finally:
+        conn.close()
+
+
+def submit_job(address: str, src=None, files=None, incremental: bool = False, since: str | None = None,
+               report: str | None = None, metrics: str | None = None) -> int:
+    """Forward a job to the daemon, print its output and return the job's exit code.
+
+    ``report``/``metrics`` are written by the daemon, with the job's own telemetry.
+    """
+    result = request(address, "POST", "/jobs", {
+        "cwd": os.getcwd(),
+        "src": src,
+        "files": files,
+        "incremental": incremental,
+        "since": since,
+        "report": report,
+        "metrics": metrics,
+    })
+    print(result.get("output", ""), end="")
+    if "error" in result:
+        print(f"❌ {result['error']}")
+        return 1
+    summary = result.get("summary") or {}
+    print(f"📊 {summary.get('calls', 0)} LLM calls, {summary.get('cache_hits', 0)} cache hits, "
+          f"{summary.get('duration', 0)}s (via server)")
+    return result.get("exit_code", 0)
@@ -0,0 +1,85 @@
+# bot/utils/ast_guard.py
+"""Check that commented Python code is unchanged apart from docstrings and comments."""
+
+import ast
+
+from bot.utils.python_chunks import CodeSegment, split_python_module
+
+_DOC_OWNERS = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if isinstance(node, _DOC_OWNERS) and node.body:
+            first = node.body[0]
+            if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) \
+                    and isinstance(first.value.value, str):
+                node.body = node.body[1:]
+    return tree
+
+
+def normalized_ast(code: str) -> str | None:
+    """Dump of the code's AST without docstrings, positions or comments.
+
+    Args:
+        code: Python source code
+
+    Returns:
+        str: Comparable dump, or None if the code does not parse
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    return ast.dump(_strip_docstrings(tree))
+
+
+def is_equivalent(original: str, updated: str) -> bool:
+    """True if ``updated`` parses and differs from ``original`` only in docstrings and comments."""
+    expected = normalized_ast(original)
+    return expected is not None and normalized_ast(updated) == expected
+
+
+def match_segments(original: str, updated: str) -> list[tuple[CodeSegment, str | None]] | None:
+    """Pair every top-level segment of ``original`` with its verified counterpart in ``updated``.
+
+    Definitions are matched by name and module-level code by content, so a definition
+    the model dropped, reordered or rewrote shows up as diverged without affecting the
+    others. If ``updated`` does not parse at all, every segment containing code diverges.
+
+    Args:
+        original: Source sent to the model
+        updated: Model output
+
+    Returns:
+        list: ``(segment, text)`` pairs in original order, where ``text`` is the updated
+            segment (or the original one for blank/comment-only segments) and None marks
+            a segment that diverged; None if ``original`` itself does not parse
+    """
+    segments = split_python_module(original)
+    if segments is None:
+        return None
+    candidates = [seg for seg in (split_python_module(updated) or []) if seg.has_code]
+    dumps = {id(seg): normalized_ast(seg.text) for seg in candidates}
+    used = set()
+
+    pairs = []
+    for segment in segments:
+        if not segment.has_code:
+            pairs.append((segment, segment.text))
+            continue
+        expected = normalized_ast(segment.text)
+        match = None
+        for candidate in candidates:
+            if id(candidate) in used or candidate.name != segment.name:
+                continue
+            if segment.is_symbol or dumps[id(candidate)] == expected:
+                match = candidate
+                break
+        if match is not None:
+            used.add(id(match))
+        if match is not None and dumps[id(match)] == expected:
+            pairs.append((segment, match.text))
+        else:
+            pairs.append((segment, None))
+    return pairs
@@ -0,0 +1,86 @@
+# bot/utils/complexity.py
+"""Cheap complexity scores for code units (files, top-level definitions, notebook cells)."""
+
+import ast
+import re
+from dataclasses import dataclass
+
+from bot.utils.sql_statements import split_sql_statements
+from bot.utils.windowing import line_key, tf_boundaries
+
+# Nodes that add a branch to the control flow graph
+_DECISION_NODES = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.Assert,
+                   ast.comprehension, ast.match_case)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+
+# Fallback for Python that does not parse on its own (e.g. cells with magics, partial windows)
+_BRANCH_RE = re.compile(r"\b(?:if|elif|for|while|except|and|or|case)\b")
+
+
+@dataclass
+class UnitScore:
+    """Size and complexity of one unit.
+
+    Attributes:
+        lines: Non-blank lines
+        nodes: AST node count (Python only, None if it does not parse)
+        complexity: Highest cyclomatic complexity of any function or of the module-level code (Python only)
+        statements: Top-level statements (SQL) or blocks (Terraform)
+    """
+    lines: int
+    nodes: int | None = None
+    complexity: int | None = None
+    statements: int | None = None
+
+
+def cyclomatic_complexity(tree: ast.AST) -> int:
+    """McCabe complexity of the most complex function (or of the code outside functions) in ``tree``."""
+    scores = []
+
+    def visit(scope):
+        decisions = 0
+        stack = list(ast.iter_child_nodes(scope))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, _FUNCTION_NODES):
+                visit(node)
+                continue
+            if isinstance(node, _DECISION_NODES):
+                decisions += 1 + (len(node.ifs) if isinstance(node, ast.comprehension) else 0)
+            elif isinstance(node, ast.BoolOp):
+                decisions += len(node.values) - 1
+            stack.extend(ast.iter_child_nodes(node))
+        scores.append(1 + decisions)
+
+    visit(tree)
+    return max(scores)
+
+
+def score_unit(language: str, code: str) -> UnitScore:
+    """Score a unit of code.
+
+    Args:
+        language: 'python', 'sql' or 'tf'
+        code: Source of the unit
+
+    Returns:
+        UnitScore: Its size and complexity
+    """
+    lines = code.splitlines()
+    score = UnitScore(lines=sum(1 for line in lines if line.strip()))
+    if language == "python":
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            score.complexity = 1 + len(_BRANCH_RE.findall("\n".join(line_key(line, "python") for line in lines)))
+            return score
+        score.nodes = sum(1 for _ in ast.walk(tree))
+        score.complexity = cyclomatic_complexity(tree)
+    elif language == "sql":
+        score.statements = sum(1 for statement in split_sql_statements(code) if statement.has_code)
+    elif language == "tf":
+        ends = tf_boundaries(code.splitlines(keepends=True))
+        # Code after the last block (e.g. a final attribute) counts too
+        trailing = any(line_key(line, language) for line in lines[ends[-1] if ends else 0:])
+        score.statements = len(ends) + (1 if trailing else 0)
+    return score
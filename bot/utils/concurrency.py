@@ -0,0 +1,86 @@
+# bot/utils/concurrency.py
+"""Helpers for overlapping blocking LLM calls across worker threads."""
+
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def ordered_map(fn, items, workers: int = 1, window: int | None = None):
+    """Apply ``fn`` to every item concurrently and yield results in input order.
+
+    At most ``workers`` calls run at the same time and at most ``window`` results
+    are held in memory while waiting for an earlier, slower item to finish, so
+    callers can consume (e.g. write) results in a deterministic order.
+
+    Args:
+        fn: Callable taking a single item
+        items: Iterable of items to process
+        workers: Maximum number of concurrent calls (<= 1 runs sequentially)
+        window: Maximum number of submitted-but-unconsumed items (default: 2 * workers)
+
+    Yields:
+        tuple: ``(item, result, error)`` where exactly one of result/error is set
+    """
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, fn(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    window = max(window or workers * 2, workers)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for item in items:
+            # Run in a copy of the caller's context so context variables (e.g. telemetry) follow the work
+            pending.append((item, pool.submit(contextvars.copy_context().run, fn, item)))
+            if len(pending) >= window:
+                yield _resolve(*pending.popleft())
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(item, future):
+    """Wait for a future and convert it into an ``(item, result, error)`` tuple."""
+    try:
+        return item, future.result(), None
+    except Exception as e:
+        return item, None, e
+
+
+class SingleFlight:
+    """Run a function once per key and share its outcome with every caller of that key.
+
+    Callers arriving while the first call is still running wait for it instead of
+    repeating the work; later callers get the stored outcome (result or exception).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def do(self, key, fn):
+        """Return ``(result, shared)`` where ``shared`` is False only for the caller that ran ``fn``.
+
+        Raises:
+            Exception: Whatever ``fn`` raised, re-raised for every caller of the key
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            leader = entry is None
+            if leader:
+                entry = self.entries[key] = {"done": threading.Event(), "result": None, "error": None}
+        if leader:
+            try:
+                entry["result"] = fn()
+            except Exception as e:
+                entry["error"] = e
+            finally:
+                entry["done"].set()
+        else:
+            entry["done"].wait()
+        if entry["error"] is not None:
+            raise entry["error"]
+        return entry["result"], not leader
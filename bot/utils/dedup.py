@@ -0,0 +1,59 @@
+# bot/utils/dedup.py
+"""Identify duplicated code units and carry one unit's annotations over to its copies."""
+
+import hashlib
+from difflib import SequenceMatcher
+
+
+def normalize_code(text: str) -> str:
+    """Normalize line endings and trailing whitespace, which don't change what code does."""
+    return "\n".join(line.rstrip() for line in text.splitlines())
+
+
+def unit_key(kind: str, text: str) -> str:
+    """Content address of a normalized code unit.
+
+    Args:
+        kind: Unit type (e.g. file extension or 'py-fragment'); units of different kinds never match
+        text: Source text of the unit
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(f"{kind}\0{normalize_code(text)}".encode("utf-8")).hexdigest()
+
+
+def _with_newline(line: str, newline: str) -> str:
+    stripped = line.rstrip("\r\n")
+    return stripped + newline if len(stripped) != len(line) else stripped
+
+
+def transfer_annotations(original: str, updated: str, target: str) -> str:
+    """Apply the edits that turned ``original`` into ``updated`` to a copy of ``original``.
+
+    ``target`` must have the same normalized code as ``original``; it may differ in line
+    endings and trailing whitespace, which are kept for all lines the model did not touch.
+
+    Args:
+        original: Unit that was sent to the model
+        updated: The model's annotated version of ``original``
+        target: Duplicate of ``original`` to annotate the same way
+
+    Returns:
+        str: ``target`` with the same lines added or changed
+    """
+    if target == original:
+        return updated
+    source = original.splitlines(keepends=True)
+    copy = target.splitlines(keepends=True)
+    if len(source) != len(copy):
+        return updated
+    newline = "\r\n" if "\r\n" in target else "\n"
+    result = updated.splitlines(keepends=True)
+    out = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, source, result, autojunk=False).get_opcodes():
+        if tag == "equal":
+            out.extend(copy[i1:i2])
+        else:
+            out.extend(_with_newline(line, newline) for line in result[j1:j2])
+    return "".join(out)
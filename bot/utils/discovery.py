@@ -0,0 +1,261 @@
+# bot/utils/discovery.py
+"""Fast source file discovery: prunes excluded directories before descending and honors .gitignore."""
+
+import fnmatch
+import os
+import re
+
+DEFAULT_FILE_TYPES = (".py", ".sql", ".ipynb", ".tf")
+
+# Directories that never contain code worth commenting and can be huge
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", ".venv", "venv", "node_modules", "__pycache__",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".ruff_cache", ".ipynb_checkpoints",
+    ".terraform",
+)
+
+DEFAULT_MAX_FILE_KB = 1024
+_BINARY_PROBE_BYTES = 8192
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob to a regex where ``*`` stops at ``/`` and ``**`` spans directories."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRule:
+    """One gitignore line, relative to the directory of the file it came from.
+
+    Args:
+        line: Raw pattern line (already stripped of comments/blank lines)
+        base: Absolute directory the pattern is relative to
+    """
+    def __init__(self, line: str, base: str):
+        self.base = base
+        self.negate = line.startswith("!")
+        if self.negate:
+            line = line[1:]
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to ``base``
+        self.anchored = "/" in line
+        line = line.lstrip("/")
+        self.regex = re.compile(_glob_to_regex(line) + r"\Z")
+
+    def matches(self, path: str, is_dir: bool) -> bool | None:
+        """Return True/False if the rule decides ``path`` (ignored or re-included), None otherwise."""
+        if self.dir_only and not is_dir:
+            return None
+        rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+        if rel.startswith("../"):
+            return None
+        target = rel if self.anchored else rel.rsplit("/", 1)[-1]
+        if self.regex.match(target):
+            return not self.negate
+        return None
+
+
+def parse_ignore_file(path: str, base: str | None = None) -> list[IgnoreRule]:
+    """Read a .gitignore-style file into rules (missing or unreadable files yield no rules)."""
+    base = base or os.path.dirname(path)
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        rules.append(IgnoreRule(line, base))
+    return rules
+
+
+def is_ignored(rules: list[IgnoreRule], path: str, is_dir: bool) -> bool:
+    """Apply rules in order; the last matching rule wins, as in git."""
+    ignored = False
+    for rule in rules:
+        decision = rule.matches(path, is_dir)
+        if decision is not None:
+            ignored = decision
+    return ignored
+
+
+def _inherited_rules(root: str) -> list[IgnoreRule]:
+    """Rules from .gitignore files above ``root`` up to its git work tree (plus .git/info/exclude)."""
+    chain = []
+    current = root
+    while True:
+        chain.append(current)
+        if os.path.exists(os.path.join(current, ".git")):
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            # Not inside a repository: only the root's own .gitignore applies
+            chain = [root]
+            break
+        current = parent
+
+    top = chain[-1]
+    rules = parse_ignore_file(os.path.join(top, ".git", "info", "exclude"), base=top)
+    # Parents first so deeper files can override them; ``root`` itself is read by the walker
+    for directory in reversed(chain[1:]):
+        rules += parse_ignore_file(os.path.join(directory, ".gitignore"))
+    return rules
+
+
+def dedupe_roots(roots) -> list[str]:
+    """Drop missing roots, duplicates and roots nested inside another root.
+
+    Roots are compared by their resolved path but returned as given, so printed
+    paths keep the form the user passed on the command line.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    resolved = {}
+    for root in roots:
+        if not os.path.exists(root):
+            print(f"⚠️ Source path does not exist: {root}")
+            continue
+        resolved.setdefault(os.path.realpath(root), root)
+    kept = []
+    for real, root in resolved.items():
+        nested = any(other != real and real.startswith(other.rstrip(os.sep) + os.sep) for other in resolved)
+        if not nested:
+            kept.append(root)
+    return kept
+
+
+def _is_excluded(path: str, name: str, exclude: list[str]) -> bool:
+    """Match a path against ``project.exclude`` globs (cwd-relative, absolute or bare names)."""
+    rel = os.path.relpath(path).replace(os.sep, "/")
+    for pattern in exclude:
+        if "/" in pattern:
+            if fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(path, pattern):
+                return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def _looks_binary(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(_BINARY_PROBE_BYTES)
+    except OSError:
+        return True
+
+
+def iter_code_files(roots, file_types=DEFAULT_FILE_TYPES, exclude=None, gitignore: bool = True,
+                    max_file_kb: int | None = DEFAULT_MAX_FILE_KB):
+    """Yield code files under ``roots`` without descending into excluded directories.
+
+    Args:
+        roots: Directory or file path, or a list of them (overlapping roots are de-duplicated)
+        file_types: Extensions to yield
+        exclude: Extra glob patterns (``project.exclude``) for files or directories to skip
+        gitignore: Whether to honor .gitignore files (and .git/info/exclude)
+        max_file_kb: Skip files larger than this, notebooks excepted (None disables the limit)
+
+    Yields:
+        str: Path to each matching file, in a stable (sorted) order
+    """
+    file_types = tuple(file_types or DEFAULT_FILE_TYPES)
+    exclude = [p[2:] if p.startswith("./") else p for p in (exclude or [])]
+    exclude = [p.rstrip("/") for p in exclude] + list(DEFAULT_EXCLUDES)
+    max_bytes = max_file_kb * 1024 if max_file_kb else None
+    seen = set()
+
+    def accept(path, name, size):
+        if not name.endswith(file_types) or _is_excluded(path, name, exclude):
+            return False
+        # A notebook's size is mostly outputs, which are never loaded (see bot.utils.notebook)
+        if max_bytes and size > max_bytes and not name.endswith(".ipynb"):
+            print(f"⚠️ Skipping large file ({size // 1024} KB): {path}")
+            return False
+        if _looks_binary(path):
+            print(f"⚠️ Skipping binary file: {path}")
+            return False
+        return True
+
+    for root in dedupe_roots(roots):
+        if os.path.isfile(root):
+            real = os.path.realpath(root)
+            if real not in seen and accept(root, os.path.basename(root), os.path.getsize(root)):
+                seen.add(real)
+                yield root
+            continue
+
+        # Depth-first over (directory, rules in effect) pairs; the stack keeps memory flat on wide trees
+        stack = [(root, _inherited_rules(os.path.abspath(root)) if gitignore else [])]
+        while stack:
+            directory, rules = stack.pop()
+            if gitignore:
+                own = parse_ignore_file(os.path.join(directory, ".gitignore"))
+                if own:
+                    rules = rules + own
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"⚠️ Cannot read directory {directory}: {e}")
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = entry.is_file()
+                except OSError:
+                    continue
+                if is_dir:
+                    if _is_excluded(entry.path, entry.name, exclude):
+                        continue
+                    if rules and is_ignored(rules, entry.path, True):
+                        continue
+                    subdirs.append(entry.path)
+                elif is_file:
+                    if not entry.name.endswith(file_types):
+                        continue
+                    if rules and is_ignored(rules, entry.path, False):
+                        continue
+                    real = os.path.realpath(entry.path)
+                    if real in seen:
+                        continue
+                    if accept(entry.path, entry.name, entry.stat().st_size):
+                        seen.add(real)
+                        yield entry.path
+            stack.extend((sub, rules) for sub in reversed(subdirs))
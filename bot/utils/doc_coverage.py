@@ -0,0 +1,126 @@
+# bot/utils/doc_coverage.py
+"""Docstring coverage of Python modules and compact prompt views of their undocumented symbols."""
+
+import ast
+from dataclasses import dataclass, field
+
+from bot.utils.docstring_splicer import collect_symbols, existing_docstring_node
+
+
+@dataclass
+class DocstringCoverage:
+    """Which symbols of a module (module, classes, functions) carry a docstring.
+
+    Attributes:
+        documented: Qualified names that have a docstring
+        undocumented: Qualified names that lack one
+    """
+    documented: list[str] = field(default_factory=list)
+    undocumented: list[str] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return len(self.documented) + len(self.undocumented)
+
+    @property
+    def ratio(self) -> float:
+        """Fraction of documented symbols (1.0 for a module without symbols)."""
+        return len(self.documented) / self.total if self.total else 1.0
+
+
+def docstring_coverage(code: str, tree: ast.Module | None = None) -> DocstringCoverage | None:
+    """Compute docstring coverage for a module.
+
+    Empty modules (only comments/whitespace) have nothing to document and report no symbols.
+
+    Args:
+        code: Python source code
+        tree: Already parsed ``code`` (optional)
+
+    Returns:
+        DocstringCoverage: Coverage per qualified name, or None if the code does not parse
+    """
+    if tree is None:
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            return None
+    coverage = DocstringCoverage()
+    for name, node in collect_symbols(tree).items():
+        if node is tree and not tree.body:
+            continue
+        target = coverage.documented if existing_docstring_node(node) is not None else coverage.undocumented
+        target.append(name)
+    return coverage
+
+
+def _header_lines(node) -> range:
+    """1-based line numbers of a definition's decorators and signature."""
+    start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+    end = max(node.lineno, node.body[0].lineno - 1)
+    return range(start, end + 1)
+
+
+def undocumented_view(code: str, names: list[str], tree: ast.Module | None = None, module_lines: int = 40) -> str:
+    """Numbered excerpt of ``code`` showing just enough to document ``names``.
+
+    Functions are shown in full, classes as their header, attributes and method
+    signatures, and the module as its leading imports/constants plus top-level
+    signatures. Lines keep their
+    real numbers (``12| ...``) and skipped ranges are marked with ``...``.
+
+    Args:
+        code: Python source code
+        names: Qualified symbol names to document
+        tree: Already parsed ``code`` (optional)
+        module_lines: Cap on leading module lines shown for the module docstring
+
+    Returns:
+        str: The sparse numbered view
+    """
+    tree = tree or ast.parse(code)
+    symbols = collect_symbols(tree)
+    lines = code.splitlines(keepends=True)
+    keep = set()
+
+    for name in names:
+        node = symbols.get(name)
+        if node is None:
+            continue
+        if node is tree:
+            definitions = [n for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+            first_def = definitions[0].lineno if definitions else len(lines) + 1
+            keep.update(range(1, min(first_def, module_lines + 1)))
+            for definition in definitions:
+                keep.update(_header_lines(definition))
+        elif isinstance(node, ast.ClassDef):
+            keep.update(_header_lines(node))
+            for stmt in node.body:
+                if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    keep.update(_header_lines(stmt))
+                else:
+                    keep.update(range(stmt.lineno, stmt.end_lineno + 1))
+        else:
+            keep.update(_header_lines(node))
+            keep.update(range(node.lineno, node.end_lineno + 1))
+
+    out = []
+    previous = 0
+    for lineno in sorted(n for n in keep if 1 <= n <= len(lines)):
+        if lineno > previous + 1:
+            out.append("...\n")
+        line = lines[lineno - 1]
+        if not line.endswith("\n"):
+            line += "\n"
+        out.append(f"{lineno}| {line}")
+        previous = lineno
+    if previous < len(lines):
+        out.append("...\n")
+    return "".join(out)
+
+
+def format_coverage(documented: int, total: int) -> str:
+    """Human-readable ``documented/total (pct%)``."""
+    pct = 100.0 * documented / total if total else 100.0
+    return f"{documented}/{total} ({pct:.1f}%)"
+
@@ -0,0 +1,202 @@
+# bot/utils/docstring_splicer.py
+"""Insert model-provided docstrings and inline comments into Python source using AST positions."""
+
+import ast
+import io
+import json
+import re
+import tokenize
+
+MODULE_SYMBOL = "<module>"
+
+_DEF_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def collect_symbols(tree: ast.Module) -> dict:
+    """Map qualified names (``Class.method``, ``outer.inner``) to their AST nodes.
+
+    Args:
+        tree: Parsed module
+
+    Returns:
+        dict: ``{"<module>": tree, "qualified.name": node, ...}`` in source order
+    """
+    symbols = {MODULE_SYMBOL: tree}
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, _DEF_TYPES):
+                name = f"{prefix}{child.name}"
+                symbols.setdefault(name, child)
+                visit(child, f"{name}.")
+            elif not isinstance(child, (ast.Lambda, ast.expr)):
+                visit(child, prefix)  # Definitions nested in if/try/with blocks keep the same prefix
+
+    visit(tree, "")
+    return symbols
+
+
+def existing_docstring_node(node):
+    """Return the ``Expr`` statement holding the node's docstring, or None."""
+    body = getattr(node, "body", None)
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        return body[0]
+    return None
+
+
+def number_lines(code: str) -> str:
+    """Prefix every line with its 1-based line number (``12| ...``) so the model can reference lines."""
+    return "".join(f"{i}| {line}" for i, line in enumerate(code.splitlines(keepends=True), start=1))
+
+
+def parse_annotations(response: str) -> tuple[dict, dict]:
+    """Parse the model's JSON answer into docstring and comment maps.
+
+    Tolerates Markdown fences and prose around the JSON object.
+
+    Args:
+        response: Raw model output
+
+    Returns:
+        tuple: ``(docstrings, comments)`` where comments are keyed by int line number
+
+    Raises:
+        ValueError: If no JSON object can be decoded
+    """
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("model response does not contain a JSON object")
+    data = json.loads(response[start:end + 1])
+    docstrings = {str(k): str(v) for k, v in (data.get("docstrings") or {}).items() if v}
+    comments = {}
+    for line, text in (data.get("comments") or {}).items():
+        try:
+            comments[int(line)] = str(text)
+        except (TypeError, ValueError):
+            continue
+    return docstrings, comments
+
+
+def _format_docstring(text: str, indent: str, newline: str) -> str:
+    text = text.strip().replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
+    if text.endswith('"'):
+        text += " "  # Keep the closing quote from merging with the delimiter
+    lines = text.splitlines() or [""]
+    if len(lines) == 1:
+        return f'{indent}"""{lines[0]}"""{newline}'
+    body = "".join(f"{indent}{line}{newline}" if line.strip() else newline for line in lines[1:])
+    return f'{indent}"""{lines[0]}{newline}{body}{indent}"""{newline}'
+
+
+def _uncommentable_lines(code: str) -> set[int]:
+    """Lines that must not receive an inline comment: already commented or inside a multi-line string."""
+    blocked = set()
+    fstring_starts = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            name = tokenize.tok_name.get(tok.type)
+            if tok.type == tokenize.COMMENT:
+                blocked.add(tok.start[0])
+            elif tok.type == tokenize.STRING:
+                blocked.update(range(tok.start[0], tok.end[0]))
+            elif name == "FSTRING_START":  # f-strings are tokenized piecewise on Python 3.12+
+                fstring_starts.append(tok.start[0])
+            elif name == "FSTRING_END" and fstring_starts:
+                blocked.update(range(fstring_starts.pop(), tok.end[0]))
+    except (tokenize.TokenError, SyntaxError):
+        return set(range(1, code.count("\n") + 2))
+    return blocked
+
+
+def _parses(code: str) -> bool:
+    try:
+        ast.parse(code)
+    except (SyntaxError, ValueError):  # ValueError: null bytes (Python < 3.12)
+        return False
+    return True
+
+
+def splice_annotations(code: str, docstrings: dict, comments: dict | None = None) -> str:
+    """Insert or replace docstrings and append inline comments to the original source.
+
+    Only whole-line edits are made, so everything else stays byte-identical. Symbols
+    whose body starts on the ``def`` line (``def f(): pass``) are left alone, as are
+    comments for lines that already carry one or sit inside a multi-line string. An
+    edit that would break the syntax is dropped; the others are still applied.
+
+    Args:
+        code: Original Python source
+        docstrings: ``qualified_name -> docstring text`` (``<module>`` for the module)
+        comments: ``line number -> comment text``
+
+    Returns:
+        str: Annotated source (``code`` itself if no edit applies)
+    """
+    tree = ast.parse(code)
+    lines = code.splitlines(keepends=True)
+    newline = "\r\n" if "\r\n" in code else "\n"
+    symbols = collect_symbols(tree)
+    edits = []  # (start_index, end_index, replacement text) over 0-based line indexes
+    blocked_by_docstrings = set()
+
+    for name, text in docstrings.items():
+        node = symbols.get(name)
+        if node is None or not text.strip():
+            continue
+        current = existing_docstring_node(node)
+        if node is tree:
+            if current is not None:
+                edits.append((current.lineno - 1, current.end_lineno, _format_docstring(text, "", newline)))
+                blocked_by_docstrings.update(range(current.lineno, current.end_lineno + 1))
+            elif tree.body:
+                # After a shebang / encoding cookie / leading comments, before any code
+                index = 0
+                while index < len(lines) and lines[index].startswith("#"):
+                    index += 1
+                edits.append((index, index, _format_docstring(text, "", newline)))
+            continue
+
+        first = node.body[0]
+        # A decorated first statement starts at its first decorator, not at its ``def``/``class``
+        first_line = min([first.lineno] + [d.lineno for d in getattr(first, "decorator_list", ())])
+        first_col = first.col_offset if first_line == first.lineno else lines[first_line - 1].index("@")
+        if lines[first_line - 1][:first_col].strip():
+            continue  # Body shares the header line
+        indent = re.match(r"[ \t]*", lines[first_line - 1]).group(0)
+        if current is not None:
+            line = lines[current.end_lineno - 1]
+            if lines[current.lineno - 1][:current.col_offset].strip() or line[current.end_col_offset:].strip(" \t\r\n;"):
+                continue  # Docstring shares its lines with other code
+            edits.append((current.lineno - 1, current.end_lineno, _format_docstring(text, indent, newline)))
+            blocked_by_docstrings.update(range(current.lineno, current.end_lineno + 1))
+        else:
+            edits.append((first_line - 1, first_line - 1, _format_docstring(text, indent, newline)))
+
+    blocked = _uncommentable_lines(code) | blocked_by_docstrings
+    for lineno, text in (comments or {}).items():
+        text = " ".join(str(text).split()).lstrip("# ")
+        if not text or not 1 <= lineno <= len(lines) or lineno in blocked:
+            continue
+        line = lines[lineno - 1]
+        stripped = line.rstrip("\r\n")
+        if not stripped.strip() or stripped.endswith("\\"):
+            continue
+        edits.append((lineno - 1, lineno, f"{stripped}  # {text}{line[len(stripped):] or newline}"))
+
+    # Apply bottom-up so earlier line indexes stay valid; on ties, replace before inserting
+    edits.sort(key=lambda e: (e[0], e[1]), reverse=True)
+    original = list(lines)
+    for start, end, replacement in edits:
+        lines[start:end] = [replacement]
+    result = "".join(lines)
+    if _parses(result):
+        return result
+
+    # Some edit broke the syntax: re-apply one at a time, keeping only those that still parse
+    lines = original
+    for start, end, replacement in edits:
+        candidate = lines[:start] + [replacement] + lines[end:]
+        if _parses("".join(candidate)):
+            lines = candidate
+    return "".join(lines)
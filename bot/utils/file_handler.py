@@ -3,9 +3,17 @@
 
 import os
 import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from bot.utils.discovery import iter_code_files
 
 def walk_code_files(src_folder):
-    """Generator that yields paths to code files (.py, .sql, .ipynb) in a directory tree.
+    """Generator that yields paths to code files (.py, .sql, .ipynb, .tf) in a directory tree.
+
+    Directories such as ``.git``, ``.venv`` and ``node_modules`` are pruned and
+    .gitignore is honored; see ``bot.utils.discovery.iter_code_files`` for the options.
     
     Args:
         src_folder: Root directory to search for code files
@@ -13,10 +21,7 @@ def walk_code_files(src_folder):
     Yields:
         str: Full path to each matching code file
     """
-    for root, _, files in os.walk(src_folder):
-        for file in files:
-            if file.endswith(".py") or file.endswith(".sql") or file.endswith(".ipynb") or file.endswith(".tf"):
-                yield os.path.join(root, file)
+    yield from iter_code_files(src_folder)
 
 def read_code(filepath):
     """Reads content from a code file, handling Jupyter notebooks specially.
@@ -34,6 +39,45 @@ def read_code(filepath):
         with open(filepath, 'r') as f:
             return f.read()
 
+@contextmanager
+def atomic_open(filepath, mode='w', encoding=None):
+    """Open a temporary sibling of ``filepath`` that replaces it when the block exits cleanly.
+
+    Readers (and concurrent pipeline workers) never observe a half-written file,
+    and an interrupted write leaves the original untouched.
+
+    Args:
+        filepath: Path to the file to write
+        mode: Write mode, 'w' or 'wb'
+        encoding: Text encoding (default: platform default, like ``open``)
+
+    Yields:
+        File object to write the new content to
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(filepath))
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        if os.path.exists(filepath):
+            shutil.copymode(filepath, tmp_path)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_write(filepath, text, encoding=None):
+    """Atomically replace a file's content via a temporary sibling file (see ``atomic_open``).
+
+    Args:
+        filepath: Path to the file to write
+        text: String content to write
+        encoding: Text encoding (default: platform default, like ``open``)
+    """
+    with atomic_open(filepath, 'w', encoding=encoding) as f:
+        f.write(text)
+
 def write_code(filepath, content):
     """Writes content to a file, creating a backup (.bak) and handling Jupyter notebooks specially.
     
@@ -44,9 +88,6 @@ def write_code(filepath, content):
     # backup_path = filepath + ".bak"
     # os.rename(filepath, backup_path)
     if filepath.endswith(".ipynb"):
-        import json
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(content, f, indent=2)
+        atomic_write(filepath, json.dumps(content, indent=2), encoding='utf-8')
     else:
-        with open(filepath, 'w') as f:
-            f.write(content)
\ No newline at end of file
+        atomic_write(filepath, content)
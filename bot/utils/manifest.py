@@ -0,0 +1,94 @@
+# bot/utils/manifest.py
+"""Helpers for incremental runs: a per-file content-hash manifest and git change sets."""
+
+import hashlib
+import json
+import os
+import subprocess
+
+from bot.utils.file_handler import atomic_write
+
+MANIFEST_NAME = "manifest.json"  # inside the project's state directory unless project.manifest is set
+
+
+def file_hash(filepath: str) -> str | None:
+    """Compute the SHA-256 of a file's bytes.
+
+    Args:
+        filepath: Path of the file to hash
+
+    Returns:
+        str: Hex digest, or None if the file cannot be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def manifest_key(filepath: str) -> str:
+    """Normalize a path so the same file maps to one manifest entry regardless of how it was reached."""
+    return os.path.relpath(os.path.abspath(filepath)).replace(os.sep, "/")
+
+
+def load_manifest(path: str) -> dict:
+    """Load the manifest mapping file path -> content hash.
+
+    Args:
+        path: Manifest file location
+
+    Returns:
+        dict: Mapping of normalized file path to hex digest (empty if missing or unreadable)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {}) if isinstance(data, dict) else {}
+
+
+def save_manifest(manifest: dict, path: str):
+    """Persist the manifest, sorted so it diffs cleanly.
+
+    Args:
+        manifest: Mapping of normalized file path to hex digest
+        path: Manifest file location (parent folders are created)
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write(path, json.dumps({"version": 1, "files": dict(sorted(manifest.items()))}, indent=2) + "\n", encoding="utf-8")
+
+
+def is_unchanged(manifest: dict, filepath: str) -> bool:
+    """Return True if the file still has the hash recorded after the bot last wrote it."""
+    recorded = manifest.get(manifest_key(filepath))
+    return recorded is not None and recorded == file_hash(filepath)
+
+
+def changed_files_since(ref: str) -> set[str]:
+    """List files that differ from a git ref, including uncommitted and untracked ones.
+
+    Args:
+        ref: Any git revision (branch, tag, SHA, ``HEAD~3``...)
+
+    Returns:
+        set[str]: Real (symlink-resolved) paths of added/copied/modified/renamed files that still exist
+
+    Raises:
+        RuntimeError: If git fails (e.g. unknown ref or not a repository)
+    """
+    def git(*args):
+        result = subprocess.run(["git", *args], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    toplevel = git("rev-parse", "--show-toplevel").strip()
+    names = git("diff", "--name-only", "--diff-filter=ACMR", ref, "--").splitlines()
+    names += git("ls-files", "--others", "--exclude-standard", "--full-name", ":/").splitlines()
+    paths = {os.path.realpath(os.path.join(toplevel, name)) for name in names if name}
+    return {path for path in paths if os.path.isfile(path)}
@@ -0,0 +1,255 @@
+# bot/utils/notebook.py
+"""Lean notebook access: read cell sources without materializing outputs, splice new sources back in.
+
+A notebook is scanned through a read-only memory map. Only the ``cell_type``, ``id``
+and ``source`` of each cell are decoded; outputs, attachments and metadata are
+skipped over as raw byte ranges and later copied to the new file untouched, so
+memory use and write time depend on the size of the code, not of the outputs.
+"""
+
+import json
+import mmap
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+
+from bot.utils.file_handler import atomic_open
+
+# Characters that matter while skipping a container: string starts (strings may contain brackets) and brackets
+_STRUCTURE_RE = re.compile(rb'["\[\]{}]')
+_SCALAR_RE = re.compile(rb'[^,\]}\s]+')
+_WS_RE = re.compile(rb'[ \t\r\n]*')
+_INDENT_RE = re.compile(rb'[ \t]*')
+_LIST_LAYOUT_RE = re.compile(rb'\[(\r?\n)([ \t]*)')
+
+_OPEN = frozenset(b"[{")
+_QUOTE, _BACKSLASH = b'"'[0], b"\\"[0]
+
+COPY_CHUNK = 1 << 20  # bytes copied at a time between edits
+
+
+class UnsupportedNotebook(ValueError):
+    """Raised for notebooks the lean reader does not handle (nbformat 3 and older)."""
+
+
+@dataclass
+class NotebookCell:
+    """One cell of a notebook as seen by the lean reader.
+
+    Attributes:
+        index: Position of the cell in the notebook
+        cell_type: 'code', 'markdown' or 'raw'
+        id: Cell id (nbformat 4.5+), or None
+        source: Cell source as one string
+        span: Byte range of the JSON value of ``source`` in the file
+    """
+    index: int
+    cell_type: str | None
+    id: str | None
+    source: str
+    span: tuple[int, int]
+
+
+@dataclass
+class NotebookEdit:
+    """New sources for some cells of a notebook, keyed by cell index (see ``splice_sources``)."""
+    sources: dict[int, str] = field(default_factory=dict)
+
+
+def _ws(buf, pos: int) -> int:
+    return _WS_RE.match(buf, pos).end()
+
+
+def _expect(buf, pos: int, char: bytes) -> int:
+    if buf[pos:pos + 1] != char:
+        raise ValueError(f"Expected {char.decode()!r} at byte {pos}")
+    return pos + 1
+
+
+def _string_end(buf, pos: int) -> int:
+    """End of the JSON string starting at ``pos``; ``find`` skips long output strings at memchr speed."""
+    end = _expect(buf, pos, b'"')
+    while True:
+        end = buf.find(b'"', end)
+        if end < 0:
+            raise ValueError(f"Unterminated JSON string at byte {pos}")
+        backslashes = 0
+        while buf[end - 1 - backslashes] == _BACKSLASH:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        end += 1
+
+
+def _skip_value(buf, pos: int) -> int:
+    """End of the JSON value starting at ``pos``, found without decoding it."""
+    first = buf[pos:pos + 1]
+    if first == b'"':
+        return _string_end(buf, pos)
+    if first and first[0] in _OPEN:
+        depth = 0
+        while True:
+            match = _STRUCTURE_RE.search(buf, pos)
+            if match is None:
+                raise ValueError("Unterminated JSON value")
+            pos = match.start()
+            char = buf[pos]
+            if char == _QUOTE:
+                pos = _string_end(buf, pos)
+                continue
+            depth += 1 if char in _OPEN else -1
+            pos += 1
+            if depth == 0:
+                return pos
+    match = _SCALAR_RE.match(buf, pos)
+    if match is None:
+        raise ValueError(f"Expected a JSON value at byte {pos}")
+    return match.end()
+
+
+def _walk_object(buf, pos: int, on_member) -> int:
+    """Walk the object at ``pos``; ``on_member(key, value_start)`` returns the end of each value."""
+    pos = _ws(buf, _expect(buf, _ws(buf, pos), b"{"))
+    if buf[pos:pos + 1] == b"}":
+        return pos + 1
+    while True:
+        end = _string_end(buf, pos)
+        key = json.loads(buf[pos:end])
+        pos = _ws(buf, _expect(buf, _ws(buf, end), b":"))
+        pos = _ws(buf, on_member(key, pos))
+        if buf[pos:pos + 1] == b"}":
+            return pos + 1
+        pos = _ws(buf, _expect(buf, pos, b","))
+
+
+def _walk_array(buf, pos: int, on_item) -> int:
+    """Walk the array at ``pos``; ``on_item(value_start)`` returns the end of each item."""
+    pos = _ws(buf, _expect(buf, _ws(buf, pos), b"["))
+    if buf[pos:pos + 1] == b"]":
+        return pos + 1
+    while True:
+        pos = _ws(buf, on_item(pos))
+        if buf[pos:pos + 1] == b"]":
+            return pos + 1
+        pos = _ws(buf, _expect(buf, pos, b","))
+
+
+def _scan(buf) -> list[NotebookCell]:
+    """Cells of the notebook in ``buf`` (bytes or a memory map)."""
+    cells = []
+    found = {}
+
+    def cell_member(fields, key, pos):
+        end = _skip_value(buf, pos)
+        if key in ("cell_type", "id"):
+            fields[key] = json.loads(buf[pos:end])
+        elif key == "source":
+            source = json.loads(buf[pos:end])
+            fields["source"] = "".join(source) if isinstance(source, list) else source
+            fields["span"] = (pos, end)
+        return end
+
+    def cell(pos):
+        fields = {}
+        end = _walk_object(buf, pos, lambda key, value: cell_member(fields, key, value))
+        if "span" not in fields:
+            raise ValueError(f"Cell {len(cells)} has no source")
+        cells.append(NotebookCell(len(cells), fields.get("cell_type"), fields.get("id"), fields["source"], fields["span"]))
+        return end
+
+    def member(key, pos):
+        if key == "cells":
+            found["cells"] = True
+            return _walk_array(buf, pos, cell)
+        end = _skip_value(buf, pos)
+        if key == "nbformat":
+            found["nbformat"] = json.loads(buf[pos:end])
+        return end
+
+    _walk_object(buf, 0, member)
+    if found.get("nbformat", 4) < 4 or "cells" not in found:
+        raise UnsupportedNotebook(f"nbformat {found.get('nbformat')} notebooks have no top-level cells")
+    return cells
+
+
+def read_cells(filepath: str) -> list[NotebookCell]:
+    """Read the cells of a notebook without loading its outputs.
+
+    Args:
+        filepath: Path to the Jupyter notebook file
+
+    Returns:
+        list[NotebookCell]: Every cell, in order
+
+    Raises:
+        UnsupportedNotebook: For nbformat 3 and older notebooks
+        ValueError: If the file is not a valid notebook
+        OSError: If the file cannot be read
+    """
+    if os.path.getsize(filepath) == 0:
+        raise ValueError("Empty notebook file")
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        return _scan(buf)
+
+
+def _encode_source(buf, span: tuple[int, int], source: str) -> bytes:
+    """JSON for a new cell source, laid out like the value it replaces (nbformat: one string per line)."""
+    start, end = span
+    if buf[start:start + 1] != b"[":
+        return json.dumps(source, ensure_ascii=False).encode("utf-8")
+    items = [json.dumps(line, ensure_ascii=False).encode("utf-8") for line in source.splitlines(keepends=True)]
+    if not items:
+        return b"[]"
+    layout = _LIST_LAYOUT_RE.match(buf, start)
+    if layout is None and end - start > 2 and b"\n" not in buf[start:end]:
+        return b"[" + b", ".join(items) + b"]"  # Compact single-line list
+    key_indent = _INDENT_RE.match(buf, buf.rfind(b"\n", 0, start) + 1).group(0)
+    newline, indent = layout.groups() if layout else (b"\n", key_indent + b" ")
+    return b"[" + newline + (b"," + newline).join(indent + item for item in items) + newline + key_indent + b"]"
+
+
+def splice_sources(filepath: str, sources: dict[int, str]) -> bool:
+    """Write new cell sources into a notebook, copying every other byte unchanged.
+
+    Cells are matched by index; sources that are unchanged, or whose cell no longer
+    exists, are left alone. The file is replaced atomically.
+
+    Args:
+        filepath: Path to the Jupyter notebook file
+        sources: New source per cell index
+
+    Returns:
+        bool: True if the file was rewritten, False if nothing changed
+
+    Raises:
+        ValueError: If the file is not a valid nbformat 4 notebook
+        OSError: If the file cannot be read or written
+    """
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        cells = _scan(buf)
+        edits = sorted(
+            (cells[index].span, _encode_source(buf, cells[index].span, source))
+            for index, source in sources.items()
+            if index < len(cells) and cells[index].source != source
+        )
+    if not edits:
+        return False
+
+    # Copied through a plain file handle so neither the map nor the source is open when the file is replaced
+    with atomic_open(filepath, "wb") as out, open(filepath, "rb") as src:
+        position = 0
+        for (start, end), value in edits:
+            src.seek(position)
+            remaining = start - position
+            while remaining:
+                block = src.read(min(COPY_CHUNK, remaining))
+                if not block:
+                    raise ValueError(f"{filepath} changed while it was being written")
+                out.write(block)
+                remaining -= len(block)
+            out.write(value)
+            position = end
+        src.seek(position)
+        shutil.copyfileobj(src, out, COPY_CHUNK)
+    return True
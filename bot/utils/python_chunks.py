@@ -0,0 +1,107 @@
+# bot/utils/python_chunks.py
+"""Split Python modules into top-level segments that can be commented independently."""
+
+import ast
+import re
+from dataclasses import dataclass
+
+# Leading blank lines / trailing whitespace around a segment's code, kept verbatim on reassembly
+_LAYOUT_RE = re.compile(r"\A((?:[ \t]*\r?\n)*)(.*?)(\s*)\Z", re.DOTALL)
+
+
+@dataclass
+class CodeSegment:
+    """A contiguous slice of a module's source.
+
+    Attributes:
+        text: Exact source text of the slice
+        name: Name of the top-level ``def``/``class`` it holds, or None for module-level code
+        start_line: 1-based line number where the slice starts
+    """
+    text: str
+    name: str | None
+    start_line: int
+
+    @property
+    def is_symbol(self) -> bool:
+        return self.name is not None
+
+    @property
+    def has_code(self) -> bool:
+        """True if the slice contains anything besides blank lines and ``#`` comments."""
+        return any(line.strip() and not line.lstrip().startswith("#") for line in self.text.splitlines())
+
+
+def split_python_module(code: str) -> list[CodeSegment] | None:
+    """Split a module at top-level ``def``/``class`` boundaries.
+
+    Decorators and comment lines directly above a definition belong to its segment;
+    module-level code between definitions forms its own segments. Joining the ``text``
+    of all segments reproduces ``code`` exactly.
+
+    Args:
+        code: Python source code
+
+    Returns:
+        list[CodeSegment]: Segments in source order, or None if the code does not parse
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = code.splitlines(keepends=True)
+    boundaries = []  # (start_index, end_index, name) of each definition, 0-based, end exclusive
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        while start > 0 and lines[start - 1].startswith("#"):
+            start -= 1
+        boundaries.append((start, node.end_lineno, node.name))
+
+    segments = []
+    cursor = 0
+    for start, end, name in boundaries:
+        start = max(start, cursor)  # A comment block can't be claimed by two definitions
+        if start > cursor:
+            segments.append(CodeSegment("".join(lines[cursor:start]), None, cursor + 1))
+        segments.append(CodeSegment("".join(lines[start:end]), name, start + 1))
+        cursor = end
+    if cursor < len(lines):
+        segments.append(CodeSegment("".join(lines[cursor:]), None, cursor + 1))
+    return segments
+
+
+def module_header(segments: list[CodeSegment], max_lines: int = 60) -> str:
+    """Return the module-level code before the first definition (imports, constants).
+
+    Args:
+        segments: Output of ``split_python_module``
+        max_lines: Cap on the number of header lines returned
+
+    Returns:
+        str: Header text shared with every chunk prompt as context
+    """
+    if not segments or segments[0].is_symbol:
+        return ""
+    return "".join(segments[0].text.splitlines(keepends=True)[:max_lines])
+
+
+def split_layout(text: str) -> tuple[str, str, str]:
+    """Split text into (leading blank lines, body, trailing whitespace)."""
+    return _LAYOUT_RE.match(text).groups()
+
+
+def restore_layout(original: str, commented: str) -> str:
+    """Re-wrap a commented body with the original segment's surrounding whitespace.
+
+    Args:
+        original: Segment text that was sent to the model
+        commented: Model output for that segment's body
+
+    Returns:
+        str: ``commented`` with the original leading/trailing layout
+    """
+    lead, _, trail = split_layout(original)
+    return lead + commented.strip("\r\n").rstrip() + trail
@@ -0,0 +1,226 @@
+# bot/utils/sql_statements.py
+"""Split SQL scripts into statements that can be commented independently."""
+
+import re
+from dataclasses import dataclass
+
+# Statements using any of these are worth a model call; plain DDL, DML and simple SELECTs are not
+_NONTRIVIAL_WORDS = frozenset((
+    "JOIN", "OVER", "WINDOW", "QUALIFY", "UNION", "INTERSECT", "EXCEPT", "MINUS", "GROUP", "HAVING",
+    "CASE", "MERGE", "LATERAL", "PIVOT", "UNPIVOT", "RECURSIVE", "CONNECT",
+))
+# Matched against a statement's words and parentheses joined by spaces (see SqlStatement.shape)
+_CTE_RE = re.compile(r"\bWITH (?:RECURSIVE )?\w+ (?:\( [\w ]*\) )?AS (?:NOT )?(?:MATERIALIZED )?\(")
+_SUBQUERY_RE = re.compile(r"\( (?:SELECT|WITH)\b")
+
+# Lookaheads for keywords whose meaning depends on what follows
+_TRANSACTION_BEGIN_RE = re.compile(
+    r"\s*(?:;|\Z|(?:TRANSACTION|WORK|TRAN|DEFERRED|IMMEDIATE|EXCLUSIVE|ISOLATION|READ)\b)", re.IGNORECASE)
+_END_OF_CONTROL_RE = re.compile(r"\s+(?:IF|LOOP|WHILE|REPEAT|FOR)\b", re.IGNORECASE)
+_STANDALONE_DECLARE_RE = re.compile(
+    r"\s*(?:@|\w+\s+(?:BINARY|INSENSITIVE|NO\s+SCROLL|SCROLL|CURSOR)\b)", re.IGNORECASE)
+
+_WORD_RE = re.compile(r"\s*([A-Za-z_]\w*)")
+# Words after a routine's IS/AS that start its body rather than a declaration section
+_ROUTINE_BODY_STARTS = frozenset((
+    "SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "SET", "RETURN", "LANGUAGE", "EXTERNAL",
+))
+# First words that can't start a PL/SQL declaration, only another statement
+_STATEMENT_STARTS = frozenset((
+    "SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "WITH", "SET", "CREATE", "ALTER", "DROP", "TRUNCATE",
+    "DECLARE", "IF", "CALL", "EXECUTE", "EXPORT", "ASSERT", "LOOP", "WHILE", "FOR", "RETURN",
+))
+
+_BLOCK_COMMENT_RE = re.compile(r"/\*|\*/")
+
+
+def _token_re(delimiter: str) -> re.Pattern:
+    """Tokenizer for a script whose statements end with ``delimiter``."""
+    return re.compile(rf"""
+        (?P<batch>^[ \t]*(?:/|GO)[ \t]*(?=\r?\n|\Z))          # SQL*Plus '/' or T-SQL 'GO' line
+      | (?P<line_comment>--[^\n]*)
+      | (?P<block_comment>/\*)
+      | (?P<terminator>{re.escape(delimiter)})
+      | (?P<string>[Ee]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'        # E'...' with backslash escapes
+                  |'[^']*(?:''[^']*)*')
+      | (?P<quoted>"[^"]*(?:""[^"]*)*"|`[^`]*`)              # Quoted identifiers
+      | (?P<dollar>\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$)           # Start of a dollar-quoted body
+      | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+      | (?P<paren>[()])
+      | (?P<newline>\n)
+    """, re.VERBOSE | re.MULTILINE | re.IGNORECASE)
+
+
+_DEFAULT_TOKEN_RE = _token_re(";")
+
+
+@dataclass
+class SqlStatement:
+    """A contiguous run of whole lines of a SQL script holding one statement.
+
+    Attributes:
+        text: Exact source text, including the comments and blank lines before the statement
+        start_line: 1-based line number where the slice starts
+        terminated: True if the slice ends with a statement terminator
+        has_code: True if the slice contains anything besides whitespace and comments
+        shape: Upper-cased words and parentheses of the code, space separated (no strings or comments)
+        procedural: True if it holds a BEGIN ... END block or a dollar-quoted body
+    """
+    text: str
+    start_line: int
+    terminated: bool = False
+    has_code: bool = False
+    shape: str = ""
+    procedural: bool = False
+
+    @property
+    def nontrivial(self) -> bool:
+        """True for statements worth annotating: joins, CTEs, subqueries, aggregations, window functions, bodies."""
+        if not self.has_code:
+            return False
+        return (self.procedural or not _NONTRIVIAL_WORDS.isdisjoint(self.shape.split())
+                or bool(_CTE_RE.search(self.shape) or _SUBQUERY_RE.search(self.shape)))
+
+
+def split_sql_statements(code: str) -> list[SqlStatement]:
+    """Split a SQL script into statements at whole-line boundaries.
+
+    A statement ends at its terminator (``;``, or the delimiter set by a MySQL
+    ``DELIMITER`` line), or at a line holding only ``/`` (SQL*Plus) or ``GO``
+    (T-SQL). Terminators inside strings, quoted identifiers, comments,
+    dollar-quoted bodies and ``BEGIN ... END``/``CASE ... END`` blocks don't count,
+    nor do those in the declaration section of a PL/SQL block (``DECLARE`` or a
+    routine's ``IS``/``AS`` up to its ``BEGIN``). A statement followed by more code
+    on the same line runs on to the next terminator, so every statement covers
+    whole lines and comment lines before a statement belong to it. Joining the
+    ``text`` of all statements reproduces ``code`` exactly.
+
+    Strings use standard SQL quoting (``''`` inside ``'...'``); MySQL-style
+    backslash escapes are only understood in ``E'...'`` strings.
+
+    Args:
+        code: SQL source code
+
+    Returns:
+        list[SqlStatement]: Statements in source order
+    """
+    statements = []
+    token_re = _DEFAULT_TOKEN_RE
+    start, start_line = 0, 1
+    pos, line = 0, 1  # Scan position and its line
+    shape, procedural = [], False
+    depth = 0
+    pending_begins = 0  # Declaration sections waiting for their BEGIN
+    routine = False  # Inside a PROCEDURE/FUNCTION/PACKAGE header, before its IS/AS
+    ended_on = None  # Line of a terminator, while waiting for the end of that line
+    declare_break = None  # (position, line, shape length) after a terminator in a top-level DECLARE section
+
+    def emit(end, end_line, terminated, shape_len=None):
+        nonlocal start, start_line, shape, procedural, depth, pending_begins, routine, declare_break
+        kept = shape[:shape_len]
+        statements.append(SqlStatement(code[start:end], start_line, terminated, bool(kept), " ".join(kept),
+                                       procedural))
+        start, start_line = end, end_line
+        shape, procedural, depth, pending_begins, routine, declare_break = [], False, 0, 0, False, None
+
+    while True:
+        match = token_re.search(code, pos)
+        if match is None:
+            break
+        line += code.count("\n", pos, match.start())
+        kind, pos = match.lastgroup, match.end()
+
+        if kind == "newline":
+            line += 1
+            if ended_on is not None:
+                ended_on = None
+                if depth == 0:
+                    emit(pos, line, True)
+                else:
+                    declare_break = (pos, line, len(shape))
+            continue
+        if kind == "line_comment":
+            continue
+        if kind == "block_comment":
+            nesting, end = 1, len(code)
+            for inner in _BLOCK_COMMENT_RE.finditer(code, pos):
+                nesting += 1 if inner.group() == "/*" else -1
+                if nesting == 0:
+                    end = inner.end()
+                    break
+            if "\n" in code[match.start():end]:
+                ended_on = None  # Don't cut inside a multi-line comment
+            line += code.count("\n", pos, end)
+            pos = end
+            continue
+
+        # Anything else is code: a statement followed by more code on its line runs on
+        ended_on = None
+        if kind == "batch":
+            shape.append(match.group().strip().upper())
+            ended_on, depth = line, 0
+        elif kind == "terminator":
+            routine = False  # A forward declaration ends here
+            if depth == 0 or (depth == 1 and pending_begins and shape[0] == "DECLARE"):
+                ended_on = line
+        elif kind in ("string", "quoted"):
+            line += match.group().count("\n")
+        elif kind == "dollar":
+            end = code.find(match.group(), pos)
+            end = len(code) if end < 0 else end + len(match.group())
+            line += code.count("\n", pos, end)
+            pos = end
+            procedural = True
+        elif kind == "paren":
+            shape.append(match.group())
+        else:
+            word = match.group().upper()
+            if declare_break is not None:
+                # A top-level DECLARE followed by another statement was a standalone (e.g. BigQuery) DECLARE
+                if word in _STATEMENT_STARTS:
+                    break_pos, break_line, shape_len = declare_break
+                    procedural = False
+                    emit(break_pos, break_line, True, shape_len)
+                    # Re-scan from the break so the next statement's tokens are seen again
+                    pos, line = break_pos, break_line
+                    continue
+                declare_break = None
+            if word == "DELIMITER" and not shape:
+                # MySQL client directive: the rest of the line is the new delimiter
+                line_end = code.find("\n", pos)
+                line_end = len(code) if line_end < 0 else line_end
+                delimiter = code[pos:line_end].strip()
+                if delimiter:
+                    token_re = _DEFAULT_TOKEN_RE if delimiter == ";" else _token_re(delimiter)
+                shape.append(word)
+                pos, ended_on = line_end, line
+                continue
+            shape.append(word)
+            if word == "BEGIN":
+                if pending_begins:
+                    pending_begins -= 1
+                elif not _TRANSACTION_BEGIN_RE.match(code, pos):
+                    depth += 1
+                    procedural = True
+            elif word == "CASE":
+                depth += 1
+            elif word == "END":
+                if not _END_OF_CONTROL_RE.match(code, pos):
+                    depth = max(0, depth - 1)
+            elif word == "DECLARE" and depth == 0 and not _STANDALONE_DECLARE_RE.match(code, pos):
+                depth += 1
+                pending_begins += 1
+                procedural = True
+            elif word in ("PROCEDURE", "FUNCTION", "PACKAGE", "BODY") and (depth or shape[0] == "CREATE"):
+                routine = True
+            elif word in ("IS", "AS") and routine:
+                routine = False
+                following = _WORD_RE.match(code, pos)
+                if following and following.group(1).upper() not in _ROUTINE_BODY_STARTS:
+                    depth += 1
+                    pending_begins += 1
+                    procedural = True
+
+    if start < len(code):
+        emit(len(code), line, ended_on is not None)
+    return statements
@@ -0,0 +1,111 @@
+# bot/utils/stream_guard.py
+"""Line-by-line check that a streamed completion only adds comments to the original code."""
+
+PYTHON_COMMENTS = ("#",)
+SQL_COMMENTS = ("--", "/*", "*/", "*")
+TF_COMMENTS = ("#", "//", "/*", "*/", "*")
+
+_DOC_DELIMITERS = ('"""', "'''")
+# Prefixes that may also start a comment mid-line (block-comment markers only count at line start)
+_INLINE_COMMENTS = ("#", "--", "//")
+
+
+class GenerationAborted(RuntimeError):
+    """Raised when a streamed generation diverges from the original code and is cancelled."""
+
+
+class StreamGuard:
+    """Matches streamed output lines against the original's code lines, in order.
+
+    Blank lines, comment lines, Markdown fences and lines inside triple-quoted blocks
+    may be added freely. Any other line must be the next code line of the original
+    (compared ignoring whitespace and trailing comments); lines that are neither
+    count as divergence, and original code lines that get skipped count too.
+
+    Args:
+        original: Source that was sent to the model
+        comment_prefixes: Prefixes that start a comment in the language
+        max_divergent_lines: Divergence tolerated before aborting
+        lookahead: How far ahead in the original to look when re-synchronizing
+    """
+    def __init__(self, original: str, comment_prefixes=PYTHON_COMMENTS, max_divergent_lines: int = 3, lookahead: int = 50):
+        self.comment_prefixes = comment_prefixes
+        self.max_divergent_lines = max_divergent_lines
+        self.lookahead = lookahead
+        self.expected = []  # (normalized code line, is inside a docstring)
+        in_doc = False
+        for line in original.splitlines():
+            key = self._normalize(line)
+            if key:
+                self.expected.append((key, in_doc or key.startswith(_DOC_DELIMITERS)))
+            in_doc = self._toggle_doc(line, in_doc)
+        self.position = 0
+        self.divergent = 0
+        self.in_doc = False
+        self.buffer = ""
+
+    def _normalize(self, line: str) -> str:
+        text = line.strip()
+        if not text or text.startswith("```"):
+            return ""
+        if text.startswith(self.comment_prefixes):
+            return ""
+        for prefix in self.comment_prefixes:
+            # Cut at the first occurrence, even inside a string literal: both sides are cut alike
+            if prefix in _INLINE_COMMENTS and prefix in text:
+                text = text[:text.index(prefix)]
+        return " ".join(text.split())
+
+    def _toggle_doc(self, line: str, in_doc: bool) -> bool:
+        if "#" not in self.comment_prefixes:
+            return False  # Triple-quoted blocks are a Python concept
+        count = sum(line.count(delimiter) for delimiter in _DOC_DELIMITERS)
+        return in_doc != (count % 2 == 1)
+
+    def feed(self, text: str):
+        """Consume a streamed piece of output, checking every completed line.
+
+        Raises:
+            GenerationAborted: If the output diverged beyond the tolerance
+        """
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            self._check(line)
+
+    def finish(self):
+        """Check the final partial line and that the output was not cut short.
+
+        Raises:
+            GenerationAborted: If the output diverged or is missing original code
+        """
+        if self.buffer:
+            self._check(self.buffer)
+            self.buffer = ""
+        missing = sum(1 for _, is_doc in self.expected[self.position:] if not is_doc)
+        if missing > self.max_divergent_lines:
+            raise GenerationAborted(f"output ended with {missing} original code lines missing (truncated?)")
+
+    def _check(self, line: str):
+        key = self._normalize(line)
+        was_in_doc = self.in_doc
+        self.in_doc = self._toggle_doc(line, self.in_doc)
+        if not key:
+            return
+        if self.position < len(self.expected) and self.expected[self.position][0] == key:
+            self.position += 1
+            return
+        if was_in_doc or key.startswith(_DOC_DELIMITERS):
+            return  # Added or rewritten docstring text
+
+        window = self.expected[self.position:self.position + self.lookahead]
+        for offset, (candidate, _) in enumerate(window):
+            if candidate == key:
+                skipped = window[:offset]
+                self.divergent += sum(1 for _, is_doc in skipped if not is_doc)
+                self.position += offset + 1
+                break
+        else:
+            self.divergent += 1
+        if self.divergent > self.max_divergent_lines:
+            raise GenerationAborted(f"model is rewriting code (diverged at: {line.strip()[:80]!r})")
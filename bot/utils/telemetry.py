@@ -0,0 +1,304 @@
+# bot/utils/telemetry.py
+"""Per-call and per-file performance telemetry, exported as JSON lines and a Prometheus textfile."""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from bot.core.streaming import iter_generate
+from bot.utils.file_handler import atomic_write
+
+# File currently being processed by this thread/task; copied into nested worker pools
+current_file = contextvars.ContextVar("current_file", default=None)
+
+
+def estimate_tokens(text) -> int:
+    """Token estimate (~4 characters per token); providers are called through text-only APIs."""
+    return len(text) // 4 if isinstance(text, str) else 0
+
+
+def _new_file_stats(path: str) -> dict:
+    return {
+        "path": path,
+        "status": "pending",
+        "started": None,
+        "latency": 0.0,
+        "calls": 0,
+        "cache_hits": 0,
+        "retries": 0,
+        "failovers": 0,
+        "hedges": 0,
+        "queue_wait": 0.0,
+        "request_latency": 0.0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "bytes_written": 0,
+        "symbols": 0,
+        "documented_before": 0,
+        "documented_after": None,
+    }
+
+
+class Telemetry:
+    """Thread-safe collector for one run."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.calls = []
+        self.files = {}
+
+    def _file(self, path=None):
+        path = path or current_file.get()
+        if path is None:
+            return None
+        if path not in self.files:
+            self.files[path] = _new_file_stats(path)
+        return self.files[path]
+
+    @contextmanager
+    def track_file(self, path: str):
+        """Attribute every call made inside the block to ``path`` and time it."""
+        token = current_file.set(path)
+        start = time.perf_counter()
+        with self.lock:
+            self._file(path)["started"] = time.time()
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                self._file(path)["status"] = "failed"
+            raise
+        finally:
+            with self.lock:
+                self._file(path)["latency"] += time.perf_counter() - start
+            current_file.reset(token)
+
+    def record_call(self, provider, model, latency: float, input_tokens: int, output_tokens: int, error=None):
+        """Record one provider round trip (every retry attempt is its own call)."""
+        call = {
+            "file": current_file.get(),
+            "provider": provider,
+            "model": model,
+            "latency": round(latency, 4),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "error": type(error).__name__ if error else None,
+            "timestamp": time.time(),
+        }
+        with self.lock:
+            self.calls.append(call)
+            stats = self._file()
+            if stats:
+                stats["calls"] += 1
+                stats["request_latency"] += latency
+                stats["input_tokens"] += input_tokens
+                stats["output_tokens"] += output_tokens
+
+    def record_queue_wait(self, seconds: float):
+        """Time spent waiting on the provider's rate limiter."""
+        with self.lock:
+            stats = self._file()
+            if stats:
+                stats["queue_wait"] += seconds
+
+    def record_retry(self):
+        with self.lock:
+            stats = self._file()
+            if stats:
+                stats["retries"] += 1
+
+    def record_route_event(self, event: str):
+        """Count a routing event ('failovers' or 'hedges') for the current file."""
+        with self.lock:
+            stats = self._file()
+            if stats:
+                stats[event] += 1
+
+    def record_cache_hit(self):
+        with self.lock:
+            stats = self._file()
+            if stats:
+                stats["cache_hits"] += 1
+
+    def record_file_status(self, path: str, status: str, bytes_written: int = 0):
+        """Mark a file as written/skipped/failed once the pipeline is done with it."""
+        with self.lock:
+            stats = self._file(path)
+            stats["status"] = status
+            stats["bytes_written"] += bytes_written
+
+    def record_coverage(self, path: str, total: int, documented: int, after: bool = False):
+        """Record docstring coverage of a Python file before the run or after writing it."""
+        with self.lock:
+            stats = self._file(path)
+            if after:
+                stats["documented_after"] = documented
+            else:
+                stats["symbols"] = total
+                stats["documented_before"] = documented
+
+    def summary(self) -> dict:
+        """Aggregate counters for the whole run."""
+        with self.lock:
+            files = list(self.files.values())
+            calls = list(self.calls)
+        statuses = {}
+        for stats in files:
+            statuses[stats["status"]] = statuses.get(stats["status"], 0) + 1
+        return {
+            "duration": round(time.time() - self.started, 3),
+            "files": statuses,
+            "calls": len(calls),
+            "failed_calls": sum(1 for c in calls if c["error"]),
+            "cache_hits": sum(s["cache_hits"] for s in files),
+            "retries": sum(s["retries"] for s in files),
+            "failovers": sum(s["failovers"] for s in files),
+            "hedges": sum(s["hedges"] for s in files),
+            "queue_wait": round(sum(s["queue_wait"] for s in files), 3),
+            "request_latency": round(sum(c["latency"] for c in calls), 3),
+            "input_tokens": sum(c["input_tokens"] for c in calls),
+            "output_tokens": sum(c["output_tokens"] for c in calls),
+            "bytes_written": sum(s["bytes_written"] for s in files),
+            "symbols": sum(s["symbols"] for s in files),
+            "documented_before": sum(s["documented_before"] for s in files),
+            # Files that were skipped or failed keep their coverage
+            "documented_after": sum(s["documented_before"] if s["documented_after"] is None else s["documented_after"]
+                                    for s in files),
+        }
+
+    def export_jsonl(self, path: str):
+        """Write one JSON object per call, per file and a final run summary."""
+        with self.lock:
+            calls = list(self.calls)
+            files = [dict(stats) for stats in self.files.values()]
+        lines = [json.dumps({"type": "call", **call}) for call in calls]
+        for stats in files:
+            stats["latency"] = round(stats["latency"], 4)
+            stats["request_latency"] = round(stats["request_latency"], 4)
+            stats["queue_wait"] = round(stats["queue_wait"], 4)
+            lines.append(json.dumps({"type": "file", **stats}))
+        lines.append(json.dumps({"type": "run", "timestamp": self.started, **self.summary()}))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write(path, "\n".join(lines) + "\n", encoding="utf-8")
+
+    def export_prometheus(self, path: str):
+        """Write metrics in the node_exporter textfile-collector format."""
+        with self.lock:
+            calls = list(self.calls)
+        summary = self.summary()
+        per_model = {}
+        for call in calls:
+            key = (call["provider"] or "unknown", call["model"] or "unknown")
+            agg = per_model.setdefault(key, {"count": 0, "errors": 0, "latency": 0.0, "input": 0, "output": 0})
+            agg["count"] += 1
+            agg["errors"] += 1 if call["error"] else 0
+            agg["latency"] += call["latency"]
+            agg["input"] += call["input_tokens"]
+            agg["output"] += call["output_tokens"]
+
+        out = []
+
+        def metric(name, kind, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+                out.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        def labels(key):
+            return {"provider": key[0], "model": key[1]}
+
+        metric("auto_comment_llm_requests_total", "counter", "Provider calls, including retries.",
+               [(labels(k), v["count"]) for k, v in per_model.items()])
+        metric("auto_comment_llm_request_errors_total", "counter", "Provider calls that raised.",
+               [(labels(k), v["errors"]) for k, v in per_model.items()])
+        metric("auto_comment_llm_request_seconds_total", "counter", "Total provider call latency.",
+               [(labels(k), round(v["latency"], 4)) for k, v in per_model.items()])
+        metric("auto_comment_llm_tokens_total", "counter", "Estimated tokens sent and received.",
+               [({**labels(k), "direction": "input"}, v["input"]) for k, v in per_model.items()]
+               + [({**labels(k), "direction": "output"}, v["output"]) for k, v in per_model.items()])
+        metric("auto_comment_cache_hits_total", "counter", "Prompts answered from the response cache.",
+               [({}, summary["cache_hits"])])
+        metric("auto_comment_retries_total", "counter", "Retried provider calls.", [({}, summary["retries"])])
+        metric("auto_comment_route_events_total", "counter", "Calls failed over or hedged to another provider.",
+               [({"event": "failover"}, summary["failovers"]), ({"event": "hedge"}, summary["hedges"])])
+        metric("auto_comment_queue_wait_seconds_total", "counter", "Time spent waiting on rate limits.",
+               [({}, summary["queue_wait"])])
+        metric("auto_comment_files_total", "counter", "Files by outcome.",
+               [({"status": status}, count) for status, count in summary["files"].items()])
+        metric("auto_comment_bytes_written_total", "counter", "Bytes written back to source files.",
+               [({}, summary["bytes_written"])])
+        metric("auto_comment_docstring_symbols", "gauge", "Python symbols (module, classes, functions) seen.",
+               [({}, summary["symbols"])])
+        metric("auto_comment_documented_symbols", "gauge", "Python symbols with a docstring.",
+               [({"stage": "before"}, summary["documented_before"]), ({"stage": "after"}, summary["documented_after"])])
+        metric("auto_comment_run_duration_seconds", "gauge", "Wall-clock duration of the run.",
+               [({}, summary["duration"])])
+        metric("auto_comment_run_timestamp_seconds", "gauge", "Start time of the run.", [({}, round(self.started, 3))])
+        atomic_write(path, "\n".join(out) + "\n", encoding="utf-8")
+
+
+def escape_label(value) -> str:
+    """Escape a Prometheus label value (backslash, double quote and newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Return the process-wide collector."""
+    return _telemetry
+
+
+def reset_telemetry() -> Telemetry:
+    """Start a fresh collector (e.g. for each job handled by a long-lived process)."""
+    global _telemetry
+    _telemetry = Telemetry()
+    return _telemetry
+
+
+class InstrumentedModel:
+    """Innermost model wrapper that times every provider round trip and counts tokens.
+
+    Args:
+        llm: Provider model wrapper
+        provider: Provider type label
+        model_name: Model label
+    """
+    def __init__(self, llm, provider=None, model_name=None):
+        self.llm = llm
+        self.provider = provider
+        self.model_name = model_name
+
+    def generate(self, prompt: str) -> str:
+        """Call the wrapped model and record latency and estimated tokens."""
+        start = time.perf_counter()
+        try:
+            response = self.llm.generate(prompt)
+        except Exception as e:
+            get_telemetry().record_call(self.provider, self.model_name, time.perf_counter() - start,
+                                        estimate_tokens(prompt), 0, error=e)
+            raise
+        get_telemetry().record_call(self.provider, self.model_name, time.perf_counter() - start,
+                                    estimate_tokens(prompt), estimate_tokens(response))
+        return response
+
+    def stream(self, prompt: str):
+        """Stream from the wrapped model, recording the call when the stream ends or is closed."""
+        start = time.perf_counter()
+        produced = 0
+        error = None
+        try:
+            for piece in iter_generate(self.llm, prompt):
+                produced += len(piece)
+                yield piece
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            get_telemetry().record_call(self.provider, self.model_name, time.perf_counter() - start,
+                                        estimate_tokens(prompt), produced // 4, error=error)
@@ -0,0 +1,330 @@
+# bot/utils/windowing.py
+"""Token-aware windowing: estimate request sizes per model and split oversized code into overlapping windows."""
+
+import ast
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+from bot.utils.sql_statements import split_sql_statements
+
+# (substring of the lower-cased model name, context window tokens, max output tokens); first match wins
+MODEL_LIMITS = (
+    ("gpt-4.1", 1047576, 32768),
+    ("gpt-4o", 128000, 16384),
+    ("gpt-4-turbo", 128000, 4096),
+    ("gpt-4", 8192, 4096),
+    ("gpt-3.5", 16385, 4096),
+    ("o1", 200000, 100000),
+    ("o3", 200000, 100000),
+    ("o4-mini", 200000, 100000),
+    ("deepseek", 64000, 8192),
+    ("claude", 200000, 8192),
+    ("gemini", 1048576, 8192),
+    ("llama", 8192, 2048),
+    ("mixtral", 32768, 4096),
+)
+DEFAULT_LIMITS = (16384, 4096)
+
+# Completion limit a provider wrapper applies when ``model.max_tokens`` is not configured
+PROVIDER_OUTPUT_DEFAULTS = {"openai": 1024, "deepseek": 4096}
+
+# Code tokenizes denser than prose; erring low keeps windows safely inside the limits
+DEFAULT_CHARS_PER_TOKEN = 3.0
+
+
+class TokenBudget:
+    """How much code fits into one request for a given model.
+
+    Full-rewrite prompts echo the code back with comments added, so the code in a
+    request is bounded both by the context window (prompt plus answer) and by the
+    model's output limit.
+
+    Args:
+        context_tokens: Context window of the model
+        max_output_tokens: Maximum tokens the model may generate per request
+        chars_per_token: Characters per token used to estimate sizes
+        output_ratio: Expected answer size relative to the code sent (code plus comments)
+        reserve_tokens: Safety margin kept free in every request
+    """
+    def __init__(self, context_tokens: int, max_output_tokens: int, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN,
+                 output_ratio: float = 1.5, reserve_tokens: int = 256):
+        self.context_tokens = context_tokens
+        self.max_output_tokens = max_output_tokens
+        self.chars_per_token = chars_per_token
+        self.output_ratio = output_ratio
+        self.reserve_tokens = reserve_tokens
+
+    @classmethod
+    def for_model(cls, provider: str | None, model_name: str | None, context_tokens: int | None = None,
+                  max_output_tokens: int | None = None, chars_per_token: float | None = None) -> "TokenBudget":
+        """Budget for a provider/model, with configured limits taking precedence over the built-in table."""
+        name = (model_name or "").lower()
+        context, output = next(((c, o) for key, c, o in MODEL_LIMITS if key in name), DEFAULT_LIMITS)
+        output = max_output_tokens or PROVIDER_OUTPUT_DEFAULTS.get(provider, output)
+        return cls(context_tokens or context, output, chars_per_token or DEFAULT_CHARS_PER_TOKEN)
+
+    def count(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+    def fits(self, prompt: str, code: str) -> bool:
+        """True if ``prompt`` and a full annotated copy of ``code`` fit into one request."""
+        answer = self.count(code) * self.output_ratio
+        return answer <= self.max_output_tokens and self.count(prompt) + answer + self.reserve_tokens <= self.context_tokens
+
+    def fits_prompt(self, prompt: str) -> bool:
+        """True if ``prompt`` fits with room left for a short (e.g. JSON) answer."""
+        return self.count(prompt) + self.reserve_tokens * 4 <= self.context_tokens
+
+    def code_capacity(self, overhead: str) -> int:
+        """Tokens of code that fit into one full-rewrite request whose fixed text is ``overhead``."""
+        by_context = (self.context_tokens - self.reserve_tokens - self.count(overhead)) / (1 + self.output_ratio)
+        by_output = self.max_output_tokens / self.output_ratio
+        return max(1, int(min(by_context, by_output)))
+
+
+@dataclass
+class Window:
+    """A slice of a file sent in one request.
+
+    Attributes:
+        text: Overlap lines followed by the core lines (what the model sees)
+        overlap: Number of leading lines repeated from the previous window for context
+        core: The lines this window is responsible for
+        start_line: 1-based line number of the first core line
+    """
+    text: str
+    overlap: int
+    core: str
+    start_line: int
+
+
+# Trailing comment markers per language, used to compare lines regardless of added comments
+COMMENT_MARKERS = {
+    "python": ("#",),
+    "sql": ("--",),
+    "tf": ("#", "//"),
+}
+
+
+def line_key(line: str, language: str) -> str:
+    """Code part of a line (no trailing comment or surrounding whitespace); empty for blank/comment lines."""
+    for marker in COMMENT_MARKERS[language]:
+        line = line.split(marker, 1)[0]
+    return line.strip()
+
+
+def sql_boundaries(lines: list[str]) -> list[int]:
+    """Line indices after each terminated SQL statement (see ``split_sql_statements``)."""
+    boundaries = []
+    line = 0
+    for statement in split_sql_statements("".join(lines)):
+        line += len(statement.text.splitlines())
+        if statement.terminated:
+            boundaries.append(line)
+    return boundaries
+
+
+_HEREDOC_RE = re.compile(r"<<-?\s*([A-Za-z_][A-Za-z0-9_]*)\s*$")
+
+
+def tf_boundaries(lines: list[str]) -> list[int]:
+    """Line indices after a top-level HCL block or attribute (bracket depth back to zero)."""
+    boundaries = []
+    depth = 0
+    heredoc = None
+    in_comment = False
+    for index, line in enumerate(lines):
+        if heredoc is not None:
+            if line.strip() == heredoc:
+                heredoc = None
+                if depth == 0:
+                    boundaries.append(index + 1)
+            continue
+        in_string = False
+        i = 0
+        while i < len(line):
+            char, pair = line[i], line[i:i + 2]
+            if in_comment:
+                if pair == "*/":
+                    in_comment = False
+                    i += 1
+            elif in_string:
+                if char == "\\":
+                    i += 1
+                elif char == '"':
+                    in_string = False
+            elif char == "#" or pair == "//":
+                break
+            elif pair == "/*":
+                in_comment = True
+                i += 1
+            elif char == '"':
+                in_string = True
+            elif char in "{[(":
+                depth += 1
+            elif char in "}])":
+                depth = max(0, depth - 1)
+            i += 1
+        match = _HEREDOC_RE.search(line.split("#", 1)[0].rstrip())
+        if match:
+            heredoc = match.group(1)
+        elif depth == 0 and not in_comment and line_key(line, "tf"):
+            boundaries.append(index + 1)
+    return boundaries
+
+
+def _python_boundaries(lines: list[str]) -> list[int]:
+    """Line indices where a top-level statement, or a statement directly inside a top-level block, starts."""
+    try:
+        tree = ast.parse("".join(lines))
+    except (SyntaxError, ValueError):
+        # Unparsable: fall back to unindented lines that follow a blank line
+        return [i for i in range(1, len(lines)) if not lines[i - 1].strip() and lines[i][:1] not in ("", " ", "\t", "\n", "\r")]
+
+    def start(node):
+        return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+
+    boundaries = []
+    for node in tree.body:
+        boundaries.append(start(node))
+        for child in getattr(node, "body", []):
+            boundaries.append(start(child))
+    return boundaries
+
+
+BOUNDARY_FINDERS = {
+    "python": _python_boundaries,
+    "sql": sql_boundaries,
+    "tf": tf_boundaries,
+}
+
+
+def split_windows(code: str, language: str, capacity: int, count, overlap_lines: int = 20) -> list[Window]:
+    """Split ``code`` into windows of at most ``capacity`` tokens at syntactic boundaries.
+
+    Windows are cut between statements (SQL), top-level blocks (Terraform) or
+    statements at the top two nesting levels (Python); a single unit larger than
+    ``capacity`` is cut between lines. Every window after the first repeats up to
+    ``overlap_lines`` preceding lines as context; see ``reconcile_window``.
+
+    Args:
+        code: Source code of the file
+        language: 'python', 'sql' or 'tf'
+        capacity: Maximum tokens of code per window (see ``TokenBudget.code_capacity``)
+        count: Callable estimating the tokens of a string
+        overlap_lines: Lines repeated from the previous window
+
+    Returns:
+        list[Window]: Windows in order; joining their ``core`` reproduces ``code``
+    """
+    lines = code.splitlines(keepends=True)
+    keys = [line_key(line, language) for line in lines]
+    sizes = [count(line) for line in lines]
+
+    # Move every boundary up over blank/comment lines, so each window starts right after a code line
+    boundaries = set()
+    for boundary in BOUNDARY_FINDERS[language](lines):
+        while 0 < boundary < len(lines) and not keys[boundary - 1]:
+            boundary -= 1
+        if 0 < boundary < len(lines):
+            boundaries.add(boundary)
+
+    def overlap_for(start):
+        if start == 0 or not keys[start - 1]:
+            return 0  # No code line to anchor the overlap on
+        overlap = 0
+        budget = capacity // 4
+        while overlap < overlap_lines and start - overlap > 0 and budget >= sizes[start - overlap - 1]:
+            budget -= sizes[start - overlap - 1]
+            overlap += 1
+        return overlap
+
+    windows = []
+    start = 0
+    while start < len(lines):
+        overlap = overlap_for(start)
+        room = capacity - sum(sizes[start - overlap:start])
+        end, used, last_boundary = start, 0, None
+        while end < len(lines) and (used + sizes[end] <= room or end == start):
+            used += sizes[end]
+            end += 1
+            if end in boundaries:
+                last_boundary = end
+        if end < len(lines) and last_boundary is not None:
+            end = last_boundary
+        windows.append(Window(
+            text="".join(lines[start - overlap:end]),
+            overlap=overlap,
+            core="".join(lines[start:end]),
+            start_line=start + 1,
+        ))
+        start = end
+    return windows
+
+
+_DOCSTRING_START_RE = re.compile(r"^[rRuUbB]{0,2}('{3}|\"{3})")
+
+
+def code_keys(lines: list[str], language: str) -> list[str]:
+    """Whitespace-normalized code lines, without comments, blank lines and (Python) docstrings.
+
+    Two versions of a piece of code with the same keys differ only in comments and
+    docstrings, i.e. an annotated answer did not add, drop or change any code.
+    """
+    keys = []
+    docstring = None  # Closing quotes of the docstring being skipped
+    for line in lines:
+        stripped = line.strip()
+        if docstring is not None:
+            if docstring in stripped:
+                docstring = None
+            continue
+        if language == "python":
+            match = _DOCSTRING_START_RE.match(stripped)
+            if match:
+                quotes = match.group(1)
+                if quotes not in stripped[match.end():]:
+                    docstring = quotes
+                continue
+        key = " ".join(line_key(line, language).split())
+        if key:
+            keys.append(key)
+    return keys
+
+
+def reconcile_window(window: Window, output: str, language: str) -> str | None:
+    """Extract a window's own lines from the model's answer.
+
+    The last overlap line is located in ``output`` (lines are compared without
+    comments, so annotations don't get in the way) and everything after it is the
+    annotated core. Its code lines (see ``code_keys``) must be exactly those of the
+    original core, which catches truncated answers and answers that add, drop or
+    change code; added comments and docstrings are kept.
+
+    Args:
+        window: Window that was sent
+        output: The model's annotated version of ``window.text``
+        language: 'python', 'sql' or 'tf'
+
+    Returns:
+        str: The annotated core, or None if the answer can't be trusted
+    """
+    out_lines = output.splitlines(keepends=True)
+    if window.overlap:
+        source = [line_key(line, language) for line in window.text.splitlines(keepends=True)]
+        answer = [line_key(line, language) for line in out_lines]
+        anchor = window.overlap - 1
+        position = None
+        for block in SequenceMatcher(None, source, answer, autojunk=False).get_matching_blocks():
+            if block.a <= anchor < block.a + block.size:
+                position = block.b + anchor - block.a
+                break
+        if position is None:
+            return None
+        out_lines = out_lines[position + 1:]
+
+    if code_keys(out_lines, language) != code_keys(window.core.splitlines(keepends=True), language):
+        return None  # Code was added, dropped or changed
+    # Keep the original trailing blank lines, which models tend to drop
+    return "".join(out_lines).rstrip() + window.core[len(window.core.rstrip()):]
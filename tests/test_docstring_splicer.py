@@ -0,0 +1,23 @@
+# tests/test_docstring_splicer.py
+import ast
+
+from bot.utils.docstring_splicer import splice_annotations
+
+
+def test_docstring_goes_above_decorated_first_member():
+    code = "class A:\n    @property\n    def x(self): ...\ndef f(): ...\n"
+    result = splice_annotations(code, {"A": "A thing.", "f": "Do f."})
+    assert result == 'class A:\n    """A thing."""\n    @property\n    def x(self): ...\ndef f(): ...\n'
+
+
+def test_docstring_goes_above_decorator_stack():
+    code = "def outer():\n    @a\n    @b(1)\n    def inner():\n        pass\n    return inner\n"
+    result = splice_annotations(code, {"outer": "Build inner."})
+    assert result.splitlines()[1] == '    """Build inner."""'
+    ast.parse(result)
+
+
+def test_broken_edit_is_dropped_and_others_kept():
+    code = "def f():\n    pass\n\ndef g():\n    pass\n"
+    result = splice_annotations(code, {"f": "Bad\x00 docstring.", "g": "Do g."}, {5: "nothing"})
+    assert result == 'def f():\n    pass\n\ndef g():\n    """Do g."""\n    pass  # nothing\n'
@@ -0,0 +1,19 @@
+# tests/test_pipeline.py
+import locale
+
+import pytest
+
+from bot.pipeline import generate_deduplicated
+from bot.utils.concurrency import SingleFlight
+
+
+@pytest.mark.skipif(locale.getpreferredencoding(False).lower().replace("-", "") != "utf8",
+                    reason="read_code uses the locale encoding")
+def test_undecodable_copies_are_not_deduplicated(tmp_path):
+    units = SingleFlight()
+    for name, byte in (("a.py", b"\xff"), ("b.py", b"\xfe")):
+        path = tmp_path / name
+        path.write_bytes(b"x = '" + byte + b"'\n")
+        with pytest.raises(UnicodeDecodeError):
+            generate_deduplicated(None, str(path), units)
+    assert units.entries == {}
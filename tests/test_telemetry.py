@@ -0,0 +1,16 @@
+# tests/test_telemetry.py
+from bot.utils.telemetry import Telemetry
+
+
+def test_prometheus_export_escapes_labels_and_names_counters_total(tmp_path):
+    telemetry = Telemetry()
+    telemetry.record_call("custom", 'my "model"\\v2\nbeta', 0.5, 10, 5)
+    path = tmp_path / "metrics.prom"
+    telemetry.export_prometheus(str(path))
+    text = path.read_text()
+    assert 'model="my \\"model\\"\\\\v2\\nbeta"' in text
+    assert "auto_comment_llm_request_seconds_total{" in text
+    assert "auto_comment_queue_wait_seconds_total " in text
+    assert "_seconds_sum" not in text
+    for line in text.splitlines():
+        assert line.startswith("#") or line.startswith("auto_comment_")